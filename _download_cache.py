@@ -0,0 +1,124 @@
+"""Cache persistente de fragmentos dos downloads (yt-dlp), um diretório por URL.
+
+Antes o yt-dlp baixava os fragmentos (HLS/DASH) num TemporaryDirectory: uma
+falha a 95%, um cancelamento ou um retry do Studio jogava tudo fora e a nova
+tentativa recomeçava do zero. Agora os temporários ficam em
+<cache>/<sha256(url)> (--paths temp:) e, como o yt-dlp retoma fragmentos por
+padrão, a próxima tentativa da mesma URL continua do último fragmento completo.
+
+Ciclo de vida:
+- sucesso: o diretório da URL é removido na hora;
+- falha/cancelamento: fica para o retry;
+- a cada download, `collect` remove entradas sem atividade há mais de
+  VDL_DOWNLOAD_CACHE_MAX_AGE_HOURS e, se o total passar do limite, as menos
+  recentes primeiro (entradas com escrita recente são downloads em andamento
+  em outro processo e nunca são removidas por tamanho).
+
+Configuração:
+- VDL_DOWNLOAD_CACHE: diretório do cache (padrão ~/.cache/vdl/fragments).
+- VDL_DOWNLOAD_CACHE_MAX_GB: limite de tamanho (padrão 20). 0 desativa o cache
+  (volta ao diretório temporário descartável).
+- VDL_DOWNLOAD_CACHE_MAX_AGE_HOURS: idade máxima sem atividade (padrão 72).
+"""
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path
+
+# Escrita mais recente que isso = download em andamento (não entra no LRU).
+_ACTIVE_GRACE_SECONDS = 10 * 60
+
+
+def cache_dir() -> Path:
+    default = Path.home() / ".cache" / "vdl" / "fragments"
+    return Path(os.getenv("VDL_DOWNLOAD_CACHE") or default)
+
+
+def max_bytes() -> int:
+    try:
+        return int(float(os.getenv("VDL_DOWNLOAD_CACHE_MAX_GB", "20")) * 1024 ** 3)
+    except ValueError:
+        return 20 * 1024 ** 3
+
+
+def max_age_seconds() -> float:
+    try:
+        return float(os.getenv("VDL_DOWNLOAD_CACHE_MAX_AGE_HOURS", "72")) * 3600
+    except ValueError:
+        return 72 * 3600.0
+
+
+def enabled() -> bool:
+    return max_bytes() > 0
+
+
+def entry_dir(url: str) -> Path:
+    """Diretório de temporários da URL (criado se preciso)."""
+    path = cache_dir() / hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+    path.mkdir(parents=True, exist_ok=True)
+    os.utime(path)  # mtime do diretório marca a última tentativa
+    return path
+
+
+def has_fragments(path: Path) -> bool:
+    try:
+        return any(path.iterdir())
+    except OSError:
+        return False
+
+
+def discard(path: Path) -> None:
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _entry_stats(path: Path) -> tuple[float, int]:
+    """(última atividade, bytes) de uma entrada."""
+    try:
+        newest = path.stat().st_mtime
+    except OSError:
+        return 0.0, 0
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            total += stat.st_size
+            newest = max(newest, stat.st_mtime)
+    return newest, total
+
+
+def collect(active: Path | None = None, now: float | None = None) -> int:
+    """Aplica os limites de idade e tamanho; `active` (download atual) é preservado.
+
+    Retorna quantos bytes foram liberados."""
+    root = cache_dir()
+    if not root.is_dir():
+        return 0
+    now = time.time() if now is None else now
+    entries = []
+    for path in root.iterdir():
+        if path.is_dir() and path != active:
+            entries.append((*_entry_stats(path), path))
+    freed = 0
+    kept = []
+    for last_used, size, path in entries:
+        if now - last_used > max_age_seconds():
+            discard(path)
+            freed += size
+        else:
+            kept.append((last_used, size, path))
+    total = sum(size for _last_used, size, _path in kept)
+    if active is not None:
+        total += _entry_stats(active)[1]
+    for last_used, size, path in sorted(kept):
+        if total <= max_bytes():
+            break
+        if now - last_used < _ACTIVE_GRACE_SECONDS:
+            continue
+        discard(path)
+        freed += size
+        total -= size
+    return freed
@@ -0,0 +1,130 @@
+"""Paralelismo adaptativo de fragmentos (HLS/DASH) nos downloads do yt-dlp.
+
+Por padrão o yt-dlp baixa um fragmento por vez; num túnel VPN com latência
+alta isso deixa a maior parte da banda ociosa. Com `--concurrent-fragments N`
+o vdl passa `-N` ao yt-dlp; com `auto` o N é ajustado por host:
+
+- começa no último N que funcionou para o host (padrão 4);
+- ao terminar, compara a vazão por fragmento (média / N) com a da execução
+  anterior: se ainda escala (>= 75% da anterior), a próxima sobe 2; senão,
+  volta 1 (AIMD: sobe devagar, recua rápido);
+- um HTTP 429/403 durante o download (CDN limitando) interrompe o yt-dlp e
+  relança com a metade do N; com o cache de fragmentos a nova tentativa
+  continua de onde parou. O N reduzido fica gravado para o host.
+
+O estado fica em <VDL_DOWNLOAD_CACHE>/tuning.json. Teto: VDL_MAX_CONCURRENT_FRAGMENTS
+(padrão 16).
+"""
+import json
+import os
+import re
+import tempfile
+from urllib.parse import urlsplit
+
+import _download_cache
+
+AUTO = "auto"
+DEFAULT_START = 4
+# Vazão por fragmento mínima (fração da medição anterior) para continuar subindo.
+_SCALING_RATIO = 0.75
+_THROTTLE_RE = re.compile(r"HTTP Error (429|403)")
+_SPEED_RE = re.compile(r"^\[download\].*\bat\s+(\d+(?:\.\d+)?)\s*([KMGT]?i?B)/s")
+_UNITS = {
+    "B": 1,
+    "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4,
+    "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3, "TIB": 1024 ** 4,
+}
+
+
+def max_fragments() -> int:
+    try:
+        return max(1, int(os.getenv("VDL_MAX_CONCURRENT_FRAGMENTS", "16")))
+    except ValueError:
+        return 16
+
+
+def parse_setting(value):
+    """`auto` ou inteiro >= 1 (limitado ao teto); ValueError para o resto."""
+    text = str(value).strip().lower()
+    if text == AUTO:
+        return AUTO
+    number = int(text)
+    if number < 1:
+        raise ValueError(value)
+    return min(number, max_fragments())
+
+
+def _state_path():
+    return _download_cache.cache_dir() / "tuning.json"
+
+
+def _load_state() -> dict:
+    try:
+        with open(_state_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state: dict) -> None:
+    path = _state_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # só perde a memória do ajuste, o download não depende dela
+
+
+class FragmentTuner:
+    """Escolhe o N de um download e aprende com a execução."""
+
+    def __init__(self, url: str, setting=1) -> None:
+        self.host = urlsplit(url).hostname or ""
+        self.adaptive = setting == AUTO
+        self.throttled = False
+        self._samples = []
+        if self.adaptive:
+            remembered = _load_state().get(self.host, {}).get("fragments")
+            self.fragments = min(int(remembered or DEFAULT_START), max_fragments())
+        else:
+            self.fragments = int(setting)
+
+    def observe(self, line: str) -> bool:
+        """Lê uma linha do yt-dlp; True quando o modo auto deve recuar (429/403)."""
+        match = _SPEED_RE.match(line)
+        if match:
+            factor = _UNITS.get(match.group(2).upper())
+            if factor:
+                self._samples.append(float(match.group(1)) * factor)
+            return False
+        if _THROTTLE_RE.search(line):
+            self.throttled = True
+            return self.adaptive and self.fragments > 1
+        return False
+
+    def back_off(self) -> int:
+        self.fragments = max(1, self.fragments // 2)
+        return self.fragments
+
+    def average_bps(self):
+        return int(sum(self._samples) / len(self._samples)) if self._samples else None
+
+    def finish(self) -> None:
+        """Grava o N da próxima execução para o host (só no modo auto)."""
+        if not self.adaptive or not self.host:
+            return
+        state = _load_state()
+        previous = state.get(self.host, {})
+        average = self.average_bps()
+        per_fragment = average / self.fragments if average else None
+        if self.throttled or per_fragment is None:
+            following = self.fragments
+        elif per_fragment >= _SCALING_RATIO * float(previous.get("per_fragment_bps") or 0):
+            following = min(max_fragments(), self.fragments + 2)
+        else:
+            following = max(1, self.fragments - 1)
+        state[self.host] = {"fragments": following, "per_fragment_bps": per_fragment}
+        _save_state(state)
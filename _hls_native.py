@@ -0,0 +1,383 @@
+"""Engine HLS nativa do vdl: baixa os segmentos em processo, sem o yt-dlp.
+
+Para fontes HLS protegidas, cada download_video fazia fork do yt-dlp, que
+resolvia o manifesto de novo e abria uma conexão TLS nova por fragmento. Aqui:
+
+- um único cliente httpx (HTTP/2 quando o pacote `h2` está instalado, senão
+  HTTP/1.1 keep-alive) com os cookies/Referer do _extract_cookies_universal,
+  compartilhado por todas as threads de download;
+- manifesto master -> variante de maior BANDWIDTH (+ áudio alternativo do
+  grupo AUDIO, quando separado); playlist de mídia com #EXT-X-KEY AES-128
+  (pycryptodomex), #EXT-X-MAP (fMP4) e #EXT-X-MEDIA-SEQUENCE;
+- segmentos gravados um a um em <work_dir>/<trilha>-<hash da playlist>/
+  (rename atômico): uma nova tentativa da mesma playlist pula os que já estão
+  completos;
+- no fim, concatena por trilha e faz remux com `ffmpeg -c copy`;
+- `audio_only` pula os bytes de vídeo sempre que o master tem áudio separado.
+
+O que a engine não cobre (live sem #EXT-X-ENDLIST, SAMPLE-AES/DRM, BYTERANGE,
+mais de um #EXT-X-MAP, URL que não é manifesto) levanta HlsError e o vdl cai
+para o yt-dlp. As linhas de progresso imitam as do yt-dlp ("[download] x% of
+~ N at V/s ETA m:s (frag i/n)"), então o Studio lê o progresso sem mudanças.
+"""
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urljoin
+
+DEFAULT_WORKERS = 4
+_ATTR_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+_RETRIES = 5
+_PROGRESS_INTERVAL = 1.0
+_MAX_MANIFEST_BYTES = 8 * 1024 * 1024
+
+
+class HlsError(Exception):
+    """Fonte fora do alcance da engine nativa, ou falha no download (fallback: yt-dlp)."""
+
+
+@dataclass(frozen=True)
+class Key:
+    method: str
+    uri: str | None = None
+    iv: bytes | None = None
+
+
+@dataclass(frozen=True)
+class Segment:
+    url: str
+    sequence: int
+    key: Key | None = None
+
+
+@dataclass
+class MediaPlaylist:
+    segments: list
+    init_url: str | None = None
+    init_key: Key | None = None
+
+
+def parse_attributes(text):
+    """Atributos de uma tag (`BANDWIDTH=1,URI="a.m3u8"`) num dict sem aspas."""
+    return {name: value.strip('"') for name, value in _ATTR_RE.findall(text)}
+
+
+def _lines(text):
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def select_variant(text, base_url, lowest=False):
+    """(URL da variante de maior BANDWIDTH, URL do áudio separado ou None).
+
+    `lowest` escolhe a de menor BANDWIDTH (só o áudio interessa)."""
+    audio = {}
+    variants = []
+    lines = _lines(text)
+    for index, line in enumerate(lines):
+        if line.startswith("#EXT-X-MEDIA:"):
+            attrs = parse_attributes(line.split(":", 1)[1])
+            if attrs.get("TYPE") == "AUDIO" and attrs.get("URI"):
+                # O DEFAULT=YES do grupo vence as demais faixas (idiomas extras).
+                if attrs.get("GROUP-ID") not in audio or attrs.get("DEFAULT") == "YES":
+                    audio[attrs.get("GROUP-ID")] = urljoin(base_url, attrs["URI"])
+        elif line.startswith("#EXT-X-STREAM-INF:"):
+            attrs = parse_attributes(line.split(":", 1)[1])
+            uri = next((candidate for candidate in lines[index + 1:] if not candidate.startswith("#")), None)
+            if uri:
+                variants.append((int(attrs.get("BANDWIDTH") or 0), urljoin(base_url, uri), attrs.get("AUDIO")))
+    if not variants:
+        raise HlsError("manifesto master sem variantes")
+    _bandwidth, url, group = (min if lowest else max)(variants, key=lambda variant: variant[0])
+    return url, audio.get(group)
+
+
+def parse_media(text, base_url):
+    """Segmentos de uma playlist de mídia VOD (levanta HlsError no que não é suportado)."""
+    sequence = 0
+    key = None
+    init_url = None
+    init_key = None
+    segments = []
+    pending = False
+    for line in _lines(text):
+        if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-KEY:"):
+            attrs = parse_attributes(line.split(":", 1)[1])
+            method = attrs.get("METHOD", "NONE")
+            if method == "NONE":
+                key = None
+            elif method == "AES-128" and attrs.get("URI"):
+                iv = attrs.get("IV")
+                key = Key(method, urljoin(base_url, attrs["URI"]), bytes.fromhex(iv[2:]) if iv else None)
+            else:
+                raise HlsError(f"criptografia {method} não suportada")
+        elif line.startswith("#EXT-X-MAP:"):
+            attrs = parse_attributes(line.split(":", 1)[1])
+            if "BYTERANGE" in attrs:
+                raise HlsError("#EXT-X-MAP com BYTERANGE não suportado")
+            url = urljoin(base_url, attrs["URI"])
+            if init_url is not None and url != init_url:
+                raise HlsError("mais de um #EXT-X-MAP (descontinuidade)")
+            init_url, init_key = url, key
+        elif line.startswith("#EXT-X-BYTERANGE"):
+            raise HlsError("#EXT-X-BYTERANGE não suportado")
+        elif line.startswith("#EXTINF"):
+            pending = True
+        elif not line.startswith("#") and pending:
+            segments.append(Segment(urljoin(base_url, line), sequence, key))
+            sequence += 1
+            pending = False
+    if "#EXT-X-ENDLIST" not in text:
+        raise HlsError("playlist ao vivo (sem #EXT-X-ENDLIST)")
+    if not segments:
+        raise HlsError("playlist sem segmentos")
+    return MediaPlaylist(segments, init_url, init_key)
+
+
+def _client(user_agent, cookie_header, cookies_list, referer, workers):
+    try:
+        import httpx
+    except ImportError:
+        raise HlsError("pacote httpx não instalado") from None
+    headers = {"User-Agent": user_agent}
+    if referer:
+        headers["Referer"] = referer
+        headers["Origin"] = referer.rstrip("/")
+    cookies = httpx.Cookies()
+    if cookies_list:
+        for cookie in cookies_list:
+            if isinstance(cookie, dict) and cookie.get("name") and cookie.get("value") and cookie.get("domain"):
+                cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie.get("path") or "/")
+    elif cookie_header:
+        headers["Cookie"] = cookie_header
+    options = {
+        "headers": headers,
+        "cookies": cookies,
+        "follow_redirects": True,
+        "timeout": httpx.Timeout(30.0, connect=15.0),
+        "limits": httpx.Limits(max_connections=workers + 2, max_keepalive_connections=workers + 2),
+    }
+    try:
+        return httpx.Client(http2=True, **options), "HTTP/2 quando o servidor aceita"
+    except ImportError:  # sem o pacote h2: HTTP/1.1 keep-alive no mesmo pool
+        return httpx.Client(**options), "HTTP/1.1 keep-alive"
+
+
+class _Fetcher:
+    def __init__(self, client, log):
+        import httpx
+        self.client = client
+        self.log = log
+        self._transport_error = httpx.TransportError
+        self._keys = {}
+        self._keys_lock = threading.Lock()
+
+    def get(self, url):
+        """Corpo da URL, com novas tentativas em erro de rede, 429 e 5xx."""
+        delay = 1.0
+        for attempt in range(1, _RETRIES + 1):
+            try:
+                response = self.client.get(url)
+            except self._transport_error as exc:
+                error = str(exc) or type(exc).__name__
+            else:
+                if response.status_code < 400:
+                    return response.content
+                error = f"HTTP Error {response.status_code}"
+                if response.status_code not in (429, 500, 502, 503, 504):
+                    raise HlsError(f"{error} em {url}")
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            if attempt == _RETRIES:
+                raise HlsError(f"{error} em {url} após {_RETRIES} tentativas")
+            self.log(f"[download] Got error: {error}. Retrying ({attempt}/{_RETRIES - 1})...")
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        raise AssertionError("unreachable")
+
+    def key(self, key):
+        # Sob o lock: as threads do primeiro lote de segmentos pedem a mesma chave.
+        with self._keys_lock:
+            if key.uri not in self._keys:
+                value = self.get(key.uri)
+                if len(value) != 16:
+                    raise HlsError(f"chave AES-128 inválida ({len(value)} bytes)")
+                self._keys[key.uri] = value
+            return self._keys[key.uri]
+
+    def manifest(self, url):
+        """Manifesto de entrada; desiste no primeiro pedaço se não for HLS (ex.: MP4 direto)."""
+        body = b""
+        with self.client.stream("GET", url) as response:
+            if response.status_code >= 400:
+                raise HlsError(f"HTTP Error {response.status_code} em {url}")
+            for chunk in response.iter_bytes():
+                body += chunk
+                head = body.lstrip(b"\xef\xbb\xbf \r\n")
+                if len(head) >= 7 and not head.startswith(b"#EXTM3U"):
+                    raise HlsError("a URL não é um manifesto HLS")
+                if len(body) > _MAX_MANIFEST_BYTES:
+                    raise HlsError("manifesto grande demais")
+        if not body.lstrip(b"\xef\xbb\xbf \r\n").startswith(b"#EXTM3U"):
+            raise HlsError("a URL não é um manifesto HLS")
+        return body.decode("utf-8", "replace")
+
+    def decrypt(self, data, key, sequence):
+        if key is None:
+            return data
+        try:
+            from Cryptodome.Cipher import AES
+            from Cryptodome.Util.Padding import unpad
+        except ImportError:
+            raise HlsError("pacote pycryptodomex não instalado") from None
+        iv = key.iv or sequence.to_bytes(16, "big")
+        plain = AES.new(self.key(key), AES.MODE_CBC, iv).decrypt(data)
+        try:
+            return unpad(plain, 16)
+        except ValueError:
+            return plain  # segmento sem padding PKCS#7 (alguns empacotadores)
+
+
+class _Progress:
+    """Linhas de progresso no formato do yt-dlp, no máximo 1x por segundo."""
+
+    def __init__(self, total, log):
+        self.total = total
+        self.log = log
+        self.done = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._printed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, size):
+        with self._lock:
+            self.done += 1
+            self.bytes += size
+            now = time.monotonic()
+            if now - self._printed < _PROGRESS_INTERVAL and self.done < self.total:
+                return
+            self._printed = now
+            elapsed = max(now - self.started, 0.001)
+            speed = self.bytes / elapsed
+            estimate = self.bytes * self.total / self.done
+            eta = int((estimate - self.bytes) / speed) if speed else 0
+            line = (
+                f"[download] {self.done * 100 / self.total:5.1f}% of ~ {_format_size(estimate)} "
+                f"at {_format_size(speed)}/s ETA {eta // 60:02d}:{eta % 60:02d} (frag {self.done}/{self.total})"
+            )
+        self.log(line)
+
+
+def _format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.2f}{unit}"
+        size /= 1024
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _track_dir(work_dir, kind, playlist_url):
+    """Diretório dos segmentos de uma trilha.
+
+    Leva o hash da playlist de mídia: uma tentativa só de áudio (menor variante
+    ou rendição de áudio) e outra completa da mesma URL não reaproveitam os .seg
+    uma da outra."""
+    digest = hashlib.sha256(playlist_url.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(work_dir, f"{kind}-{digest}")
+
+
+def _download_track(fetcher, playlist, track_dir, progress, workers):
+    """Baixa os segmentos da trilha e devolve o arquivo concatenado."""
+    os.makedirs(track_dir, exist_ok=True)
+    paths = [os.path.join(track_dir, f"{index:06d}.seg") for index in range(len(playlist.segments))]
+
+    def fetch(index):
+        path = paths[index]
+        if os.path.exists(path):  # tentativa anterior já completou este segmento
+            progress.add(os.path.getsize(path))
+            return
+        segment = playlist.segments[index]
+        data = fetcher.decrypt(fetcher.get(segment.url), segment.key, segment.sequence)
+        _write_atomic(path, data)
+        progress.add(len(data))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="vdl-hls") as pool:
+        # list() propaga a primeira exceção (HlsError) das threads.
+        list(pool.map(fetch, range(len(paths))))
+
+    joined = os.path.join(track_dir, "joined")
+    with open(f"{joined}.tmp", "wb") as out:
+        if playlist.init_url:
+            init = fetcher.get(playlist.init_url)
+            if playlist.init_key is not None:
+                if playlist.init_key.iv is None:
+                    raise HlsError("#EXT-X-MAP criptografado sem IV")
+                init = fetcher.decrypt(init, playlist.init_key, 0)
+            out.write(init)
+        for path in paths:
+            with open(path, "rb") as segment_file:
+                shutil.copyfileobj(segment_file, out)
+    os.replace(f"{joined}.tmp", joined)
+    return joined
+
+
+def _remux(tracks, output_path, audio_only=False):
+    root, ext = os.path.splitext(output_path)
+    partial = f"{root}.part{ext or '.mp4'}"
+    command = ["ffmpeg", "-y", "-loglevel", "error"]
+    for track in tracks:
+        command += ["-i", track]
+    if audio_only:
+        command += ["-vn"]
+    elif len(tracks) > 1:
+        command += ["-map", "0:v:0", "-map", "1:a:0"]
+    command += ["-c", "copy", partial]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise HlsError(f"remux do ffmpeg falhou: {(result.stderr or '').strip()[-500:]}")
+    os.replace(partial, output_path)
+
+
+def download(url, output_path, work_dir, user_agent, cookie_header=None, cookies_list=None, referer=None, workers=DEFAULT_WORKERS, log=print, audio_only=False):
+    """Baixa o HLS de `url` em `output_path`; HlsError = use o yt-dlp.
+
+    `audio_only` baixa só a trilha de áudio separada do master (ou, com áudio
+    embutido, a menor variante, descartando o vídeo no remux)."""
+    client, protocol = _client(user_agent, cookie_header, cookies_list, referer, workers)
+    try:
+        fetcher = _Fetcher(client, log)
+        manifest = fetcher.manifest(url)
+        audio_url = None
+        media_url = url
+        if "#EXT-X-STREAM-INF" in manifest:
+            media_url, audio_url = select_variant(manifest, url, lowest=audio_only)
+            if audio_only and audio_url:
+                media_url, audio_url = audio_url, None
+            manifest = fetcher.get(media_url).decode("utf-8", "replace")
+        playlists = [(_track_dir(work_dir, "audio" if audio_only else "video", media_url), parse_media(manifest, media_url))]
+        if audio_url:
+            audio_playlist = parse_media(fetcher.get(audio_url).decode("utf-8", "replace"), audio_url)
+            playlists.append((_track_dir(work_dir, "audio", audio_url), audio_playlist))
+        total = sum(len(playlist.segments) for _path, playlist in playlists)
+        log(f"[hls] {total} segmento(s) em {len(playlists)} trilha(s), {workers} conexão(ões) simultânea(s) ({protocol}).")
+        progress = _Progress(total, log)
+        tracks = [_download_track(fetcher, playlist, path, progress, workers) for path, playlist in playlists]
+    finally:
+        client.close()
+    _remux(tracks, output_path, audio_only)
+    shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,170 @@
+"""Limitador de taxa compartilhado para chamadas à API da OpenAI.
+
+Várias threads (pedaços de áudio do modo unificado, capítulos do e-book)
+disputam o mesmo limite da conta. Um token bucket por processo regula o ritmo
+de requisições e é recalibrado pelos cabeçalhos que a própria API devolve:
+- x-ratelimit-limit-requests: capacidade por minuto (ajusta o bucket);
+- x-ratelimit-remaining-requests / -tokens: quando chega a 0, todas as threads
+  esperam até x-ratelimit-reset-requests / -tokens;
+- retry-after (em respostas 429/5xx): pausa global pelo tempo indicado.
+
+Assim o retry deixa de adivinhar a partir do texto da exceção: usa o status
+HTTP e os cabeçalhos. As chamadas usam `with_raw_response` do SDK para ler os
+cabeçalhos também nas respostas de sucesso.
+
+Configuração: VDL_OPENAI_RPM (padrão 60) é o ritmo inicial, antes do primeiro
+cabeçalho chegar.
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# Status HTTP que valem nova tentativa (timeout, conflito, rate limit, 5xx).
+_RETRY_STATUS = {408, 409, 429}
+_RETRY_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def parse_reset(value) -> float | None:
+    """Converte '1s', '6m0s', '20ms' ou '0.5' (formatos da OpenAI) em segundos."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers, name: str) -> int | None:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token bucket thread-safe em requisições por minuto."""
+
+    def __init__(self, requests_per_minute: int = 60) -> None:
+        self.capacity = max(1, int(requests_per_minute))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60.0
+
+    def _refill_locked(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Bloqueia até haver uma ficha disponível e nenhuma pausa global ativa."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill_locked(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Suspende todas as threads por `seconds` (ex.: retry-after de um 429)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update(self, headers) -> None:
+        """Recalibra o bucket a partir dos cabeçalhos x-ratelimit-* da resposta."""
+        if not headers:
+            return
+        limit = _header_int(headers, "x-ratelimit-limit-requests")
+        remaining = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            if limit:
+                self.capacity = limit
+            if remaining is not None:
+                self._tokens = min(self._tokens, float(remaining))
+            for exhausted, reset_header in (
+                (remaining == 0, "x-ratelimit-reset-requests"),
+                (remaining_tokens == 0, "x-ratelimit-reset-tokens"),
+            ):
+                reset = parse_reset(headers.get(reset_header)) if exhausted else None
+                if reset:
+                    self._blocked_until = max(self._blocked_until, now + reset)
+
+
+def shared_limiter() -> RateLimiter:
+    """Limitador único do processo (todas as chamadas dividem a mesma cota)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            try:
+                rpm = int(os.getenv("VDL_OPENAI_RPM", "60"))
+            except ValueError:
+                rpm = 60
+            _shared = RateLimiter(rpm)
+        return _shared
+
+
+def _is_transient(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in _RETRY_STATUS or status >= 500
+    return type(error).__name__ in _RETRY_ERRORS
+
+
+def call(raw_fn, *args, limiter: RateLimiter | None = None, max_attempts: int = 5,
+         base_delay: float = 2.0, op_name: str = "operação", log=None, **kwargs):
+    """Executa um método `with_raw_response` do SDK sob o limitador.
+
+    Retorna a resposta já parseada. Erros não transitórios (4xx de validação,
+    autenticação) sobem de imediato; transitórios esperam o retry-after do
+    servidor ou, na falta dele, backoff exponencial com jitter.
+    """
+    limiter = limiter or shared_limiter()
+    log = log or (lambda message: print(message, file=sys.stderr, flush=True))
+    for attempt in range(1, max_attempts + 1):
+        limiter.acquire()
+        try:
+            raw = raw_fn(*args, **kwargs)
+        except Exception as e:
+            if not _is_transient(e) or attempt == max_attempts:
+                raise
+            headers = getattr(getattr(e, "response", None), "headers", None) or {}
+            limiter.update(headers)
+            delay = parse_reset(headers.get("retry-after"))
+            if delay is None:
+                delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 1)
+            if getattr(e, "status_code", None) == 429:
+                limiter.pause(delay)  # a cota é da conta: todas as threads esperam
+            log(
+                f"[AVISO] Falha transitória em {op_name} (tentativa {attempt}/{max_attempts}): "
+                f"{type(e).__name__}: {e}. Tentando novamente em {delay:.1f}s..."
+            )
+            time.sleep(delay)
+            continue
+        limiter.update(getattr(raw, "headers", None))
+        return raw.parse()
@@ -0,0 +1,196 @@
+"""Cache de transcrições endereçado por conteúdo, compartilhado por vdl.py,
+subtitles.py e _transcription_mlx.py.
+
+A chave é o hash do áudio + engine + modelo + idioma, então retries,
+`subtitles` depois de um `vdl -t` e reexecuções do vdl-trans reaproveitam o
+resultado sem invocar o Whisper de novo. Guarda o resultado completo no
+formato do adapter (text, segments, language), não só o texto.
+
+O hash é do áudio decodificado (PCM mono 16 kHz, o que o Whisper recebe),
+calculado pelo ffmpeg sem decodificar o vídeo: um remux ou um novo download
+do mesmo áudio acerta o cache. Sem ffmpeg, cai para o BLAKE2b do arquivo
+inteiro. O hash de cada arquivo (caminho, tamanho, mtime) fica gravado no
+próprio cache, então só a primeira consulta lê a mídia.
+
+Configuração:
+- VDL_TRANSCRIPT_CACHE: diretório do cache (padrão ~/.cache/vdl/transcripts).
+- VDL_TRANSCRIPT_CACHE_MAX_MB: limite de tamanho (padrão 512). Ao exceder,
+  remove as entradas menos usadas recentemente. 0 desativa o cache.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+_READ_CHUNK = 1024 * 1024
+
+_HASH_RE = re.compile(r"SHA256=([0-9a-f]{64})")
+
+# Hash por (caminho, tamanho, mtime) já calculado neste processo: no modo
+# --local com diretório o mesmo arquivo é consultado e depois gravado.
+_digest_memo = {}
+
+
+def cache_dir() -> Path:
+    default = Path.home() / ".cache" / "vdl" / "transcripts"
+    return Path(os.getenv("VDL_TRANSCRIPT_CACHE") or default)
+
+
+def max_bytes() -> int:
+    try:
+        return int(float(os.getenv("VDL_TRANSCRIPT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+    except ValueError:
+        return 512 * 1024 * 1024
+
+
+def enabled() -> bool:
+    return max_bytes() > 0
+
+
+def _audio_digest(path):
+    """SHA-256 do PCM decodificado da 1ª faixa de áudio, ou None (sem ffmpeg/áudio)."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    command = [
+        ffmpeg, "-nostdin", "-v", "error", "-i", str(path), "-map", "0:a:0",
+        "-ac", "1", "-ar", "16000", "-c:a", "pcm_f32le", "-f", "hash", "-hash", "sha256", "-",
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True)
+    except OSError:
+        return None
+    match = _HASH_RE.search(completed.stdout) if completed.returncode == 0 else None
+    return f"pcm-sha256:{match.group(1)}" if match else None
+
+
+def _file_digest(path) -> str:
+    """BLAKE2b do conteúdo do arquivo (leitura em blocos, memória constante)."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_CHUNK), b""):
+            digest.update(block)
+    return f"file-blake2b:{digest.hexdigest()}"
+
+
+def _memo_path(memo_key: str) -> Path:
+    return cache_dir() / "digests" / (hashlib.sha256(memo_key.encode("utf-8")).hexdigest()[:32] + ".json")
+
+
+def _load_memo(memo_key: str):
+    try:
+        with open(_memo_path(memo_key), "r", encoding="utf-8") as f:
+            return json.load(f).get("digest")
+    except (OSError, ValueError):
+        return None
+
+
+def _store_memo(memo_key: str, value: str) -> None:
+    path = _memo_path(memo_key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"digest": value}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # só perde o atalho; a próxima consulta recalcula
+
+
+def media_digest(path) -> str:
+    """Hash do áudio da mídia (ver docstring do módulo), memorizado por arquivo."""
+    stat = os.stat(path)
+    memo_key = f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+    cached = _digest_memo.get(memo_key) or (_load_memo(memo_key) if enabled() else None)
+    if cached:
+        _digest_memo[memo_key] = cached
+        return cached
+    value = _audio_digest(path) or _file_digest(path)
+    _digest_memo[memo_key] = value
+    if enabled():
+        _store_memo(memo_key, value)
+    return value
+
+
+def cache_key(media_path, model: str, engine: str, language: str | None = None) -> str:
+    parts = [media_digest(media_path), engine, model, language or "auto"]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> Path:
+    return cache_dir() / key[:2] / f"{key}.json"
+
+
+def load(key: str):
+    """Resultado salvo para a chave (dict text/segments/language) ou None."""
+    if not enabled():
+        return None
+    path = _entry_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        os.utime(path)  # mtime marca o último uso (ordem da remoção por LRU)
+    except (OSError, ValueError):
+        return None
+    return entry.get("result")
+
+
+def store(key: str, result: dict, model: str, engine: str, language: str | None = None) -> None:
+    """Grava o resultado de forma atômica e aplica o limite de tamanho."""
+    if not enabled():
+        return
+    path = _entry_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "engine": engine,
+        "model": model,
+        "language": language or "auto",
+        "created_at": time.time(),
+        "result": {
+            "text": result.get("text") or "",
+            "segments": [
+                {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+                for seg in result.get("segments") or []
+            ],
+            "language": result.get("language"),
+        },
+    }
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    evict()
+
+
+def evict(limit: int | None = None) -> int:
+    """Remove as entradas mais antigas (por último uso) até caber no limite.
+
+    Retorna quantos bytes foram liberados."""
+    limit = max_bytes() if limit is None else limit
+    root = cache_dir()
+    if not root.is_dir():
+        return 0
+    entries = []
+    total = 0
+    for path in root.glob("*/*.json"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    freed = 0
+    for _mtime, size, path in sorted(entries):
+        if total - freed <= limit:
+            break
+        try:
+            path.unlink()
+            freed += size
+        except OSError:
+            pass
+    return freed
@@ -9,8 +9,29 @@ sem dependência de torch. Mantém o ponto único de carga do modelo, com:
 Expõe um adapter compatível com a interface dict do openai-whisper
 (result["text"], result["segments"], result["language"]) para não quebrar os
 chamadores existentes (vdl.py usa ["text"]; subtitles.py usa ["segments"]/["language"]).
+
+Modo em pedaços (workers > 1, CPU): o áudio é decodificado a 16 kHz, cortado
+nos trechos mais silenciosos perto de cada fronteira e transcrito em paralelo
+num pool de processos (cada worker com o próprio modelo CTranslate2). Os
+segmentos voltam com timestamps deslocados para a posição original.
+
+Áudio: qualquer mídia (vídeo ou áudio) é decodificada pelo ffmpeg direto
+para PCM float32 mono 16 kHz num pipe (decode_audio_pcm), sem mp3/wav
+intermediário em disco nem uma segunda decodificação.
+
+Servidor residente (_transcription_server.py): quando o socket Unix
+VDL_TRANSCRIBE_SOCKET responde, load_whisper_model devolve um adapter remoto
+que envia o caminho do áudio ao servidor, que mantém os modelos já carregados
+entre jobs. Sem servidor, o modelo é carregado no próprio processo.
 """
+import json
+import multiprocessing
 import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
 # Mapeia os nomes do seletor do Studio (tiny|base|small|medium|large) para os
 # checkpoints do faster-whisper. 'large' -> 'large-v3' (melhor qualidade atual).
@@ -18,6 +39,18 @@ _MODEL_ALIASES = {
     "large": "large-v3",
 }
 
+SAMPLE_RATE = 16000
+# Cauda do stderr do ffmpeg mantida na mensagem de erro do decode.
+_STDERR_TAIL_BYTES = 4000
+
+# Tamanho alvo de cada pedaço no modo paralelo e a janela (para cada lado da
+# fronteira) em que procuramos o ponto mais silencioso para cortar.
+_CHUNK_SECONDS = int(os.getenv("VDL_WHISPER_CHUNK_SECONDS", "300"))
+_SILENCE_SEARCH_SECONDS = 15
+_FRAME_SECONDS = 0.03
+
+DEFAULT_SERVER_SOCKET = "/tmp/vdl-transcribe.sock"
+
 
 def _cuda_available() -> bool:
     """CUDA disponível sem depender de torch (faster-whisper usa CTranslate2)."""
@@ -28,6 +61,46 @@ def _cuda_available() -> bool:
         return False
 
 
+def decode_audio_pcm(media_path):
+    """Decodifica o áudio da mídia via ffmpeg para um array float32 mono 16 kHz.
+
+    O ffmpeg escreve PCM cru (f32le) no stdout, lido em blocos para um buffer
+    que vira o array sem cópia. Substitui o antigo mp3/wav intermediário:
+    nada é gravado em disco e o áudio é decodificado uma única vez.
+    """
+    import numpy as np
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("Dependência não encontrada: 'ffmpeg'.")
+    command = [
+        ffmpeg, "-nostdin", "-loglevel", "error", "-i", str(media_path),
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "pipe:1",
+    ]
+    buffer = bytearray()
+    # stderr vai para um arquivo, não para um pipe: com avisos de decodificação
+    # além do buffer do pipe (~64 KB) o ffmpeg travaria escrevendo nele enquanto
+    # lemos o stdout. Da mensagem de erro fica só a cauda.
+    with tempfile.TemporaryFile() as errors:
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors) as process:
+            for block in iter(lambda: process.stdout.read(1024 * 1024), b""):
+                buffer += block
+            returncode = process.wait()
+        if returncode != 0:
+            errors.seek(max(0, errors.seek(0, os.SEEK_END) - _STDERR_TAIL_BYTES))
+            stderr = errors.read().decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"ffmpeg falhou ao decodificar '{media_path}' (rc={returncode}): {stderr}")
+    usable = len(buffer) - len(buffer) % 4
+    return np.frombuffer(buffer, dtype=np.float32, count=usable // 4)
+
+
+def _as_audio(audio):
+    """Aceita caminho de mídia ou array já decodificado."""
+    if isinstance(audio, (str, os.PathLike)):
+        return decode_audio_pcm(audio)
+    return audio
+
+
 class _WhisperResultAdapter:
     """Adapta faster_whisper.WhisperModel à interface dict do openai-whisper."""
 
@@ -37,7 +110,7 @@ class _WhisperResultAdapter:
     def transcribe(self, audio_path, **_ignored):
         # Ignora kwargs do openai-whisper (fp16=, verbose=) que o faster-whisper
         # não aceita. segments é um gerador preguiçoso: iterar executa a transcrição.
-        segments, info = self._model.transcribe(str(audio_path), beam_size=5)
+        segments, info = self._model.transcribe(_as_audio(audio_path), beam_size=5)
         seg_list = []
         parts = []
         for seg in segments:
@@ -49,25 +122,219 @@ class _WhisperResultAdapter:
             "language": info.language,
         }
 
+    def close(self) -> None:
+        """Nada a liberar: o modelo vive no próprio processo."""
+
+
+def resolve_workers(workers=None) -> int:
+    """Número de processos do modo em pedaços (None -> VDL_WHISPER_WORKERS, padrão 1)."""
+    if workers is None:
+        try:
+            workers = int(os.getenv("VDL_WHISPER_WORKERS", "1"))
+        except ValueError:
+            workers = 1
+    return max(1, int(workers))
+
+
+def split_on_silence(audio, chunk_seconds: int = _CHUNK_SECONDS,
+                     search_seconds: int = _SILENCE_SEARCH_SECONDS):
+    """Retorna os offsets (em amostras) de corte do áudio 16 kHz mono.
+
+    Para cada fronteira de ~chunk_seconds, escolhe o frame de menor energia
+    dentro de ±search_seconds, evitando cortar no meio de uma palavra. A lista
+    começa em 0 e termina em len(audio).
+    """
+    import numpy as np
+
+    total = len(audio)
+    chunk = chunk_seconds * SAMPLE_RATE
+    if total <= chunk + chunk // 2:
+        return [0, total]
+
+    frame = int(_FRAME_SECONDS * SAMPLE_RATE)
+    frames = total // frame
+    energy = np.sqrt(np.mean(np.square(audio[: frames * frame].reshape(frames, frame)), axis=1))
+    # Janela limitada a meio pedaço: maior que isso, o corte poderia recuar
+    # até o anterior e gerar pedaços de um frame só.
+    window = min(search_seconds * SAMPLE_RATE, chunk // 2) // frame
+
+    cuts = [0]
+    target = chunk
+    while total - target > chunk // 2:
+        center = target // frame
+        lo = max(cuts[-1] // frame + 1, center - window)
+        hi = min(frames, center + window)
+        cut = (lo + int(np.argmin(energy[lo:hi]))) * frame if hi > lo else target
+        cuts.append(cut)
+        target = cut + chunk
+    cuts.append(total)
+    return cuts
+
+
+# --- Estado por processo do pool (cada worker carrega o seu modelo) ---
+_worker_model = None
+
+
+def _init_worker(name: str, kwargs: dict) -> None:
+    global _worker_model
+    from faster_whisper import WhisperModel
+    _worker_model = WhisperModel(name, **kwargs)
+
+
+def _worker_ready() -> bool:
+    return _worker_model is not None
+
+
+def _worker_detect_language(audio):
+    # info é preenchido antes de iterar os segmentos: detecção sem decodificar.
+    _segments, info = _worker_model.transcribe(audio, beam_size=5)
+    return info.language
+
+
+def _worker_transcribe(audio, offset: float, language):
+    segments, info = _worker_model.transcribe(audio, beam_size=5, language=language)
+    return [
+        {"start": seg.start + offset, "end": seg.end + offset, "text": seg.text}
+        for seg in segments
+    ], info.language
+
+
+class _ChunkedWhisperAdapter:
+    """Mesma interface do _WhisperResultAdapter, mas transcreve em pedaços paralelos.
+
+    O pool é criado uma vez e reaproveitado entre arquivos (modo --local com
+    diretório). O idioma é detectado uma única vez no início do áudio e fixado
+    em todos os pedaços, para que trechos curtos não "troquem" de idioma.
+    """
 
-def load_whisper_model(model_name: str, use_gpu: bool = False):
+    def __init__(self, name: str, kwargs: dict, workers: int):
+        self.workers = workers
+        ctx = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(name, kwargs),
+        )
+        # Falha de carga do modelo no worker aparece aqui, e não no 1º arquivo.
+        self._pool.submit(_worker_ready).result()
+
+    def transcribe(self, audio_path, **_ignored):
+        audio = _as_audio(audio_path)
+        cuts = split_on_silence(audio)
+        language = self._pool.submit(_worker_detect_language, audio[: 30 * SAMPLE_RATE]).result()
+        futures = [
+            self._pool.submit(_worker_transcribe, audio[start:end], start / SAMPLE_RATE, language)
+            for start, end in zip(cuts, cuts[1:])
+        ]
+        seg_list = []
+        for future in futures:
+            segments, _lang = future.result()
+            seg_list.extend(segments)
+        return {
+            "text": "".join(seg["text"] for seg in seg_list).strip(),
+            "segments": seg_list,
+            "language": language,
+        }
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+
+
+def server_socket_path() -> str:
+    return os.getenv("VDL_TRANSCRIBE_SOCKET", DEFAULT_SERVER_SOCKET)
+
+
+def server_request(payload: dict, socket_path: str | None = None, timeout: float | None = None) -> dict:
+    """Envia um pedido (uma linha JSON) ao servidor de transcrição e lê a resposta."""
+    path = socket_path or server_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with sock.makefile("r", encoding="utf-8") as reader:
+            line = reader.readline()
+    if not line:
+        raise RuntimeError("Servidor de transcrição encerrou a conexão sem resposta.")
+    return json.loads(line)
+
+
+def server_available(socket_path: str | None = None) -> bool:
+    """True se há um servidor de transcrição respondendo no socket."""
+    if os.getenv("VDL_TRANSCRIBE_SERVER", "1") == "0":
+        return False
+    path = socket_path or server_socket_path()
+    if not os.path.exists(path):
+        return False
+    try:
+        return bool(server_request({"op": "ping"}, path, timeout=2).get("ok"))
+    except (OSError, ValueError):
+        return False
+
+
+class _RemoteWhisperAdapter:
+    """Mesma interface do _WhisperResultAdapter, executada no servidor residente."""
+
+    remote = True
+
+    def __init__(self, socket_path: str, model_name: str, use_gpu: bool, workers: int):
+        self._socket_path = socket_path
+        self._request = {"model": model_name, "use_gpu": use_gpu, "workers": workers}
+        self.workers = workers
+
+    def _call(self, op: str, **extra) -> dict:
+        response = server_request({"op": op, **self._request, **extra}, self._socket_path)
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error") or "Falha no servidor de transcrição.")
+        return response
+
+    def load(self) -> str:
+        """Garante o modelo carregado no servidor e devolve o device usado."""
+        return self._call("load")["device"]
+
+    def transcribe(self, audio_path, **_ignored):
+        return self._call("transcribe", audio_path=os.path.abspath(str(audio_path)))["result"]
+
+    def close(self) -> None:
+        """O modelo continua quente no servidor para o próximo job."""
+
+
+def resolve_runtime(model_name: str, use_gpu: bool = False):
+    """Retorna (checkpoint, device, compute_type) para o modelo pedido."""
+    device = "cuda" if use_gpu and _cuda_available() else "cpu"
+    compute_type = "float16" if device == "cuda" else "int8"
+    return _MODEL_ALIASES.get(model_name, model_name), device, compute_type
+
+
+def load_whisper_model(model_name: str, use_gpu: bool = False, workers=None, use_server: bool = True):
     """Carrega o modelo via faster-whisper. Retorna (adapter, device).
 
     use_gpu=True com CUDA disponível -> device='cuda'; caso contrário, CPU.
     Respeita VDL_WHISPER_CACHE como download_root (cache persistente em Docker).
+    workers > 1 (ou VDL_WHISPER_WORKERS) em CPU ativa o modo em pedaços
+    paralelos; em CUDA o modelo já satura a GPU e segue com um único stream.
+    Com use_server=True e o servidor residente no ar, nada é carregado aqui:
+    o adapter remoto reaproveita o modelo quente do servidor.
     """
+    workers = resolve_workers(workers)
+    if use_server and server_available():
+        adapter = _RemoteWhisperAdapter(server_socket_path(), model_name, use_gpu, workers)
+        return adapter, adapter.load()
+
     try:
         from faster_whisper import WhisperModel
     except ImportError as e:
         raise RuntimeError(f"Dependências de transcrição ausentes: {e}")
 
-    device = "cuda" if use_gpu and _cuda_available() else "cpu"
-    compute_type = "float16" if device == "cuda" else "int8"
-    name = _MODEL_ALIASES.get(model_name, model_name)
+    name, device, compute_type = resolve_runtime(model_name, use_gpu)
     kwargs = {"device": device, "compute_type": compute_type}
     cache_dir = os.getenv("VDL_WHISPER_CACHE")
     if cache_dir:
         kwargs["download_root"] = cache_dir
+    if device == "cpu" and workers > 1:
+        # Divide os núcleos entre os workers para não disputarem CPU.
+        kwargs["cpu_threads"] = max(1, (os.cpu_count() or 1) // workers)
+        return _ChunkedWhisperAdapter(name, kwargs, workers), device
     model = WhisperModel(name, **kwargs)
     return _WhisperResultAdapter(model), device
 
@@ -7,8 +7,8 @@ servidor/Docker (Linux), que continua no faster-whisper (`_transcription.py`):
 este módulo só roda como __main__, disparado pelo vdl-trans no Mac.
 
 Mantém o MESMO layout de saída do vdl.py (reutilizando `vdl.extract_audio`):
-  <dest>/mp3/<nome>.mp3             (áudio extraído — mono 16 kHz)
   <dest>/transcriptions/<nome>.txt  (transcrição em texto puro)
+  <dest>/mp3/<nome>.mp3             (só com --keep-audio — mono 16 kHz)
 
 Aceita arquivo OU pasta (busca recursiva), espelhando o modo --local do vdl.py.
 """
@@ -20,6 +20,7 @@ from pathlib import Path
 # Reutiliza extração de áudio e helpers de log do vdl.py (mesmo repositório).
 # Importar 'vdl' como módulo é seguro: define funções e não executa main().
 import vdl
+import _transcript_cache
 
 # Mesmas extensões que o vdl.py varre no modo --local com diretório.
 _VIDEO_EXTS = {".mp4", ".mkv", ".mov", ".webm", ".m4v"}
@@ -41,13 +42,17 @@ def _resolve_repo(model_name):
     return os.getenv("VDL_MLX_MODEL") or _MLX_MODELS.get(model_name, model_name)
 
 
-def transcribe_one(transcribe_fn, video_path, output_dir, repo):
-    """Extrai o áudio (via vdl.extract_audio) e transcreve com mlx-whisper.
+def transcribe_one(transcribe_fn, video_path, output_dir, repo, keep_audio=False):
+    """Transcreve o vídeo com mlx-whisper (que decodifica via pipe do ffmpeg).
+
+    O mp3 em <dest>/mp3 só é extraído (via vdl.extract_audio) com keep_audio.
+
+    Consulta antes o cache de transcrições compartilhado com o vdl.py (chave:
+    hash do vídeo + engine 'mlx-whisper' + repo do modelo).
 
     Retorna o texto (str, possivelmente vazio para áudio sem fala) ou None se
     a extração/transcrição falhar — mesma semântica do vdl.py."""
-    audio_path = vdl.extract_audio(video_path, output_dir)
-    if not audio_path:
+    if keep_audio and not vdl.extract_audio(video_path, output_dir):
         vdl.print_error(f"Pulado por falha na extração de áudio: {video_path}")
         return None
 
@@ -55,11 +60,18 @@ def transcribe_one(transcribe_fn, video_path, output_dir, repo):
     os.makedirs(transcription_dir, exist_ok=True)
     transcription_path = os.path.join(
         transcription_dir,
-        os.path.basename(os.path.splitext(audio_path)[0] + ".txt"),
+        os.path.basename(os.path.splitext(video_path)[0] + ".txt"),
     )
     vdl.print_info(f"Iniciando a transcrição LOCAL (mlx/GPU) para: {transcription_path}")
     try:
-        result = transcribe_fn(audio_path, path_or_hf_repo=repo)
+        cache_key = vdl._transcript_cache_key(video_path, repo, "mlx-whisper")
+        result = _transcript_cache.load(cache_key) if cache_key else None
+        if result is not None:
+            vdl.print_info("Transcrição encontrada no cache (mesmo conteúdo, modelo e engine).")
+        else:
+            result = transcribe_fn(video_path, path_or_hf_repo=repo)
+            if cache_key:
+                _transcript_cache.store(cache_key, result, repo, "mlx-whisper")
         text = (result.get("text") or "").strip()
         with open(transcription_path, "w", encoding="utf-8") as f:
             f.write(text)
@@ -77,6 +89,7 @@ def main():
     )
     parser.add_argument("input", help="Arquivo de vídeo ou pasta (busca recursiva).")
     parser.add_argument("-d", "--directory", default=".", help="Diretório de saída.")
+    parser.add_argument("--keep-audio", action="store_true", help="Arquiva também o áudio em <dir>/mp3.")
     parser.add_argument(
         "--whisper-model", default="large",
         choices=["tiny", "base", "small", "medium", "large"],
@@ -119,14 +132,14 @@ def main():
         ok = 0
         for idx, vp in enumerate(videos, start=1):
             vdl.print_info(f"[{idx}/{len(videos)}] Processando: {vp}")
-            if transcribe_one(mlx_transcribe, vp, dest, repo) is not None:
+            if transcribe_one(mlx_transcribe, vp, dest, repo, args.keep_audio) is not None:
                 ok += 1
         if ok == 0:
             vdl.print_error("Nenhum vídeo transcrito com sucesso.")
             sys.exit(1)
     elif os.path.isfile(inp):
         vdl.print_info(f"Engine: mlx-whisper (GPU) · modelo: {repo}")
-        if transcribe_one(mlx_transcribe, inp, dest, repo) is None:
+        if transcribe_one(mlx_transcribe, inp, dest, repo, args.keep_audio) is None:
             vdl.print_error("Transcrição local (mlx) falhou: nenhum texto gerado.")
             sys.exit(1)
     else:
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Servidor residente de transcrição (faster-whisper) via socket Unix.
+
+Roda dentro do container worker e mantém os modelos carregados entre jobs:
+cada `vdl --local` / `subtitles` disparado pelo Studio deixa de pagar a carga
+do modelo (segundos; dezenas de segundos no large-v3) a cada arquivo.
+
+Protocolo: uma linha JSON por conexão, uma linha JSON de resposta.
+  {"op": "ping"}
+  {"op": "load", "model": "base", "use_gpu": false, "workers": 1}
+  {"op": "transcribe", "model": ..., "use_gpu": ..., "workers": ..., "audio_path": "/data/..."}
+Resposta: {"ok": true, ...} ou {"ok": false, "error": "..."}.
+
+Os modelos ficam num LRU chaveado por (modelo, device, compute_type, workers),
+limitado por VDL_TRANSCRIBE_MAX_MODELS (padrão 2). Os clientes usam o servidor
+automaticamente via _transcription.load_whisper_model quando o socket responde.
+"""
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import _transcription  # noqa: E402
+
+
+class _Entry:
+    """Modelo do LRU: carregado uma vez, contado por uso e fechado sem usuários."""
+
+    def __init__(self) -> None:
+        self.ready = threading.Event()
+        self.model = None
+        self.device = None
+        self.error: Exception | None = None
+        # Serializa transcrições no mesmo modelo (CTranslate2 já usa todos os
+        # núcleos por chamada).
+        self.lock = threading.Lock()
+        self.users = 0
+        self.evicted = False
+
+
+class ModelCache:
+    """LRU de modelos carregados.
+
+    A carga (dezenas de segundos no large-v3) roda fora do lock global: outros
+    modelos continuam atendendo e quem pede o mesmo modelo espera o evento da
+    entrada. Cada uso conta uma referência; um modelo despejado do LRU só é
+    fechado quando o último pedido em curso termina.
+    """
+
+    def __init__(self, max_models: int) -> None:
+        self.max_models = max(1, max_models)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+
+    @contextmanager
+    def use(self, model_name: str, use_gpu: bool, workers: int):
+        """Entrada pronta do modelo pedido, reservada durante o bloco `with`."""
+        entry = self._acquire(model_name, use_gpu, workers)
+        try:
+            yield entry
+        finally:
+            self._release(entry)
+
+    def _acquire(self, model_name: str, use_gpu: bool, workers: int) -> _Entry:
+        name, device, compute_type = _transcription.resolve_runtime(model_name, use_gpu)
+        key = (name, device, compute_type, workers)
+        with self._lock:
+            entry = self._entries.get(key)
+            loader = entry is None
+            if loader:
+                entry = self._entries[key] = _Entry()
+            else:
+                self._entries.move_to_end(key)
+            entry.users += 1
+        if loader:
+            _log(f"Carregando modelo {name} (device={device}, compute_type={compute_type}, workers={workers})...")
+            try:
+                entry.model, entry.device = _transcription.load_whisper_model(
+                    model_name, use_gpu=use_gpu, workers=workers, use_server=False,
+                )
+            except Exception as e:
+                entry.error = e
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+            entry.ready.set()
+            if entry.error is None:
+                self._evict(key)
+        else:
+            entry.ready.wait()
+        if entry.error is not None:
+            self._release(entry)
+            raise entry.error
+        return entry
+
+    def _evict(self, keep: tuple) -> None:
+        idle = []
+        with self._lock:
+            for key in list(self._entries):
+                if len(self._entries) <= self.max_models:
+                    break
+                if key == keep:
+                    continue
+                entry = self._entries.pop(key)
+                entry.evicted = True
+                _log(f"Descarregando modelo {key[0]} (LRU).")
+                if entry.users == 0:
+                    idle.append(entry)
+        for entry in idle:
+            self._close(entry)
+
+    def _release(self, entry: _Entry) -> None:
+        with self._lock:
+            entry.users -= 1
+            idle = entry.evicted and entry.users == 0
+        if idle:
+            self._close(entry)
+
+    @staticmethod
+    def _close(entry: _Entry) -> None:
+        entry.ready.wait()
+        if entry.model is not None:
+            entry.model.close()
+
+
+def _log(message: str) -> None:
+    print(f"[vdl-transcribed] {message}", flush=True)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            response = self._dispatch(request)
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def _dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        cache: ModelCache = self.server.models
+        with cache.use(
+            str(request.get("model") or "base"),
+            bool(request.get("use_gpu")),
+            _transcription.resolve_workers(request.get("workers")),
+        ) as entry:
+            if op == "load":
+                return {"ok": True, "device": entry.device}
+            if op == "transcribe":
+                audio_path = request.get("audio_path")
+                if not audio_path or not os.path.isfile(audio_path):
+                    return {"ok": False, "error": f"Arquivo de áudio não encontrado: {audio_path}"}
+                _log(f"Transcrevendo: {audio_path}")
+                with entry.lock:
+                    result = entry.model.transcribe(audio_path)
+                return {"ok": True, "result": result}
+        return {"ok": False, "error": f"Operação inválida: {op}"}
+
+
+class TranscriptionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, max_models: int) -> None:
+        self.models = ModelCache(max_models)
+        super().__init__(socket_path, _Handler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="vdl-transcribed",
+        description="Servidor residente de transcrição (modelos Whisper quentes via socket Unix).",
+    )
+    parser.add_argument("--socket", default=_transcription.server_socket_path(), help="Caminho do socket Unix.")
+    parser.add_argument(
+        "--max-models", type=int, default=int(os.getenv("VDL_TRANSCRIBE_MAX_MODELS", "2")),
+        help="Quantidade máxima de modelos mantidos carregados (LRU).",
+    )
+    parser.add_argument("--preload", default=None, help="Modelo a carregar já na subida (ex.: base).")
+    args = parser.parse_args()
+
+    # Idempotente: outra instância já atendendo no socket -> nada a fazer.
+    if _transcription.server_available(args.socket):
+        _log(f"Servidor já ativo em {args.socket}.")
+        return
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)  # socket órfão de uma execução anterior
+
+    server = TranscriptionServer(args.socket, args.max_models)
+    os.chmod(args.socket, 0o660)
+    if args.preload:
+        with server.models.use(args.preload, use_gpu=False, workers=_transcription.resolve_workers(None)):
+            pass
+    _log(f"Escutando em {args.socket} (até {server.models.max_models} modelo(s) em memória).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
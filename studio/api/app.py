@@ -1,19 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import mimetypes
 import os
 from pathlib import Path
 from typing import Literal
 
-from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
 from auth import AuthError, AuthManager
+from events import EventHub, RuntimeStatusPublisher, format_sse
 from orchestrator import (
     FileExplorer,
     JobManager,
+    MAX_JOBS_PAGE,
+    MAX_WHISPER_WORKERS,
     LocalProcessingMode,
     RuntimeMode,
     RuntimeOrchestrator,
@@ -36,7 +40,10 @@ app.add_middleware(
 
 orchestrator = RuntimeOrchestrator(PROJECT_ROOT)
 files = FileExplorer(DATA_ROOT)
-jobs = JobManager(DATA_ROOT, orchestrator)
+events = EventHub()
+jobs = JobManager(DATA_ROOT, orchestrator, events=events)
+runtime_events = RuntimeStatusPublisher(events, orchestrator.status)
+orchestrator.monitor.add_listener(runtime_events.publish_if_changed)
 auth_manager = AuthManager(STATE_DIR)
 
 
@@ -114,6 +121,11 @@ class BatchDownloadRequest(BaseModel):
     concurrency: int = Field(default=1, ge=1, le=4)
     processing_mode: Literal["download", "transcribe", "context", "unified"] = "download"
     filenames: list[str] = Field(default_factory=list)
+    priority: int = Field(default=0, ge=-10, le=10)
+    # -N do yt-dlp por job; "auto" ajusta pela vazao e recua em 429/403.
+    concurrent_fragments: int | Literal["auto"] = 1
+    # False: baixa so o audio (transcricao/contexto sem o arquivo de video).
+    keep_video: bool = True
 
 
 class LocalTranscriptionRequest(BaseModel):
@@ -124,6 +136,8 @@ class LocalTranscriptionRequest(BaseModel):
     processing_mode: LocalProcessingMode = "transcribe"
     use_gpu: bool = False
     whisper_model: Literal["tiny", "base", "small", "medium", "large"] = "base"
+    whisper_workers: int = Field(default=1, ge=1, le=MAX_WHISPER_WORKERS)
+    priority: int = Field(default=0, ge=-10, le=10)
 
 
 @app.get("/api/health")
@@ -208,6 +222,9 @@ def create_download_batch(request: BatchDownloadRequest) -> dict[str, object]:
             concurrency=request.concurrency,
             processing_mode=request.processing_mode,
             filenames=request.filenames,
+            priority=request.priority,
+            concurrent_fragments=request.concurrent_fragments,
+            keep_video=request.keep_video,
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -224,6 +241,8 @@ def create_local_transcription_batch(request: LocalTranscriptionRequest) -> dict
             processing_mode=request.processing_mode,
             use_gpu=request.use_gpu,
             whisper_model=request.whisper_model,
+            whisper_workers=request.whisper_workers,
+            priority=request.priority,
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -237,6 +256,10 @@ class RenameJobRequest(BaseModel):
     new_name: str
 
 
+class BatchPriorityRequest(BaseModel):
+    priority: int = Field(ge=-10, le=10)
+
+
 @app.post("/api/jobs/batch/{batch_id}/job/{job_id}/retry", dependencies=[Depends(require_auth)])
 def retry_job(batch_id: str, job_id: str, request: RetryBatchRequest | None = None) -> dict[str, object]:
     try:
@@ -265,6 +288,19 @@ def cancel_batch(batch_id: str) -> dict[str, object]:
         raise HTTPException(status_code=404, detail="Lote nao encontrado.") from exc
 
 
+@app.post("/api/jobs/batch/{batch_id}/priority", dependencies=[Depends(require_auth)])
+def set_batch_priority(batch_id: str, request: BatchPriorityRequest) -> dict[str, object]:
+    try:
+        return jobs.set_batch_priority(batch_id, request.priority)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Lote nao encontrado.") from exc
+
+
+@app.get("/api/scheduler", dependencies=[Depends(require_auth)])
+def scheduler_status() -> dict[str, object]:
+    return jobs.scheduler_status()
+
+
 @app.post("/api/jobs/batch/{batch_id}/retry", dependencies=[Depends(require_auth)])
 def retry_batch(batch_id: str, request: RetryBatchRequest | None = None) -> dict[str, object]:
     try:
@@ -286,5 +322,75 @@ def delete_batch(batch_id: str, force: bool = False) -> dict[str, object]:
 
 
 @app.get("/api/jobs", dependencies=[Depends(require_auth)])
-def list_jobs() -> dict[str, object]:
-    return jobs.list_batches()
+def list_jobs(
+    request: Request,
+    status: str | None = None,
+    mode: RuntimeMode | None = None,
+    job_type: Literal["download", "local"] | None = None,
+    created_after: str | None = None,
+    created_before: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=MAX_JOBS_PAGE),
+    logs: bool = False,
+    if_none_match: str | None = Header(default=None),
+) -> Response:
+    """Lotes paginados (resumo sem logs por padrao) com GET condicional via ETag."""
+    etag = jobs.etag(str(request.query_params))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in {item.strip() for item in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    try:
+        payload = jobs.list_batches(
+            status=status,
+            mode=mode,
+            job_type=job_type,
+            created_after=created_after,
+            created_before=created_before,
+            cursor=cursor,
+            limit=limit,
+            include_logs=logs,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return JSONResponse(payload, headers=headers)
+
+
+@app.get("/api/jobs/batch/{batch_id}/job/{job_id}/logs", dependencies=[Depends(require_auth)])
+def job_logs(batch_id: str, job_id: str) -> dict[str, object]:
+    try:
+        return jobs.job_logs(batch_id, job_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Job nao encontrado.") from exc
+
+
+@app.get("/api/events")
+async def event_stream(request: Request, token: str | None = None) -> StreamingResponse:
+    """Stream SSE com os deltas de jobs/lotes e mudancas de status do runtime."""
+    # EventSource nao envia header Authorization: token por query param (como no preview).
+    if not auth_manager.validate(token):
+        raise HTTPException(status_code=401, detail="Nao autenticado.")
+    subscription = events.subscribe()
+    runtime_events.ensure_running()
+
+    async def stream():
+        try:
+            # "hello" marca a (re)conexao: o cliente recarrega /api/jobs uma vez e
+            # dai em diante so aplica deltas.
+            yield format_sse({"type": "hello", "version": jobs.version})
+            if runtime_events.latest is not None:
+                yield format_sse({"type": "runtime", "status": runtime_events.latest})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
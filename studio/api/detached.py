@@ -0,0 +1,156 @@
+"""Execucao destacada dos jobs no worker, independente da vida da API.
+
+Antes o job era um `docker exec` preso a conexao da API: um restart/redeploy
+derrubava o stream e `_reconcile_orphans_on_load` marcava tudo como
+'interrupted', perdendo horas de download/transcricao.
+
+Agora o job roda via `docker exec -d` dentro de um wrapper `sh` que grava, no
+diretorio do job em <state_dir>/runs/<lote>/<job>:
+
+    meta.json    container, estagio e comando (gravado pela API antes do exec)
+    pid          PID do wrapper
+    output.log   stdout+stderr do vdl
+    exit         codigo de saida (escrito por ultimo, via rename atomico)
+
+A API acompanha o output.log (cauda + progresso ao vivo) e espera o `exit`. No
+boot, um job 'running' com esse diretorio e reatado: se o `exit` ja existe o
+resultado e coletado; se o wrapper ainda esta vivo a API volta a segui-lo.
+
+O state_dir precisa estar no mesmo caminho na API e nos workers (o compose
+monta ./data em /data nos dois lados e usa /data/.vdl-studio-web).
+"""
+from __future__ import annotations
+
+import codecs
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+WRAPPER_NAME = "vdl-studio-job"
+# TERM/INT tem handler (nao sao ignorados, entao o vdl recebe o sinal normalmente)
+# para o wrapper sobreviver a um `pkill -f` do cancelamento e ainda gravar o exit.
+_WRAPPER_SCRIPT = (
+    'dir="$1"; shift; trap true TERM INT; echo $$ > "$dir/pid"; '
+    '"$@" > "$dir/output.log" 2>&1; code=$?; '
+    'echo "$code" > "$dir/exit.tmp" && mv "$dir/exit.tmp" "$dir/exit"'
+)
+LIVENESS_INTERVAL = 15.0
+
+
+def detached_command(run_dir: Path, command: list[str]) -> list[str]:
+    return ["sh", "-c", _WRAPPER_SCRIPT, WRAPPER_NAME, str(run_dir), *command]
+
+
+def liveness_command(pid: int) -> list[str]:
+    """Imprime "alive" se o PID ainda e o nosso wrapper (PID reciclado apos restart nao conta)."""
+    return ["sh", "-c", f'grep -q {WRAPPER_NAME} /proc/"$1"/cmdline 2>/dev/null && echo alive || echo gone', "sh", str(pid)]
+
+
+def kill_command(pid: int) -> list[str]:
+    """Encerra o job do wrapper: TERM nos filhos (o vdl) e KILL no wrapper, que ignora TERM.
+
+    So age se o PID ainda e o nosso wrapper (mesmo teste do liveness_command).
+    """
+    return [
+        "sh", "-c",
+        f'grep -q {WRAPPER_NAME} /proc/"$1"/cmdline 2>/dev/null || exit 0; pkill -TERM -P "$1"; kill -KILL "$1"',
+        "sh", str(pid),
+    ]
+
+
+def is_gone(stdout: str, stderr: str) -> bool:
+    """Resultado do liveness_command: so "gone" ou container inexistente/parado contam
+    como morto; erro transitorio do daemon mantem o acompanhamento."""
+    if "gone" in stdout:
+        return True
+    return "No such container" in stderr or "is not running" in stderr
+
+
+class RunDir:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.output_path = path / "output.log"
+
+    def prepare(self, meta: dict[str, Any]) -> None:
+        """Limpa restos de uma tentativa anterior e grava o meta.json."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    def meta(self) -> dict[str, Any] | None:
+        try:
+            return json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def pid(self) -> int | None:
+        return _read_int(self.path / "pid")
+
+    def exit_code(self) -> int | None:
+        return _read_int(self.path / "exit")
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def follow(
+        self,
+        on_output: Callable[[str, str], None],
+        is_alive: Callable[[int | None], bool],
+        timeout: float | None = None,
+        poll_interval: float = 0.5,
+        tail_bytes: int | None = None,
+    ) -> int | None:
+        """Entrega o output.log a `on_output` ate o `exit` aparecer.
+
+        Devolve o codigo de saida; None se o wrapper morreu sem grava-lo
+        (container reiniciado, processo morto com SIGKILL); 124 no `timeout`.
+        `tail_bytes` (reatar no boot) pula o inicio de um log ja longo.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        offset = 0
+        if tail_bytes is not None:
+            try:
+                offset = max(0, self.output_path.stat().st_size - tail_bytes)
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout if timeout else None
+        checked_at = time.monotonic()
+
+        def drain() -> None:
+            nonlocal offset
+            try:
+                with self.output_path.open("rb") as handle:
+                    handle.seek(offset)
+                    data = handle.read()
+            except OSError:
+                return
+            offset += len(data)
+            text = decoder.decode(data)
+            if text:
+                on_output("stdout", text)
+
+        while True:
+            code = self.exit_code()
+            drain()
+            if code is not None:
+                return code
+            now = time.monotonic()
+            if deadline is not None and now > deadline:
+                return 124
+            if now - checked_at >= LIVENESS_INTERVAL:
+                checked_at = now
+                if not is_alive(self.pid()):
+                    # O exit pode ter sido gravado entre a leitura e o teste.
+                    code = self.exit_code()
+                    drain()
+                    return code
+            time.sleep(poll_interval)
+
+
+def _read_int(path: Path) -> int | None:
+    try:
+        return int(path.read_text(encoding="utf-8").strip())
+    except (OSError, ValueError):
+        return None
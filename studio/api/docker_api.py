@@ -0,0 +1,311 @@
+"""Cliente minimo da Docker Engine API sobre o socket unix montado na API.
+
+Substitui o `docker` CLI nos caminhos quentes do Studio (inspect, exec, logs,
+events): cada chamada do CLI era um fork + processo Go + nova conexao com o
+daemon, e a saida do exec ficava toda em memoria ate o processo terminar.
+
+- Conexoes HTTP/1.1 keep-alive ficam num pool pequeno e sao reaproveitadas
+  entre inspects/criacoes de exec (uma conexao parada que o daemon fechou e
+  reaberta uma vez, de forma transparente).
+- `exec_run` usa uma conexao dedicada: o daemon "sequestra" o socket para o
+  stream multiplexado (cabecalho de 8 bytes por frame: stream, 0, 0, 0, tamanho).
+  Cada frame e entregue a `on_output` assim que chega.
+- `events` tambem usa conexao dedicada (stream JSON sem fim).
+
+Configuracao: DOCKER_HOST=unix:///caminho (padrao /var/run/docker.sock) e
+DOCKER_API_VERSION (padrao 1.41, Docker 20.10+), os mesmos do CLI.
+"""
+from __future__ import annotations
+
+import codecs
+import http.client
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+from urllib.parse import quote, urlencode
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+DEFAULT_API_VERSION = "1.41"
+_FRAME_HEADER = struct.Struct(">BxxxL")
+# Espera minima pelo ExitCode depois do fim do stream do exec (segundos).
+_EXIT_CODE_GRACE = 1.0
+
+
+class DockerAPIError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float | None = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerClient:
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET,
+        api_version: str = DEFAULT_API_VERSION,
+        pool_size: int = 8,
+        timeout: float = 60,
+    ) -> None:
+        self.socket_path = socket_path
+        self.prefix = f"/v{api_version.lstrip('v')}"
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: list[_UnixHTTPConnection] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> DockerClient | None:
+        """Cliente para o socket configurado, ou None se ele nao existir (usa o CLI)."""
+        host = os.getenv("DOCKER_HOST", "")
+        if host and not host.startswith("unix://"):
+            return None  # tcp/ssh: fica com o CLI, que ja sabe lidar com TLS/contextos
+        path = host.removeprefix("unix://") or DEFAULT_SOCKET
+        if not Path(path).exists():
+            return None
+        return cls(path, os.getenv("DOCKER_API_VERSION", DEFAULT_API_VERSION))
+
+    # --- operacoes -----------------------------------------------------------
+
+    def inspect(self, name: str) -> dict[str, Any] | None:
+        try:
+            return self._json("GET", f"/containers/{quote(name, safe='')}/json")
+        except DockerAPIError as exc:
+            if exc.status == 404:
+                return None
+            raise
+
+    def logs(self, name: str, tail: int) -> tuple[str, str]:
+        query = urlencode({"stdout": 1, "stderr": 1, "tail": tail})
+        _, body = self._request("GET", f"/containers/{quote(name, safe='')}/logs?{query}")
+        return _demux(body)
+
+    def exec_run(
+        self,
+        container: str,
+        command: list[str],
+        env: dict[str, str] | None = None,
+        detach: bool = False,
+        timeout: float | None = None,
+        on_output: Callable[[str, str], None] | None = None,
+        keep_chars: int = 65536,
+    ) -> tuple[int, str, str]:
+        """Executa `command` no container; devolve (exit_code, stdout, stderr).
+
+        `on_output(stream, texto)` recebe cada frame ("stdout"/"stderr") durante a
+        execucao; o retorno guarda so os ultimos `keep_chars` de cada stream.
+        `timeout` limita o tempo total (exit_code 124 ao estourar, como o
+        timeout(1)); o processo no container continua, como no CLI. Codigo de
+        saida que o daemon nao informou a tempo volta como -1 (falha).
+        """
+        spec = {
+            "Cmd": command,
+            "Env": [f"{key}={value}" for key, value in (env or {}).items()],
+            "AttachStdout": not detach,
+            "AttachStderr": not detach,
+            "Tty": False,
+        }
+        exec_id = self._json("POST", f"/containers/{quote(container, safe='')}/exec", spec)["Id"]
+        if detach:
+            self._request("POST", f"/exec/{exec_id}/start", {"Detach": True, "Tty": False})
+            return 0, "", ""
+
+        out = {"stdout": _Tail(keep_chars), "stderr": _Tail(keep_chars)}
+        deadline = time.monotonic() + timeout if timeout else None
+        conn = _UnixHTTPConnection(self.socket_path, timeout=_remaining(deadline, default=None))
+        try:
+            conn.request("POST", f"{self.prefix}/exec/{exec_id}/start", **_json_body({"Detach": False, "Tty": False}))
+            response = conn.getresponse()
+            if response.status >= 300:
+                raise DockerAPIError(response.status, _error_message(response.read()))
+            decoders = {"stdout": _decoder(), "stderr": _decoder()}
+            for stream, chunk in _frames(response):
+                if conn.sock is not None and deadline is not None:
+                    conn.sock.settimeout(_remaining(deadline, default=None))
+                text = decoders[stream].decode(chunk)
+                if text:
+                    out[stream].add(text)
+                    if on_output is not None:
+                        on_output(stream, text)
+        except (socket.timeout, TimeoutError):
+            out["stderr"].add("\n[timeout] tempo limite do exec excedido.")
+            return 124, out["stdout"].text(), out["stderr"].text()
+        finally:
+            conn.close()  # socket sequestrado pelo stream: nao volta ao pool
+        code = self._exec_exit_code(exec_id, deadline)
+        if code is None:
+            out["stderr"].add("\n[exec] o daemon nao informou o codigo de saida do exec.")
+            code = -1
+        return code, out["stdout"].text(), out["stderr"].text()
+
+    def events(self, filters: dict[str, list[str]]) -> Iterator[dict[str, Any]]:
+        """Stream de eventos do daemon (bloqueia ate o daemon encerrar a conexao)."""
+        conn = _UnixHTTPConnection(self.socket_path, timeout=None)
+        try:
+            conn.request("GET", f"{self.prefix}/events?{urlencode({'filters': json.dumps(filters)})}")
+            response = conn.getresponse()
+            if response.status >= 300:
+                raise DockerAPIError(response.status, _error_message(response.read()))
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    # --- transporte ----------------------------------------------------------
+
+    def _exec_exit_code(self, exec_id: str, deadline: float | None) -> int | None:
+        """ExitCode do exec; None se ainda rodando (ou sem codigo) ao fim da espera.
+
+        O stream acaba um instante antes de o daemon gravar o ExitCode: espera
+        ate o prazo do exec, e no minimo _EXIT_CODE_GRACE segundos.
+        """
+        until = max(deadline or 0.0, time.monotonic() + _EXIT_CODE_GRACE)
+        delay = 0.02
+        while True:
+            info = self._json("GET", f"/exec/{exec_id}/json") or {}
+            if not info.get("Running") and info.get("ExitCode") is not None:
+                return int(info["ExitCode"])
+            if time.monotonic() >= until:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def _json(self, method: str, path: str, body: Any = None) -> Any:
+        _, data = self._request(method, path, body)
+        return json.loads(data) if data else None
+
+    def _request(self, method: str, path: str, body: Any = None) -> tuple[int, bytes]:
+        for attempt in (1, 2):
+            conn, reused = self._acquire()
+            try:
+                conn.request(method, self.prefix + path, **_json_body(body))
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if reused and attempt == 1:
+                    continue  # keep-alive fechado pelo daemon enquanto estava parado
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            if response.status >= 300:
+                raise DockerAPIError(response.status, _error_message(data))
+            return response.status, data
+        raise AssertionError("unreachable")
+
+    def _acquire(self) -> tuple[_UnixHTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return _UnixHTTPConnection(self.socket_path, timeout=self.timeout), False
+
+    def _release(self, conn: _UnixHTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+class _Tail:
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._parts: deque[str] = deque()
+        self._size = 0
+
+    def add(self, text: str) -> None:
+        self._parts.append(text)
+        self._size += len(text)
+        while self._size > self.limit and len(self._parts) > 1:
+            self._size -= len(self._parts.popleft())
+
+    def text(self) -> str:
+        return "".join(self._parts)[-self.limit:]
+
+
+def _json_body(body: Any) -> dict[str, Any]:
+    if body is None:
+        return {}
+    return {"body": json.dumps(body).encode("utf-8"), "headers": {"Content-Type": "application/json"}}
+
+
+def _error_message(data: bytes) -> str:
+    try:
+        return str(json.loads(data).get("message") or data.decode("utf-8", "replace"))
+    except (ValueError, AttributeError):
+        return data.decode("utf-8", "replace").strip()
+
+
+def _remaining(deadline: float | None, default: float | None) -> float | None:
+    if deadline is None:
+        return default
+    return max(0.001, deadline - time.monotonic())
+
+
+def _decoder() -> codecs.IncrementalDecoder:
+    return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+def _read_exact(stream: Any, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _frames(stream: Any) -> Iterable[tuple[str, bytes]]:
+    """Frames (stream, payload) do formato multiplexado do docker (Tty=false)."""
+    while True:
+        header = _read_exact(stream, _FRAME_HEADER.size)
+        if len(header) < _FRAME_HEADER.size:
+            return
+        kind, size = _FRAME_HEADER.unpack(header)
+        payload = _read_exact(stream, size)
+        yield ("stderr" if kind == 2 else "stdout"), payload
+        if len(payload) < size:
+            return
+
+
+def _demux(body: bytes) -> tuple[str, str]:
+    """Separa stdout/stderr de um corpo multiplexado; containers com TTY mandam texto cru."""
+    if len(body) < _FRAME_HEADER.size or body[0] not in (0, 1, 2) or body[1:4] != b"\0\0\0":
+        return body.decode("utf-8", "replace"), ""
+    out: dict[str, bytearray] = {"stdout": bytearray(), "stderr": bytearray()}
+    offset = 0
+    while offset + _FRAME_HEADER.size <= len(body):
+        kind, size = _FRAME_HEADER.unpack_from(body, offset)
+        offset += _FRAME_HEADER.size
+        out["stderr" if kind == 2 else "stdout"] += body[offset:offset + size]
+        offset += size
+    return out["stdout"].decode("utf-8", "replace"), out["stderr"].decode("utf-8", "replace")
@@ -0,0 +1,114 @@
+"""Barramento de eventos para o stream SSE (/api/events) do VDL Studio.
+
+Os threads do JobManager publicam deltas (job alterado, lote criado/excluido,
+status do runtime) e cada conexao SSE tem sua propria fila asyncio, alimentada
+via call_soon_threadsafe: publicar nunca bloqueia o thread que executa o job.
+
+Um cliente lento cuja fila enche recebe um unico evento "resync" (a fila e
+esvaziada) e deve recarregar /api/jobs, em vez de segurar memoria sem limite.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int) -> None:
+        self.loop = loop
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=max_queue)
+
+    def push(self, event: dict[str, Any]) -> None:
+        """Executado no loop do assinante."""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+            return
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    def __init__(self, max_queue: int = 500) -> None:
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers: set[Subscription] = set()
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop | None = None) -> Subscription:
+        subscription = Subscription(loop or asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type: str, **data: Any) -> None:
+        event = {"type": event_type, **data}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # Loop encerrado (conexao caiu sem passar pelo unsubscribe).
+                self.unsubscribe(subscription)
+
+
+def format_sse(event: dict[str, Any]) -> str:
+    """Serializa um evento no formato text/event-stream."""
+    payload = json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event.get('type', 'message')}\ndata: {payload}\n\n"
+
+
+class RuntimeStatusPublisher:
+    """Consulta o status dos runtimes so enquanto ha assinantes SSE e publica
+    um evento "runtime" apenas quando o resultado muda."""
+
+    def __init__(self, hub: EventHub, status_fn: Callable[[], dict[str, Any]], interval: float = 6.0) -> None:
+        self.hub = hub
+        self.status_fn = status_fn
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._last: str | None = None
+        self.latest: dict[str, Any] | None = None
+
+    def ensure_running(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True, name="vdl-studio-runtime-events")
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            with self._lock:
+                if not self.hub.subscriber_count():
+                    self._thread = None
+                    return
+            self.publish_if_changed()
+            time.sleep(self.interval)
+
+    def publish_if_changed(self) -> None:
+        """Tambem chamado direto pelo ContainerMonitor quando um container muda."""
+        if not self.hub.subscriber_count():
+            return
+        try:
+            status = self.status_fn()
+        except Exception:
+            return
+        encoded = json.dumps({k: v for k, v in status.items() if k != "updated_at"}, sort_keys=True, default=str)
+        with self._lock:
+            if encoded == self._last:
+                return
+            self._last = encoded
+            self.latest = status
+        self.hub.publish("runtime", status=status)
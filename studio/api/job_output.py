@@ -0,0 +1,188 @@
+"""Saida ao vivo dos jobs: cauda limitada do log + progresso estruturado.
+
+O `docker exec` do job agora e lido em stream (SafeRunner.exec com
+on_output). Cada pedaco passa por um JobOutput, que:
+
+- guarda so as ultimas `max_chars` do log (as linhas mais antigas saem da
+  frente), em vez de acumular horas de saida ate o processo terminar;
+- trata linhas de progresso como um terminal: a cada nova linha de progresso
+  a anterior e substituida, entao o log nao vira milhares de "[download] x%";
+- extrai do yt-dlp (`[download]  12.5% of ~ 1.2GiB at 3.2MiB/s ETA 02:03
+  (frag 25/200)`) e do ffmpeg (`Duration:` + `time=... speed=1.2x`) um dict
+  de progresso, repassado a `on_progress` no maximo a cada `min_interval` s;
+- le as linhas do proprio vdl.py sobre fragmentos simultaneos do download
+  ("Fragmentos simultaneos: N" entra no progresso; a "Velocidade media do
+  download" final vira `download_stats`).
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+LOG_TAIL_CHARS = 12000
+
+_ANSI_RE = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+_YTDLP_PERCENT_RE = re.compile(r"^\[download\]\s+(\d+(?:\.\d+)?)%")
+_YTDLP_TOTAL_RE = re.compile(r"\bof\s+~?\s*(\d+(?:\.\d+)?)\s*([KMGT]?i?B)\b")
+_YTDLP_SPEED_RE = re.compile(r"\bat\s+(\d+(?:\.\d+)?)\s*([KMGT]?i?B)/s")
+_YTDLP_ETA_RE = re.compile(r"\bETA\s+(\d+(?::\d+){0,2})")
+_YTDLP_FRAG_RE = re.compile(r"\(frag\s+(\d+)/(\d+)\)")
+_FFMPEG_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_FFMPEG_TIME_RE = re.compile(r"\btime=\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_FFMPEG_SPEED_RE = re.compile(r"\bspeed=\s*(\d+(?:\.\d+)?)x")
+_FFMPEG_SIZE_RE = re.compile(r"\bsize=\s*(\d+)\s*(?:kB|KiB)")
+_VDL_FRAGMENTS_RE = re.compile(r"^\[INFO\] Fragmentos simult\u00e2neos: (\d+)")
+_VDL_AVERAGE_RE = re.compile(r"^\[INFO\] Velocidade m\u00e9dia do download: (\d+(?:\.\d+)?)\s*([KMGT]?i?B)/s \((\d+) fragmento")
+
+_UNITS = {
+    "B": 1,
+    "KB": 1000, "MB": 1000**2, "GB": 1000**3, "TB": 1000**4,
+    "KIB": 1024, "MIB": 1024**2, "GIB": 1024**3, "TIB": 1024**4,
+}
+
+
+def _to_bytes(amount: str, unit: str) -> int | None:
+    factor = _UNITS.get(unit.upper())
+    return int(float(amount) * factor) if factor else None
+
+
+def _clock_seconds(*parts: str) -> float:
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_progress(line: str, duration: float | None = None) -> dict[str, Any] | None:
+    """Progresso de uma linha do yt-dlp ou do ffmpeg; None se nao for linha de progresso.
+
+    `duration` (segundos, vindo da linha `Duration:` do ffmpeg) permite
+    calcular o percentual das linhas `time=`.
+    """
+    match = _YTDLP_PERCENT_RE.match(line)
+    if match:
+        progress: dict[str, Any] = {"source": "yt-dlp", "percent": float(match.group(1))}
+        if total := _YTDLP_TOTAL_RE.search(line):
+            progress["total_bytes"] = _to_bytes(*total.groups())
+        if speed := _YTDLP_SPEED_RE.search(line):
+            progress["speed_bps"] = _to_bytes(*speed.groups())
+        if eta := _YTDLP_ETA_RE.search(line):
+            progress["eta_seconds"] = int(_clock_seconds(*eta.group(1).split(":")))
+        if frag := _YTDLP_FRAG_RE.search(line):
+            progress["fragment"], progress["fragments"] = int(frag.group(1)), int(frag.group(2))
+        return progress
+    match = _FFMPEG_TIME_RE.search(line)
+    if match and "speed=" in line:
+        position = _clock_seconds(*match.groups())
+        progress = {"source": "ffmpeg", "position_seconds": round(position, 2)}
+        if duration:
+            progress["percent"] = round(min(100.0, position * 100 / duration), 1)
+        if speed := _FFMPEG_SPEED_RE.search(line):
+            progress["speed_factor"] = float(speed.group(1))
+            if duration and progress["speed_factor"] > 0:
+                progress["eta_seconds"] = int(max(0.0, duration - position) / progress["speed_factor"])
+        if size := _FFMPEG_SIZE_RE.search(line):
+            progress["downloaded_bytes"] = int(size.group(1)) * 1024
+        return progress
+    return None
+
+
+class LogTail:
+    """Ultimas `max_chars` de log, por linha; a linha corrente pode ser sobrescrita."""
+
+    def __init__(self, max_chars: int = LOG_TAIL_CHARS) -> None:
+        self.max_chars = max_chars
+        self._lines: deque[str] = deque()
+        self._size = 0
+
+    def add(self, line: str, replace_last: bool = False) -> None:
+        if replace_last and self._lines:
+            self._size -= len(self._lines.pop()) + 1
+        self._lines.append(line)
+        self._size += len(line) + 1
+        while self._size > self.max_chars and len(self._lines) > 1:
+            self._size -= len(self._lines.popleft()) + 1
+
+    def text(self) -> str:
+        return "\n".join(self._lines)[-self.max_chars:]
+
+
+class JobOutput:
+    def __init__(
+        self,
+        max_chars: int = LOG_TAIL_CHARS,
+        on_progress: Callable[[dict[str, Any]], None] | None = None,
+        min_interval: float = 1.0,
+    ) -> None:
+        self.on_progress = on_progress
+        self.min_interval = min_interval
+        self.progress: dict[str, Any] | None = None
+        self.download_stats: dict[str, Any] | None = None
+        self._tail = LogTail(max_chars)
+        self._lock = threading.Lock()
+        self._partial = {"stdout": "", "stderr": ""}
+        self._last_was_progress = False
+        self._duration: float | None = None
+        self._fragments: int | None = None
+        self._notified_at = 0.0
+        self._pending = False
+
+    def feed(self, stream: str, text: str) -> None:
+        """Recebe um pedaco cru do exec (pode cortar linhas no meio)."""
+        with self._lock:
+            data = self._partial.get(stream, "") + text
+            *lines, self._partial[stream] = data.split("\n")
+            for line in lines:
+                self._add_line_locked(line)
+        self._maybe_notify()
+
+    def close(self) -> None:
+        """Fim do processo: grava as linhas incompletas e o ultimo progresso."""
+        with self._lock:
+            for stream, rest in self._partial.items():
+                if rest:
+                    self._add_line_locked(rest)
+                self._partial[stream] = ""
+        self._maybe_notify(force=True)
+
+    def text(self) -> str:
+        with self._lock:
+            return self._tail.text()
+
+    def _add_line_locked(self, raw: str) -> None:
+        # "\r" sobrescreve a linha no terminal: vale so o ultimo trecho.
+        line = _ANSI_RE.sub("", raw.split("\r")[-1]).rstrip()
+        if not line:
+            return
+        if duration := _FFMPEG_DURATION_RE.search(line):
+            self._duration = _clock_seconds(*duration.groups()) or None
+        if fragments := _VDL_FRAGMENTS_RE.match(line):
+            self._fragments = int(fragments.group(1))
+        elif average := _VDL_AVERAGE_RE.match(line):
+            self.download_stats = {
+                "average_speed_bps": _to_bytes(average.group(1), average.group(2)),
+                "concurrent_fragments": int(average.group(3)),
+            }
+        progress = parse_progress(line, self._duration)
+        if progress is not None and progress["source"] == "yt-dlp" and self._fragments:
+            progress["concurrent_fragments"] = self._fragments
+        self._tail.add(line, replace_last=progress is not None and self._last_was_progress)
+        self._last_was_progress = progress is not None
+        if progress is not None:
+            self.progress = progress
+            self._pending = True
+
+    def _maybe_notify(self, force: bool = False) -> None:
+        if self.on_progress is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not self._pending or (not force and now - self._notified_at < self.min_interval):
+                return
+            self._pending = False
+            self._notified_at = now
+            progress = dict(self.progress or {})
+        self.on_progress(progress)
@@ -0,0 +1,175 @@
+"""Persistencia do JobManager: journal append-only + snapshot compactado.
+
+Antes cada transicao reescrevia o jobs.json inteiro (todos os lotes, com logs)
+segurando o lock global. Agora cada mudanca vira uma linha JSON com apenas o
+delta em jobs.journal:
+
+    {"seq": 12, "op": "batch", "batch": {...}}            lote criado
+    {"seq": 13, "op": "job", "batch_id": ..., "job_id": ..., "fields": {...}}
+    {"seq": 14, "op": "delete", "batch_id": ...}
+
+O append so enfileira a linha em memoria; um thread de flush agrupa as linhas
+pendentes e faz um unico write + fsync a cada `flush_interval` (group commit).
+Quando o journal acumula `compact_records` registros, o estado completo e
+gravado em jobs.json (atomico, com o `journal_seq` que ele ja contem) e o
+journal e reescrito apenas com os registros posteriores.
+
+No boot: carrega o snapshot e reaplica os registros com seq > journal_seq. Uma
+linha final truncada (queda no meio do write) e descartada. Um jobs.json antigo,
+sem journal, e carregado como snapshot com seq 0.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+
+class JobJournal:
+    def __init__(
+        self,
+        state_dir: Path,
+        snapshot_fn: Callable[[], dict[str, Any]],
+        flush_interval: float = 0.2,
+        compact_records: int = 2000,
+    ) -> None:
+        self.state_dir = state_dir
+        self.snapshot_file = state_dir / "jobs.json"
+        self.journal_file = state_dir / "jobs.journal"
+        # snapshot_fn devolve o estado completo ({"batches": [...]}) ja com
+        # "journal_seq"; o dono chama current_seq() sob o proprio lock.
+        self._snapshot_fn = snapshot_fn
+        self.flush_interval = flush_interval
+        self.compact_records = compact_records
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._pending: list[str] = []
+        self._seq = 0
+        self._records_since_snapshot = 0
+        self._closed = False
+        self._thread: threading.Thread | None = None
+
+    def load(self) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        """Snapshot + registros do journal posteriores a ele, em ordem."""
+        snapshot: dict[str, Any] = {"batches": []}
+        if self.snapshot_file.exists():
+            snapshot = json.loads(self.snapshot_file.read_text(encoding="utf-8"))
+        base_seq = int(snapshot.get("journal_seq", 0))
+        records: list[dict[str, Any]] = []
+        last_seq = base_seq
+        if self.journal_file.exists():
+            valid_bytes = 0
+            with self.journal_file.open("rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # cauda truncada por queda no meio do write
+                    valid_bytes += len(line)
+                    seq = int(record.get("seq", 0))
+                    if seq > base_seq:
+                        records.append(record)
+                        last_seq = max(last_seq, seq)
+            if valid_bytes < self.journal_file.stat().st_size:
+                # Remove a cauda corrompida para os proximos appends nao colarem nela.
+                with self.journal_file.open("r+b") as f:
+                    f.truncate(valid_bytes)
+        with self._cond:
+            self._seq = last_seq
+            self._records_since_snapshot = len(records)
+        return snapshot, records
+
+    def current_seq(self) -> int:
+        with self._cond:
+            return self._seq
+
+    def append(self, record: dict[str, Any]) -> None:
+        """Enfileira um delta; o fsync acontece em lote no thread de flush."""
+        with self._cond:
+            self._seq += 1
+            line = json.dumps({"seq": self._seq, **record}, ensure_ascii=False, separators=(",", ":"))
+            self._pending.append(line)
+            self._records_since_snapshot += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, daemon=True, name="vdl-studio-journal")
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self) -> None:
+        """Grava e faz fsync de tudo o que esta pendente."""
+        with self._io_lock:
+            with self._cond:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return
+            try:
+                with self.journal_file.open("a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError:
+                if not self.state_dir.exists():
+                    return  # diretorio de estado removido (ex.: testes): nada a persistir
+                with self._cond:
+                    self._pending[:0] = lines  # tenta de novo no proximo ciclo
+                raise
+
+    def compact(self) -> None:
+        """Grava o snapshot completo e descarta do journal o que ele ja cobre."""
+        with self._io_lock:
+            snapshot = self._snapshot_fn()
+            snapshot_seq = int(snapshot.get("journal_seq", 0))
+            tmp = self.snapshot_file.with_name(self.snapshot_file.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.replace(self.snapshot_file)
+
+            # Registros ja gravados no journal mas posteriores ao snapshot.
+            kept: list[str] = []
+            if self.journal_file.exists():
+                with self.journal_file.open("r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            if int(json.loads(line).get("seq", 0)) > snapshot_seq:
+                                kept.append(line.rstrip("\n"))
+                        except ValueError:
+                            break
+            tmp = self.journal_file.with_name(self.journal_file.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                if kept:
+                    f.write("\n".join(kept) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.replace(self.journal_file)
+            with self._cond:
+                self._records_since_snapshot = len(kept) + len(self._pending)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+            # Espera um pouco para agrupar as transicoes de varios jobs num fsync.
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if self._records_since_snapshot >= self.compact_records:
+                    self.compact()
+            except OSError:
+                time.sleep(self.flush_interval)
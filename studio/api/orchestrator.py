@@ -1,26 +1,61 @@
 from __future__ import annotations
 
+import atexit
 import base64
+import hashlib
 import json
 import os
 import re
+import shutil
 import subprocess
 import threading
 import time
 import uuid
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Literal
+from typing import Any, Callable, Iterator, Literal
+
+try:
+    from .detached import RunDir, detached_command, is_gone, kill_command, liveness_command
+    from .docker_api import DockerAPIError, DockerClient
+    from .events import EventHub
+    from .job_output import LOG_TAIL_CHARS, JobOutput
+    from .journal import JobJournal
+    from .placement import WorkerPlacement, WorkerSpec, parse_workers
+    from .runtime_monitor import ContainerMonitor
+    from .scheduler import JobScheduler, Task
+    from .sqlite_store import SqliteJobStore
+except ImportError:  # imagem da API: modulos copiados planos em /app
+    from detached import RunDir, detached_command, is_gone, kill_command, liveness_command
+    from docker_api import DockerAPIError, DockerClient
+    from events import EventHub
+    from job_output import LOG_TAIL_CHARS, JobOutput
+    from journal import JobJournal
+    from placement import WorkerPlacement, WorkerSpec, parse_workers
+    from runtime_monitor import ContainerMonitor
+    from scheduler import JobScheduler, Task
+    from sqlite_store import SqliteJobStore
 
 
 RuntimeMode = Literal["none", "cyberghost", "windscribe"]
 ProcessingMode = Literal["download", "transcribe", "context", "unified"]
 LocalProcessingMode = Literal["transcribe", "context", "unified"]
 
-LOCAL_MEDIA_EXTENSIONS = {".mp4", ".mkv", ".mov", ".webm", ".m4v"}
+# Audio do `vdl --audio-only` (lote sem manter o video).
+AUDIO_ONLY_EXTENSION = ".m4a"
+LOCAL_MEDIA_EXTENSIONS = {".mp4", ".mkv", ".mov", ".webm", ".m4v", AUDIO_ONLY_EXTENSION}
 WHISPER_MODELS = {"tiny", "base", "small", "medium", "large"}
+MAX_WHISPER_WORKERS = 8
+# Teto do -N do yt-dlp (mesmo padrao do VDL_MAX_CONCURRENT_FRAGMENTS do vdl.py).
+MAX_CONCURRENT_FRAGMENTS = 16
+MAX_JOBS_PAGE = 200
+# Jobs de um lote em pipeline entre o inicio do download e o fim do
+# processamento, em multiplos do `concurrency`: limita os videos ja baixados
+# esperando CPU/API (disco) sem deixar a rede ociosa.
+PIPELINE_DEPTH = 2
+# Campos de estado gravados no journal a cada transicao (logs vao a parte).
+JOB_STATE_FIELDS = ("status", "stage", "error", "attempt", "started_at", "finished_at", "updated_at")
 
 
 @dataclass(frozen=True)
@@ -104,10 +139,58 @@ def now_iso() -> str:
     return datetime.now().astimezone().isoformat()
 
 
+def _parse_time(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # Datas sem fuso (ex.: "2026-10-01") sao interpretadas no fuso do servidor.
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+def _parse_filter_time(value: str | None, name: str) -> datetime | None:
+    if not value:
+        return None
+    parsed = _parse_time(value)
+    if parsed is None:
+        raise ValueError(f"Data invalida em {name}: use ISO 8601 (ex.: 2026-10-01 ou 2026-10-01T08:00:00-03:00).")
+    return parsed
+
+
+def _encode_cursor(created_at: str, batch_id: str) -> str:
+    raw = json.dumps([created_at, batch_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, batch_id = json.loads(raw)
+        return str(created_at), str(batch_id)
+    except (ValueError, TypeError):
+        raise ValueError("Cursor invalido.") from None
+
+
+def _job_summary(job: JobRecord, include_logs: bool) -> dict[str, Any]:
+    data = job.to_dict()
+    if not include_logs:
+        data.pop("logs", None)
+    return data
+
+
 class SafeRunner:
-    def __init__(self, project_root: Path) -> None:
+    """Executa o vdl.sh e fala com o Docker.
+
+    Com o socket do daemon montado, inspect/exec/logs/events vao pela Engine API
+    (DockerClient, conexoes reaproveitadas, sem fork); sem ele, cai no `docker` CLI.
+    """
+
+    def __init__(self, project_root: Path, docker_api: DockerClient | None = None) -> None:
         self.project_root = project_root
         self.script = self.project_root / "vdl.sh"
+        self.docker_api = docker_api if docker_api is not None else DockerClient.from_env()
 
     def vdl_script(self, command: str, *args: str, timeout: int = 900) -> CommandResult:
         return self.run(["bash", str(self.script), command, *args], timeout=timeout)
@@ -115,6 +198,91 @@ class SafeRunner:
     def docker(self, *args: str, timeout: int = 60, env: dict[str, str] | None = None) -> CommandResult:
         return self.run(["docker", *args], timeout=timeout, env=env)
 
+    def exec(
+        self,
+        container: str,
+        command: list[str],
+        env: dict[str, str] | None = None,
+        detach: bool = False,
+        timeout: int = 60,
+        on_output: Callable[[str, str], None] | None = None,
+    ) -> CommandResult:
+        """`docker exec` com a saida entregue a `on_output` enquanto o comando roda."""
+        cli = ["exec", *(["-d"] if detach else [])]
+        for key, value in (env or {}).items():
+            cli.extend(["-e", f"{key}={value}"])
+        cli.extend([container, *command])
+        if self.docker_api is None:
+            # CLI: sem stream; a saida so chega ao callback quando o processo termina.
+            result = self.docker(*cli, timeout=timeout)
+            if on_output is not None:
+                for stream in ("stdout", "stderr"):
+                    if getattr(result, stream):
+                        on_output(stream, getattr(result, stream))
+            return result
+        try:
+            code, stdout, stderr = self.docker_api.exec_run(
+                container, command, env=env, detach=detach, timeout=timeout, on_output=on_output
+            )
+        except (DockerAPIError, OSError) as exc:
+            return CommandResult(["docker", *cli], 1, "", f"Error response from daemon: {exc}")
+        return CommandResult(["docker", *cli], code, stdout, stderr)
+
+    def inspect(self, *names: str) -> list[dict[str, Any]]:
+        """Itens do `docker inspect` dos containers existentes (os ausentes sao omitidos)."""
+        if self.docker_api is None:
+            # Com algum container ausente o CLI sai com erro, mas ainda imprime os demais.
+            result = self.docker("inspect", *names, timeout=20)
+            try:
+                return json.loads(result.stdout or "[]")
+            except ValueError:
+                return []
+        items = []
+        for name in names:
+            try:
+                data = self.docker_api.inspect(name)
+            except (DockerAPIError, OSError):
+                data = None
+            if data is not None:
+                items.append(data)
+        return items
+
+    def container_logs(self, container: str, tail: int) -> CommandResult:
+        command = ["docker", "logs", container, "--tail", str(tail)]
+        if self.docker_api is None:
+            return self.docker(*command[1:], timeout=30)
+        try:
+            stdout, stderr = self.docker_api.logs(container, tail)
+        except (DockerAPIError, OSError) as exc:
+            return CommandResult(command, 1, "", f"Error response from daemon: {exc}")
+        return CommandResult(command, 0, stdout, stderr)
+
+    def docker_events(self, filters: dict[str, list[str]]) -> Iterator[dict[str, Any]]:
+        """Eventos do daemon em stream (bloqueia ate a conexao/processo acabar)."""
+        if self.docker_api is not None:
+            yield from self.docker_api.events(filters)
+            return
+        args = ["events", "--format", "{{json .}}"]
+        for key, values in filters.items():
+            args += [part for value in values for part in ("--filter", f"{key}={value}")]
+        process = subprocess.Popen(
+            ["docker", *args],
+            cwd=self.project_root,
+            text=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            assert process.stdout is not None
+            for line in process.stdout:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        finally:
+            process.kill()
+            process.wait()
+
     def run(
         self,
         command: list[str],
@@ -142,18 +310,36 @@ class RuntimeOrchestrator:
     def __init__(self, project_root: Path) -> None:
         self.project_root = project_root
         self.runner = SafeRunner(project_root)
+        # Worker principal de cada runtime + extras de VDL_STUDIO_WORKERS.
+        extras = parse_workers()
+        self.workers: dict[RuntimeMode, list[WorkerSpec]] = {
+            mode: [
+                WorkerSpec(runtime.worker, runtime.vpn),
+                *(WorkerSpec(spec.name, spec.vpn or runtime.vpn) for spec in extras.get(mode, []) if spec.name != runtime.worker),
+            ]
+            for mode, runtime in RUNTIMES.items()
+        }
+        self.monitor = ContainerMonitor(
+            self.runner,
+            [name for pool in self.workers.values() for spec in pool for name in (spec.name, spec.vpn)],
+        )
 
     def start(self, mode: RuntimeMode, rebuild: bool = False) -> dict[str, Any]:
         runtime = RUNTIMES[mode]
         command = runtime.rebuild_command if rebuild else runtime.up_command
         result = self.runner.vdl_script(command, timeout=1800)
+        self.monitor.refresh(self._container_names(mode))
         return {"mode": mode, "runtime": runtime.label, "result": result.to_dict()}
 
     def stop(self, mode: RuntimeMode) -> dict[str, Any]:
         runtime = RUNTIMES[mode]
         result = self.runner.vdl_script(runtime.down_command, timeout=600)
+        self.monitor.refresh(self._container_names(mode))
         return {"mode": mode, "runtime": runtime.label, "result": result.to_dict()}
 
+    def _container_names(self, mode: RuntimeMode) -> list[str]:
+        return [name for spec in self.workers[mode] for name in (spec.name, spec.vpn) if name]
+
     def status(self) -> dict[str, Any]:
         return {
             "runtimes": [self.runtime_status(mode) for mode in RUNTIMES],
@@ -162,38 +348,32 @@ class RuntimeOrchestrator:
 
     def runtime_status(self, mode: RuntimeMode) -> dict[str, Any]:
         runtime = RUNTIMES[mode]
-        worker = self.container_status(runtime.worker)
-        vpn = self.container_status(runtime.vpn) if runtime.vpn else None
-        running = worker.get("running", False)
-        ready = running and (vpn is None or vpn.get("healthy", False) or vpn.get("running", False))
+        workers = []
+        for spec in self.workers[mode]:
+            worker = self.container_status(spec.name)
+            vpn = self.container_status(spec.vpn) if spec.vpn else None
+            running = worker.get("running", False)
+            workers.append({
+                **worker,
+                "vpn": spec.vpn,
+                "ready": running and (vpn is None or vpn.get("healthy", False) or vpn.get("running", False)),
+            })
+        # worker/vpn continuam sendo os principais; running/ready valem para o pool.
         return {
             "mode": runtime.mode,
             "label": runtime.label,
-            "worker": worker,
-            "vpn": vpn,
-            "running": running,
-            "ready": ready,
+            "worker": self.container_status(runtime.worker),
+            "vpn": self.container_status(runtime.vpn) if runtime.vpn else None,
+            "workers": workers,
+            "running": any(worker["running"] for worker in workers),
+            "ready": any(worker["ready"] for worker in workers),
         }
 
     def container_status(self, name: str | None) -> dict[str, Any]:
+        """Estado do container a partir do cache do ContainerMonitor (sem fork por chamada)."""
         if not name:
             return {"name": None, "exists": False, "running": False, "healthy": False}
-        result = self.runner.docker("inspect", name, timeout=20)
-        if not result.ok:
-            return {"name": name, "exists": False, "running": False, "healthy": False}
-        data = json.loads(result.stdout)[0]
-        state = data.get("State", {})
-        health = state.get("Health", {})
-        health_status = health.get("Status")
-        return {
-            "name": name,
-            "exists": True,
-            "running": bool(state.get("Running")),
-            "status": state.get("Status"),
-            "health": health_status,
-            "healthy": health_status == "healthy",
-            "started_at": state.get("StartedAt"),
-        }
+        return self.monitor.get(name)
 
     def public_ip(self, mode: RuntimeMode) -> dict[str, Any]:
         runtime = RUNTIMES[mode]
@@ -201,12 +381,9 @@ class RuntimeOrchestrator:
         if not status.get("running"):
             return {"mode": mode, "ok": False, "ip": None, "error": "worker nao esta rodando"}
 
-        result = self.runner.docker(
-            "exec",
+        result = self.runner.exec(
             runtime.worker,
-            "sh",
-            "-lc",
-            "curl -fsS --max-time 12 ifconfig.me",
+            ["sh", "-lc", "curl -fsS --max-time 12 ifconfig.me"],
             timeout=20,
         )
         return {
@@ -219,7 +396,7 @@ class RuntimeOrchestrator:
     def logs(self, mode: RuntimeMode, tail: int = 160) -> dict[str, Any]:
         runtime = RUNTIMES[mode]
         tail = max(20, min(tail, 1000))
-        result = self.runner.docker("logs", runtime.logs_container, "--tail", str(tail), timeout=30)
+        result = self.runner.container_logs(runtime.logs_container, tail)
         return {"mode": mode, "container": runtime.logs_container, "result": result.to_dict()}
 
 
@@ -305,6 +482,11 @@ class JobRecord:
     started_at: str | None = None
     finished_at: str | None = None
     updated_at: str = field(default_factory=now_iso)
+    # Ultimo progresso lido da saida do yt-dlp/ffmpeg (percent, speed_bps,
+    # eta_seconds, fragment/fragments...). So memoria + SSE: nao vai para o journal.
+    progress: dict[str, Any] | None = None
+    # Container em que o estagio atual roda (escolhido pelo WorkerPlacement).
+    worker: str | None = None
 
     def to_dict(self) -> dict[str, Any]:
         return self.__dict__.copy()
@@ -321,6 +503,8 @@ class BatchRecord:
     jobs: list[JobRecord]
     job_type: str = "download"
     source_path: str | None = None
+    # Maior primeiro no escalonador global; empate -> fila justa entre lotes.
+    priority: int = 0
 
     def to_dict(self) -> dict[str, Any]:
         data = self.__dict__.copy()
@@ -333,6 +517,7 @@ class JobManager:
         self,
         data_root: Path,
         orchestrator: RuntimeOrchestrator,
+        events: EventHub | None = None,
     ) -> None:
         self.data_root = data_root
         self.state_dir = Path(os.getenv("VDL_STUDIO_STATE_DIR", data_root / ".vdl-studio-web"))
@@ -343,6 +528,21 @@ class JobManager:
         self._batches: dict[str, BatchRecord] = {}
         self._cancelled_batches: set[str] = set()
         self._cancelled_jobs: set[tuple[str, str]] = set()
+        self._jobs_index: dict[tuple[str, str], JobRecord] = {}
+        self._outputs: dict[tuple[str, str], JobOutput] = {}
+        self.scheduler = JobScheduler()
+        self.placement = WorkerPlacement(lambda mode: self.orchestrator.runtime_status(mode))
+        # Versao monotonica do estado: sobe a cada delta gravado/publicado. O
+        # boot_id entra no ETag para um restart (versao volta a 0) nao gerar 304 falso.
+        self.events = events or EventHub()
+        self._version = 0
+        self._boot_id = uuid.uuid4().hex[:8]
+        # Backend de persistencia: journal append-only (padrao) ou SQLite (WAL).
+        if os.getenv("VDL_STUDIO_STORE", "journal").strip().lower() == "sqlite":
+            self._store: JobJournal | SqliteJobStore = SqliteJobStore(self.state_dir)
+        else:
+            self._store = JobJournal(self.state_dir, self._snapshot)
+        atexit.register(self._store.close)
         self._load()
 
     def create_download_batch(
@@ -354,6 +554,9 @@ class JobManager:
         concurrency: int,
         processing_mode: ProcessingMode,
         filenames: list[str] | None = None,
+        priority: int = 0,
+        concurrent_fragments: int | str = 1,
+        keep_video: bool = True,
     ) -> dict[str, Any]:
         clean_urls = [url.strip() for url in urls if url.strip()]
         if not clean_urls:
@@ -366,6 +569,14 @@ class JobManager:
 
         # Nomes finais: 1 por URL (posicional). Vazio -> numero sequencial 01-NN.
         output_names = build_download_filenames(clean_urls, filenames)
+        fragments = normalize_concurrent_fragments(concurrent_fragments)
+        # Sem o video o vdl baixa so o audio (<nome>.m4a): transcricao/contexto
+        # nao leem a imagem e o lote transfere/grava uma fracao dos bytes.
+        options: dict[str, Any] = {}
+        if fragments != 1:
+            options["concurrent_fragments"] = fragments
+        if not keep_video:
+            options["audio_only"] = True
 
         self._ensure_runtime_ready(mode)
 
@@ -383,6 +594,7 @@ class JobManager:
                 filename=output_names[index - 1],
                 destination=destination,
                 processing_mode=processing_mode,
+                options=dict(options),
             )
             for index, url in enumerate(clean_urls, start=1)
         ]
@@ -394,20 +606,15 @@ class JobManager:
             concurrency=concurrency,
             created_at=now_iso(),
             jobs=jobs,
+            priority=priority,
         )
         with self._lock:
-            self._batches[batch_id] = batch
-            self._save_locked()
-
-        token = normalize_cookie_to_vdl_token(cookie)
-        thread = threading.Thread(
-            target=self._run_batch,
-            args=(batch_id, token),
-            daemon=True,
-            name=f"vdl-studio-{batch_id}",
-        )
-        thread.start()
-        return batch.to_dict()
+            self._add_batch_locked(batch)
+            self._record_batch_locked(batch)
+            snapshot = batch.to_dict()
+
+        self._run_batch(batch_id, normalize_cookie_to_vdl_token(cookie))
+        return snapshot
 
     def create_local_transcription_batch(
         self,
@@ -418,9 +625,12 @@ class JobManager:
         processing_mode: LocalProcessingMode,
         use_gpu: bool,
         whisper_model: str,
+        whisper_workers: int = 1,
+        priority: int = 0,
     ) -> dict[str, Any]:
         if whisper_model not in WHISPER_MODELS:
             raise ValueError("Modelo Whisper invalido.")
+        whisper_workers = max(1, min(whisper_workers, MAX_WHISPER_WORKERS))
         # Transcricao (Whisper local ou OpenAI) NAO precisa de VPN: usa rede apenas
         # para o download unico do modelo (Whisper) ou para a API (OpenAI), ambos
         # direto pela internet. Forcamos o runtime sem-VPN (novpn) para nao acoplar a
@@ -447,7 +657,7 @@ class JobManager:
                 destination=destination,
                 processing_mode=processing_mode,
                 job_type="local",
-                options={"use_gpu": use_gpu, "whisper_model": whisper_model},
+                options={"use_gpu": use_gpu, "whisper_model": whisper_model, "whisper_workers": whisper_workers},
             )
             for index, item in enumerate(media_files, start=1)
         ]
@@ -461,24 +671,147 @@ class JobManager:
             jobs=jobs,
             job_type="local",
             source_path=source_path,
+            priority=priority,
         )
         with self._lock:
-            self._batches[batch_id] = batch
-            self._save_locked()
-
-        thread = threading.Thread(
-            target=self._run_batch,
-            args=(batch_id, None),
-            daemon=True,
-            name=f"vdl-studio-{batch_id}",
+            self._add_batch_locked(batch)
+            self._record_batch_locked(batch)
+            snapshot = batch.to_dict()
+
+        self._run_batch(batch_id, None)
+        return snapshot
+
+    def list_batches(
+        self,
+        status: str | None = None,
+        mode: str | None = None,
+        job_type: str | None = None,
+        created_after: str | None = None,
+        created_before: str | None = None,
+        cursor: str | None = None,
+        limit: int | None = None,
+        include_logs: bool = True,
+    ) -> dict[str, Any]:
+        """Lotes mais recentes primeiro, com filtros e paginacao por cursor.
+
+        `status` filtra os jobs de cada lote (lotes sem nenhum job no status somem);
+        `cursor` e o `next_cursor` da pagina anterior. Com include_logs=False a
+        resposta e so o resumo: os logs ficam em job_logs().
+        """
+        after = _parse_filter_time(created_after, "created_after")
+        before = _parse_filter_time(created_before, "created_before")
+        position = _decode_cursor(cursor) if cursor else None
+        statuses = {item.strip() for item in status.split(",") if item.strip()} if status else None
+        if isinstance(self._store, SqliteJobStore):
+            return self._list_batches_indexed(statuses, mode, job_type, after, before, position, limit, include_logs)
+        with self._lock:
+            batches = sorted(self._batches.values(), key=lambda b: (b.created_at, b.batch_id), reverse=True)
+            page: list[dict[str, Any]] = []
+            next_cursor = None
+            for batch in batches:
+                if position is not None and (batch.created_at, batch.batch_id) >= position:
+                    continue
+                if mode and batch.mode != mode:
+                    continue
+                if job_type and batch.job_type != job_type:
+                    continue
+                created = _parse_time(batch.created_at)
+                if (after and (created is None or created < after)) or (before and (created is None or created >= before)):
+                    continue
+                jobs = [job for job in batch.jobs if statuses is None or job.status in statuses]
+                if statuses is not None and not jobs:
+                    continue
+                if limit and len(page) >= limit:
+                    last = page[-1]
+                    next_cursor = _encode_cursor(last["created_at"], last["batch_id"])
+                    break
+                data = batch.to_dict()
+                data["jobs"] = [_job_summary(job, include_logs) for job in jobs]
+                page.append(data)
+            return {
+                "batches": page,
+                "next_cursor": next_cursor,
+                "version": self._version,
+                "server_now": now_iso(),
+            }
+
+    def _list_batches_indexed(
+        self,
+        statuses: set[str] | None,
+        mode: str | None,
+        job_type: str | None,
+        after: datetime | None,
+        before: datetime | None,
+        position: tuple[str, str] | None,
+        limit: int | None,
+        include_logs: bool,
+    ) -> dict[str, Any]:
+        """list_batches no backend SQLite: filtros e pagina saem dos indices.
+
+        A memoria so completa os lotes da pagina (progresso e worker ao vivo nao
+        sao persistidos); os logs, quando pedidos, vem da tabela job_logs.
+        """
+        page_ids, has_more = self._store.query_batches(
+            statuses=statuses,
+            mode=mode,
+            job_type=job_type,
+            created_after=after.isoformat() if after else None,
+            created_before=before.isoformat() if before else None,
+            before=position,
+            limit=limit,
         )
-        thread.start()
-        return batch.to_dict()
+        logs = self._store.batch_logs([batch_id for batch_id, _jobs in page_ids]) if include_logs else {}
+        with self._lock:
+            page: list[dict[str, Any]] = []
+            for batch_id, job_ids in page_ids:
+                batch = self._batches.get(batch_id)
+                if batch is None:
+                    continue  # excluido entre a consulta e a montagem da pagina
+                data = batch.to_dict()
+                data["jobs"] = []
+                for job in batch.jobs:
+                    if job_ids is not None and job.job_id not in job_ids:
+                        continue
+                    summary = _job_summary(job, include_logs)
+                    if include_logs:
+                        summary["logs"] = logs.get((batch_id, job.job_id), "")
+                    data["jobs"].append(summary)
+                page.append(data)
+            next_cursor = _encode_cursor(page[-1]["created_at"], page[-1]["batch_id"]) if has_more and page else None
+            return {
+                "batches": page,
+                "next_cursor": next_cursor,
+                "version": self._version,
+                "server_now": now_iso(),
+            }
+
+    def job_logs(self, batch_id: str, job_id: str) -> dict[str, Any]:
+        with self._lock:
+            job = self._find_job_locked(batch_id, job_id)
+            if job is None:
+                raise KeyError(job_id)
+            output = self._outputs.get((batch_id, job_id))
+        # Job em execucao: cauda ao vivo do exec; senao, o log gravado no fim.
+        logs = output.text() if output is not None else self._saved_logs(job)
+        return {
+            "batch_id": batch_id,
+            "job_id": job_id,
+            "logs": logs,
+            "live": output is not None,
+            "progress": job.progress,
+            "updated_at": job.updated_at,
+        }
 
-    def list_batches(self) -> dict[str, Any]:
+    def etag(self, variant: str = "") -> str:
+        """ETag fraco da listagem: versao do estado + parametros da consulta.
+
+        Calculado sem serializar nada; se o estado nao mudou desde o ultimo GET
+        do cliente, a API responde 304 direto.
+        """
         with self._lock:
-            batches = sorted(self._batches.values(), key=lambda b: b.created_at, reverse=True)
-            return {"batches": [batch.to_dict() for batch in batches], "server_now": now_iso()}
+            version = self._version
+        digest = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:10] if variant else "all"
+        return f'W/"{self._boot_id}-{version}-{digest}"'
 
     def _ensure_runtime_ready(self, mode: RuntimeMode) -> None:
         """Valida que o runtime esta pronto ANTES de criar/reprocessar um lote.
@@ -499,12 +832,12 @@ class JobManager:
         )
 
     def _run_batch(self, batch_id: str, token: str | None) -> None:
+        """Enfileira os jobs pendentes do lote no escalonador global (nao bloqueia)."""
         with self._lock:
             batch = self._batches.get(batch_id)
             if batch is None:
                 return
             mode = batch.mode
-            concurrency = batch.concurrency
             # Apenas jobs pendentes: permite reprocessar um lote sem refazer os ja concluidos.
             jobs = [job for job in batch.jobs if job.status == "queued"]
 
@@ -517,57 +850,158 @@ class JobManager:
                 self._transition(job.batch_id, job.job_id, "blocked", "runtime", "Runtime nao esta pronto.")
             return
 
-        with ThreadPoolExecutor(max_workers=concurrency) as executor:
-            futures = [executor.submit(self._run_job, job, token) for job in jobs]
-            for future in as_completed(futures):
-                future.result()
+        for job in jobs:
+            self._schedule_job(job, token)
+
+    def _schedule_job(self, job: JobRecord, token: str | None) -> None:
+        self._scale_runtime_slots(job.mode)
+        task = self._job_task(job, token, job_stage(job))
+        if task is None:
+            return
+        if is_pipelined(job):
+            # Jobs do lote entre o inicio do download e o fim do processamento.
+            self.scheduler.set_capacity(pipeline_resource(job.batch_id), task.group_limit * PIPELINE_DEPTH)
+        self.scheduler.submit(task)
+
+    def _job_task(self, job: JobRecord, token: str | None, stage: str) -> Task | None:
+        with self._lock:
+            batch = self._batches.get(job.batch_id)
+            if batch is None:
+                return None
+            priority, concurrency = batch.priority, batch.concurrency
+        resources = job_resources(job, stage)
+        retain: tuple[str, ...] = ()
+        if stage == "download" and is_pipelined(job):
+            resources[pipeline_resource(job.batch_id)] = 1
+            retain = (pipeline_resource(job.batch_id),)
+        return Task(
+            key=(job.batch_id, job.job_id),
+            group=job.batch_id,
+            run=lambda: self._run_job(job, token, stage),
+            resources=resources,
+            priority=priority,
+            group_limit=concurrency,
+            stage=stage,
+            retain=retain,
+        )
+
+    def _scale_runtime_slots(self, mode: RuntimeMode) -> None:
+        """Downloads simultaneos do runtime crescem com os workers prontos dele."""
+        workers = self.orchestrator.runtime_status(mode).get("workers") or []
+        self.scheduler.set_scale(f"runtime:{mode}", max(1, sum(1 for worker in workers if worker.get("ready"))))
+
+    def _acquire_worker(self, job: JobRecord, stage: str) -> str | None:
+        """Escolhe o worker do estagio; sem nenhum pronto o job fica 'blocked'."""
+        container = self.placement.acquire(stage, job.mode)
+        if container is None:
+            self._transition(
+                job.batch_id, job.job_id, "blocked", "runtime",
+                "Nenhum worker pronto para o job. Inicie o runtime e reprocesse.",
+            )
+            return None
+        with self._lock:
+            job.worker = container
+        return container
+
+    def set_batch_priority(self, batch_id: str, priority: int) -> dict[str, Any]:
+        """Muda a prioridade do lote; vale para os jobs ainda na fila."""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                raise KeyError(batch_id)
+            batch.priority = priority
+            self._record_batch_locked(batch)
+            snapshot = batch.to_dict()
+        self.scheduler.set_priority(batch_id, priority)
+        return snapshot
+
+    def scheduler_status(self) -> dict[str, Any]:
+        return {**self.scheduler.stats(), "worker_load": self.placement.load()}
 
-    def _run_job(self, job: JobRecord, token: str | None) -> None:
+    def _run_job(self, job: JobRecord, token: str | None, stage: str = "download") -> Task | None:
         if self._is_cancelled(job.batch_id, job.job_id):
             self._transition(job.batch_id, job.job_id, "canceled", "canceled", "Cancelado antes de iniciar.", finished=True)
-            return
+            return None
 
-        if job.job_type == "local":
-            self._run_local_job(job)
-            return
+        if stage == "process":
+            self._run_process_stage(job)
+            return None
 
-        runtime = RUNTIMES[job.mode]
-        self._transition(job.batch_id, job.job_id, "running", "vdl", None, started=True)
+        pipelined = is_pipelined(job)
+        container = self._acquire_worker(job, "download")
+        if container is None:
+            return None
+        self._transition(job.batch_id, job.job_id, "running", "download", None, started=True)
 
-        args = [
-            "exec",
+        # Em pipeline o exec so baixa; transcricao/contexto viram o estagio
+        # "process", escalonado nos slots de CPU/API enquanto o proximo download
+        # ja ocupa a rede.
+        command = [
+            "vdl",
+            job.url,
+            job.filename,
+            "-d",
+            job.destination,
+            *processing_args("download" if pipelined else job.processing_mode),
         ]
-        if token:
-            args.extend(["-e", f"VDL_TOKEN={token}"])
-        args.extend(
-            [
-                runtime.worker,
-                "vdl",
-                job.url,
-                job.filename,
-                "-d",
-                job.destination,
-                *processing_args(job.processing_mode),
-            ]
-        )
+        fragments = job.options.get("concurrent_fragments")
+        if fragments and fragments != 1:
+            command.extend(["--concurrent-fragments", str(fragments)])
+        if job.options.get("audio_only"):
+            command.append("--audio-only")
+        env = {"PYTHONUNBUFFERED": "1", **({"VDL_TOKEN": token} if token else {})}
+
+        try:
+            result, logs = self._exec_job(job, container, command, env, "download")
+        finally:
+            self.placement.release(container)
+        return self._finish_download_stage(job, token, result, logs)
 
-        result = self.orchestrator.runner.docker(*args, timeout=24 * 60 * 60)
-        logs = "\n".join(part for part in [result.stdout, result.stderr] if part).strip()
+    def _finish_download_stage(self, job: JobRecord, token: str | None, result: CommandResult, logs: str) -> Task | None:
+        pipelined = is_pipelined(job)
         if self._is_cancelled(job.batch_id, job.job_id):
             self._transition(job.batch_id, job.job_id, "canceled", "canceled", "Cancelado pelo usuario.", logs=logs, finished=True)
-        elif result.ok:
-            self._transition(job.batch_id, job.job_id, "succeeded", "finished", None, logs=logs, finished=True)
+        elif not result.ok:
+            self._transition(job.batch_id, job.job_id, "failed", "download", result.stderr[-2000:] or "Falha no VDL.", logs=logs, finished=True)
+        elif pipelined:
+            self._mark_downloaded(job, logs)
+            self._scale_runtime_slots(job.mode)
+            return self._job_task(job, token, "process")
         else:
-            self._transition(job.batch_id, job.job_id, "failed", "vdl", result.stderr[-2000:] or "Falha no VDL.", logs=logs, finished=True)
+            self._transition(job.batch_id, job.job_id, "succeeded", "finished", None, logs=logs, finished=True)
+        return None
 
-    def _run_local_job(self, job: JobRecord) -> None:
-        runtime = RUNTIMES[job.mode]
-        input_path = job.input_path or job.url
-        self._transition(job.batch_id, job.job_id, "running", "transcribe", None, started=True)
+    def _mark_downloaded(self, job: JobRecord, logs: str) -> None:
+        """Fim do estagio de download: o job volta para a fila do processamento.
+
+        `options["downloaded"]` persiste no journal, entao um reprocessamento
+        (falha na transcricao, restart da API) pula direto para o processamento.
+        """
+        with self._lock:
+            current = self._find_job_locked(job.batch_id, job.job_id)
+            if current is None:
+                return
+            current.status = "queued"
+            current.stage = "downloaded"
+            current.options = {**current.options, "downloaded": True}
+            current.logs = logs[-LOG_TAIL_CHARS:]
+            current.progress = None
+            current.updated_at = now_iso()
+            self._record_job_locked(current, JOB_STATE_FIELDS + ("options", "logs"))
+
+    def _run_process_stage(self, job: JobRecord) -> None:
+        container = self._acquire_worker(job, "process")
+        if container is None:
+            return
+        input_path = processing_input_path(job)
+        # Continuacao do download no mesmo attempt; reprocessamento direto (ja
+        # baixado) conta como nova tentativa.
+        started = job.job_type == "local" or job.started_at is None
+        self._transition(job.batch_id, job.job_id, "running", "transcribe", None, started=started)
+        if job.processing_mode != "unified":
+            self._ensure_transcription_server(container)
 
         args = [
-            "exec",
-            runtime.worker,
             "vdl",
             input_path,
             "--local",
@@ -583,9 +1017,23 @@ class JobManager:
                 args.extend(["--whisper-model", whisper_model])
             if bool(job.options.get("use_gpu")):
                 args.append("--gpu")
+            # Transcricao em pedacos paralelos (CPU): o proprio vdl.py divide o
+            # audio nos silencios e distribui entre processos do worker.
+            whisper_workers = int(job.options.get("whisper_workers") or 1)
+            if whisper_workers > 1:
+                args.extend(["--whisper-workers", str(whisper_workers)])
 
-        result = self.orchestrator.runner.docker(*args, timeout=24 * 60 * 60)
-        logs = "\n".join(part for part in [result.stdout, result.stderr] if part).strip()
+        try:
+            result, logs = self._exec_job(job, container, args, {"PYTHONUNBUFFERED": "1"}, "process")
+        finally:
+            self.placement.release(container)
+        self._finish_process_stage(job, result, logs)
+
+    def _finish_process_stage(self, job: JobRecord, result: CommandResult, logs: str) -> None:
+        # Download ja concluido deixou o proprio log no job: o final mostra os dois.
+        previous = self._saved_logs(job) if job.job_type == "download" else ""
+        if previous:
+            logs = f"{previous}\n{logs}"
         if self._is_cancelled(job.batch_id, job.job_id):
             self._transition(job.batch_id, job.job_id, "canceled", "canceled", "Cancelado pelo usuario.", logs=logs, finished=True)
         elif result.ok:
@@ -593,6 +1041,99 @@ class JobManager:
         else:
             self._transition(job.batch_id, job.job_id, "failed", "transcribe", result.stderr[-2000:] or "Falha no VDL.", logs=logs, finished=True)
 
+    def _run_dir(self, batch_id: str, job_id: str) -> RunDir:
+        return RunDir(self.state_dir / "runs" / batch_id / job_id)
+
+    def _exec_job(
+        self, job: JobRecord, container: str, command: list[str], env: dict[str, str], stage: str
+    ) -> tuple[CommandResult, str]:
+        """Dispara o job destacado no worker e acompanha o output.log ate o fim.
+
+        O env (VDL_TOKEN) vai so no exec, nunca para o meta.json.
+        """
+        run = self._run_dir(job.batch_id, job.job_id)
+        run.prepare({"container": container, "stage": stage, "command": command, "started_at": now_iso()})
+        launch = self.orchestrator.runner.exec(
+            container, detached_command(run.path, command), env=env, detach=True, timeout=60
+        )
+        if not launch.ok:
+            run.clear()
+            return launch, "\n".join(part for part in [launch.stdout, launch.stderr] if part).strip()
+        return self._follow_run(job, container, run, command)
+
+    def _follow_run(
+        self, job: JobRecord, container: str, run: RunDir, command: list[str], tail_bytes: int | None = None
+    ) -> tuple[CommandResult, str]:
+        """Le a saida ao vivo (cauda do log + progresso) e coleta o codigo de saida."""
+        key = (job.batch_id, job.job_id)
+        output = JobOutput(on_progress=lambda progress: self._update_progress(key, progress))
+        with self._lock:
+            self._outputs[key] = output
+        try:
+            code = run.follow(
+                output.feed, lambda pid: self._run_alive(container, pid), timeout=24 * 60 * 60, tail_bytes=tail_bytes
+            )
+        finally:
+            output.close()
+            with self._lock:
+                self._outputs.pop(key, None)
+        logs = output.text()
+        if output.download_stats:
+            self._record_download_stats(key, output.download_stats)
+        if code == 124:
+            # Estourou o limite: o wrapper destacado seguiria rodando (e escrevendo
+            # no diretorio) depois de o slot ser liberado. Mata antes de limpar.
+            self._kill_run(container, run.pid())
+        run.clear()
+        if code is None:
+            error = "O processo do job sumiu do worker sem gravar o codigo de saida (container reiniciado?)."
+            return CommandResult(command, -1, logs, error), logs
+        return CommandResult(command, code, logs, logs[-2000:] if code else ""), logs
+
+    def _record_download_stats(self, key: tuple[str, str], stats: dict[str, Any]) -> None:
+        """Velocidade media e fragmentos simultaneos do download (resumo do vdl.py)."""
+        with self._lock:
+            job = self._find_job_locked(*key)
+            if job is None:
+                return
+            job.options = {**job.options, "download_stats": stats}
+            self._record_job_locked(job, ("options",))
+
+    def _kill_run(self, container: str, pid: int | None) -> None:
+        """Mata, em best-effort, o wrapper destacado e o vdl que ele executa."""
+        if pid is None:
+            return
+        try:
+            self.orchestrator.runner.exec(container, kill_command(pid), timeout=20)
+        except Exception:
+            pass
+
+    def _run_alive(self, container: str, pid: int | None) -> bool:
+        if pid is None:
+            return False
+        result = self.orchestrator.runner.exec(container, liveness_command(pid), timeout=20)
+        return not is_gone(result.stdout, result.stderr)
+
+    def _update_progress(self, key: tuple[str, str], progress: dict[str, Any]) -> None:
+        with self._lock:
+            job = self._find_job_locked(*key)
+            if job is None or job.status != "running":
+                return
+            job.progress = {**progress, "updated_at": now_iso()}
+            self._publish_locked("job_progress", batch_id=key[0], job_id=key[1], progress=job.progress)
+
+    def _ensure_transcription_server(self, container: str) -> None:
+        """Garante, em best-effort, o servidor residente de transcricao no worker.
+
+        O compose ja sobe o vdl-transcribed junto com o container; isto cobre o caso
+        de o processo ter morrido. O servidor e idempotente (sai se ja houver outro
+        atendendo o socket) e o vdl.py cai para a carga local se ele nao responder.
+        """
+        try:
+            self.orchestrator.runner.exec(container, ["vdl-transcribed"], detach=True, timeout=20)
+        except Exception:
+            pass
+
     def _transition(
         self,
         batch_id: str,
@@ -616,26 +1157,37 @@ class JobManager:
             if started:
                 job.started_at = job.started_at or job.updated_at
                 job.attempt += 1
+                job.progress = None
             if finished:
                 job.finished_at = job.updated_at
+            fields = JOB_STATE_FIELDS
             if logs:
-                job.logs = logs[-12000:]
-            self._save_locked()
+                job.logs = logs[-LOG_TAIL_CHARS:]
+                fields += ("logs",)
+            self._record_job_locked(job, fields)
 
     def _find_job_locked(self, batch_id: str, job_id: str) -> JobRecord | None:
         batch = self._batches.get(batch_id)
         if batch is None:
             return None
+        job = self._jobs_index.get((batch_id, job_id))
+        if job is not None and job.batch_id == batch_id:
+            return job
+        # Lote registrado sem passar por _add_batch_locked: indexa sob demanda.
         for job in batch.jobs:
-            if job.job_id == job_id:
-                return job
-        return None
+            self._jobs_index[(batch_id, job.job_id)] = job
+        return self._jobs_index.get((batch_id, job_id))
+
+    def _add_batch_locked(self, batch: BatchRecord) -> None:
+        self._batches[batch.batch_id] = batch
+        for job in batch.jobs:
+            self._jobs_index[(batch.batch_id, job.job_id)] = job
 
     def _is_cancelled(self, batch_id: str, job_id: str) -> bool:
         with self._lock:
             return batch_id in self._cancelled_batches or (batch_id, job_id) in self._cancelled_jobs
 
-    def _terminate_in_container(self, mode: RuntimeMode, marker: str | None) -> None:
+    def _terminate_in_container(self, container: str, marker: str | None) -> None:
         """Mata, em best-effort, o processo vdl correspondente dentro do worker.
 
         O job roda como `vdl <marker> ...` dentro do container, entao pkill -f <marker>
@@ -644,9 +1196,8 @@ class JobManager:
         """
         if not marker:
             return
-        runtime = RUNTIMES[mode]
         try:
-            self.orchestrator.runner.docker("exec", runtime.worker, "pkill", "-f", marker, timeout=20)
+            self.orchestrator.runner.exec(container, ["pkill", "-f", marker], timeout=20)
         except Exception:
             pass
 
@@ -661,9 +1212,14 @@ class JobManager:
                     f"Lote possui {len(running)} job(s) em execucao. Cancele o lote antes de excluir."
                 )
             del self._batches[batch_id]
+            self._jobs_index = {key: job for key, job in self._jobs_index.items() if key[0] != batch_id}
             self._cancelled_batches.discard(batch_id)
             self._cancelled_jobs = {pair for pair in self._cancelled_jobs if pair[0] != batch_id}
-            self._save_locked()
+            self._store.append({"op": "delete", "batch_id": batch_id})
+            self._publish_locked("batch_deleted", batch_id=batch_id)
+        self.scheduler.cancel(batch_id)
+        self.scheduler.set_capacity(pipeline_resource(batch_id), None)
+        shutil.rmtree(self.state_dir / "runs" / batch_id, ignore_errors=True)
         return {"batch_id": batch_id, "deleted": True}
 
     def cancel_batch(self, batch_id: str) -> dict[str, Any]:
@@ -672,7 +1228,7 @@ class JobManager:
             if batch is None:
                 raise KeyError(batch_id)
             self._cancelled_batches.add(batch_id)
-            mode = batch.mode
+            primary = RUNTIMES[batch.mode].worker
             cancelled = 0
             running: list[tuple[str, str]] = []
             for job in batch.jobs:
@@ -683,17 +1239,18 @@ class JobManager:
                     job.updated_at = now_iso()
                     job.finished_at = job.updated_at
                     self._cancelled_jobs.add((batch_id, job.job_id))
+                    self._record_job_locked(job)
                     cancelled += 1
                 elif job.status == "running":
                     self._cancelled_jobs.add((batch_id, job.job_id))
-                    marker = (job.input_path or job.url) if job.job_type == "local" else job.url
-                    running.append((job.job_id, marker))
+                    marker = processing_input_path(job) if job.stage == "transcribe" else job.url
+                    running.append((job.worker or primary, marker))
                     cancelled += 1
-            self._save_locked()
 
+        self.scheduler.cancel(batch_id)
         # Encerra os jobs em execucao fora do lock (chamada ao docker pode demorar).
-        for _job_id, marker in running:
-            self._terminate_in_container(mode, marker)
+        for container, marker in running:
+            self._terminate_in_container(container, marker)
         return {"batch_id": batch_id, "canceled": cancelled, "running_signaled": len(running)}
 
     def retry_batch(self, batch_id: str, cookie: str | None = None) -> dict[str, Any]:
@@ -731,17 +1288,11 @@ class JobManager:
                     job.started_at = None
                     job.finished_at = None
                     job.updated_at = now_iso()
+                    self._record_job_locked(job)
                     reopened += 1
-            self._save_locked()
             snapshot = batch.to_dict()
 
-        thread = threading.Thread(
-            target=self._run_batch,
-            args=(batch_id, token),
-            daemon=True,
-            name=f"vdl-studio-{batch_id}-retry",
-        )
-        thread.start()
+        self._run_batch(batch_id, token)
         snapshot["reopened"] = reopened
         return snapshot
 
@@ -784,17 +1335,11 @@ class JobManager:
             job.started_at = None
             job.finished_at = None
             job.updated_at = now_iso()
-            self._save_locked()
+            self._record_job_locked(job)
             snapshot = job.to_dict()
             job_ref = job
 
-        thread = threading.Thread(
-            target=self._run_job,
-            args=(job_ref, token),
-            daemon=True,
-            name=f"vdl-studio-{batch_id}-{job_id}-retry",
-        )
-        thread.start()
+        self._schedule_job(job_ref, token)
         return snapshot
 
     def rename_job(self, batch_id: str, job_id: str, new_name: str) -> dict[str, Any]:
@@ -833,55 +1378,153 @@ class JobManager:
             if job is not None:
                 job.filename = new_filename
                 job.updated_at = now_iso()
-                self._save_locked()
+                self._record_job_locked(job, ("filename", "updated_at"))
         return {"batch_id": batch_id, "job_id": job_id, "filename": new_filename, "old_filename": old_filename}
 
     def _load(self) -> None:
-        if not self.state_file.exists():
-            return
-        data = json.loads(self.state_file.read_text(encoding="utf-8"))
-        for batch_data in data.get("batches", []):
-            jobs = [JobRecord(**job) for job in batch_data.get("jobs", [])]
-            batch = BatchRecord(
-                batch_id=batch_data["batch_id"],
-                mode=batch_data["mode"],
-                destination=batch_data["destination"],
-                processing_mode=batch_data.get("processing_mode", "download"),
-                concurrency=batch_data.get("concurrency", 1),
-                created_at=batch_data["created_at"],
-                jobs=jobs,
-                job_type=batch_data.get("job_type", "download"),
-                source_path=batch_data.get("source_path"),
-            )
-            self._batches[batch.batch_id] = batch
-        self._reconcile_orphans_on_load()
+        snapshot, records = self._store.load()
+        for batch_data in snapshot.get("batches", []):
+            self._add_batch_locked(_batch_from_dict(batch_data))
+        for record in records:
+            self._apply_record(record)
+        for job, run, meta in self._reconcile_orphans_on_load():
+            self._reattach(job, run, meta)
+
+    def _apply_record(self, record: dict[str, Any]) -> None:
+        op = record.get("op")
+        if op == "batch":
+            self._add_batch_locked(_batch_from_dict(record["batch"]))
+        elif op == "delete":
+            batch_id = record.get("batch_id")
+            self._batches.pop(batch_id, None)
+            self._jobs_index = {key: job for key, job in self._jobs_index.items() if key[0] != batch_id}
+        elif op == "job":
+            job = self._find_job_locked(record.get("batch_id"), record.get("job_id"))
+            if job is not None:
+                for name, value in (record.get("fields") or {}).items():
+                    if hasattr(job, name):
+                        setattr(job, name, value)
 
-    def _reconcile_orphans_on_load(self) -> None:
+    def _reconcile_orphans_on_load(self) -> list[tuple[JobRecord, RunDir, dict[str, Any]]]:
         """Identifica jobs órfãos no boot.
 
-        Um processo recém-iniciado nao tem thread alguma orquestrando lotes; logo,
-        qualquer job carregado como 'running'/'queued' ficou orfao num restart da API
-        (os jobs NAO sobrevivem ao restart). Marca como 'interrupted' para que nunca
-        sejam confundidos com execucao real e possam ser reprocessados.
+        Um job 'running' cujo processo destacado deixou pid/exit no diretorio do
+        job e devolvido para ser reatado (segue rodando no worker ou ja terminou).
+        Os demais 'running'/'queued' ficaram orfaos no restart da API (fila e
+        cookie so existem em memoria): viram 'interrupted' para que nunca sejam
+        confundidos com execucao real e possam ser reprocessados.
         """
-        changed = 0
+        reattach = []
         for batch in self._batches.values():
             for job in batch.jobs:
+                if job.status == "running":
+                    run = self._run_dir(batch.batch_id, job.job_id)
+                    meta = run.meta()
+                    if meta and meta.get("container") and (run.pid() is not None or run.exit_code() is not None):
+                        reattach.append((job, run, meta))
+                        continue
+                    run.clear()
                 if job.status in ("running", "queued"):
                     job.status = "interrupted"
                     job.stage = "interrupted"
                     job.error = "Interrompido por reinício da API (job em andamento não sobrevive ao restart). Reprocessar."
                     job.finished_at = job.finished_at or now_iso()
                     job.updated_at = now_iso()
-                    changed += 1
-        if changed:
-            self._save_locked()
+                    self._record_job_locked(job)
+        return reattach
+
+    def _reattach(self, job: JobRecord, run: RunDir, meta: dict[str, Any]) -> None:
+        """Volta a acompanhar um job destacado que sobreviveu ao restart da API.
 
-    def _save_locked(self) -> None:
-        payload = {"batches": [batch.to_dict() for batch in self._batches.values()]}
-        tmp = self.state_file.with_suffix(".tmp")
-        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-        tmp.replace(self.state_file)
+        Ocupa de novo os slots do estagio no escalonador (sem teto do lote: o
+        processo ja esta rodando) e o worker na contagem de carga.
+        """
+        container, stage = str(meta["container"]), str(meta.get("stage") or job_stage(job))
+        command = [str(part) for part in meta.get("command") or []]
+        job.worker = container
+        self.placement.hold(container)
+        resources = job_resources(job, stage)
+        retain: tuple[str, ...] = ()
+        if stage == "download" and is_pipelined(job):
+            with self._lock:
+                batch = self._batches.get(job.batch_id)
+                concurrency = batch.concurrency if batch else 1
+            self.scheduler.set_capacity(pipeline_resource(job.batch_id), concurrency * PIPELINE_DEPTH)
+            resources[pipeline_resource(job.batch_id)] = 1
+            retain = (pipeline_resource(job.batch_id),)
+
+        def resume() -> Task | None:
+            try:
+                result, logs = self._follow_run(job, container, run, command, tail_bytes=LOG_TAIL_CHARS * 4)
+            finally:
+                self.placement.release(container)
+            if stage == "download":
+                return self._finish_download_stage(job, None, result, logs)
+            self._finish_process_stage(job, result, logs)
+            return None
+
+        self.scheduler.submit(Task(
+            key=(job.batch_id, job.job_id), group=job.batch_id, run=resume,
+            resources=resources, stage=stage, retain=retain,
+        ))
+
+    def _record_batch_locked(self, batch: BatchRecord) -> None:
+        data = batch.to_dict()
+        self._store.append({"op": "batch", "batch": data})
+        summary = {**data, "jobs": [_job_summary(job, include_logs=False) for job in batch.jobs]}
+        self._publish_locked("batch", batch=summary)
+
+    def _record_job_locked(self, job: JobRecord, fields: tuple[str, ...] = JOB_STATE_FIELDS) -> None:
+        """Grava no journal so os campos alterados do job (custo ~ tamanho do delta)."""
+        self._store.append({
+            "op": "job",
+            "batch_id": job.batch_id,
+            "job_id": job.job_id,
+            "fields": {name: getattr(job, name) for name in fields},
+        })
+        if "logs" in fields and isinstance(self._store, SqliteJobStore):
+            job.logs = ""  # no SQLite o log vive so na tabela job_logs
+        self._publish_locked("job", job=_job_summary(job, include_logs=False))
+
+    def _saved_logs(self, job: JobRecord) -> str:
+        """Ultimo log gravado do job: em memoria (journal) ou na tabela job_logs (SQLite)."""
+        if isinstance(self._store, SqliteJobStore):
+            return self._store.job_logs(job.batch_id, job.job_id)
+        return job.logs
+
+    def _publish_locked(self, event_type: str, **data: Any) -> None:
+        """Sobe a versao do estado e avisa os assinantes SSE (sem bloquear)."""
+        self._version += 1
+        self.events.publish(event_type, version=self._version, server_now=now_iso(), **data)
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def _snapshot(self) -> dict[str, Any]:
+        """Estado completo para a compactacao do journal (chamado pelo thread de flush)."""
+        with self._lock:
+            return {
+                "batches": [batch.to_dict() for batch in self._batches.values()],
+                "journal_seq": self._store.current_seq(),
+            }
+
+
+def _batch_from_dict(batch_data: dict[str, Any]) -> BatchRecord:
+    jobs = [JobRecord(**job) for job in batch_data.get("jobs", [])]
+    return BatchRecord(
+        batch_id=batch_data["batch_id"],
+        mode=batch_data["mode"],
+        destination=batch_data["destination"],
+        processing_mode=batch_data.get("processing_mode", "download"),
+        concurrency=batch_data.get("concurrency", 1),
+        created_at=batch_data["created_at"],
+        jobs=jobs,
+        job_type=batch_data.get("job_type", "download"),
+        source_path=batch_data.get("source_path"),
+        priority=int(batch_data.get("priority") or 0),
+    )
 
 
 VIDEO_NAME_EXTENSIONS = {".mp4", ".mkv", ".mov", ".webm", ".m4v"}
@@ -1018,6 +1661,54 @@ def normalize_cookie_to_vdl_token(cookie: str | None) -> str | None:
     return base64.b64encode(value.encode("utf-8")).decode("ascii")
 
 
+def is_pipelined(job: JobRecord) -> bool:
+    """Download com processamento: baixa e processa em estagios separados."""
+    return job.job_type == "download" and job.processing_mode != "download"
+
+
+def job_stage(job: JobRecord) -> str:
+    """Estagio em que um job pendente (re)comeca."""
+    if job.job_type == "local" or (is_pipelined(job) and job.options.get("downloaded")):
+        return "process"
+    return "download"
+
+
+def pipeline_resource(batch_id: str) -> str:
+    return f"pipeline:{batch_id}"
+
+
+def processing_input_path(job: JobRecord) -> str:
+    """Midia lida pelo estagio de processamento (`vdl --local`)."""
+    if job.job_type == "local":
+        return job.input_path or job.url
+    filename = job.filename
+    if job.options.get("audio_only"):
+        filename = Path(filename).stem + AUDIO_ONLY_EXTENSION
+    return f"{job.destination.rstrip('/')}/{filename}"
+
+
+def job_resources(job: JobRecord, stage: str | None = None) -> dict[str, int]:
+    """Slots do escalonador global que o job ocupa enquanto roda o estagio."""
+    if (stage or job_stage(job)) == "download":
+        return {f"runtime:{job.mode}": 1, "network": 1}
+    if job.processing_mode == "unified":
+        return {"network": 1}  # audio vai para a API da OpenAI
+    if job.options.get("use_gpu"):
+        return {"gpu": 1}
+    return {"cpu": max(1, int(job.options.get("whisper_workers") or 1))}
+
+
+def normalize_concurrent_fragments(value: int | str) -> int | str:
+    """'auto' ou inteiro entre 1 e MAX_CONCURRENT_FRAGMENTS (repassado ao vdl)."""
+    if str(value).strip().lower() == "auto":
+        return "auto"
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Fragmentos simultaneos: use 'auto' ou um numero inteiro.") from None
+    return max(1, min(number, MAX_CONCURRENT_FRAGMENTS))
+
+
 def processing_args(mode: ProcessingMode) -> list[str]:
     if mode == "download":
         return ["--only-download"]
@@ -0,0 +1,91 @@
+"""Distribuicao dos jobs entre os workers (containers) dos runtimes.
+
+Antes todo job de um lote fazia `docker exec` no worker unico do runtime. Agora
+cada runtime tem um pool de workers: o principal (RUNTIMES) mais os extras de
+VDL_STUDIO_WORKERS, no formato
+
+    cyberghost=vdl-2@gluetun-2,vdl-3;none=vdl-novpn-2
+
+(`@vpn` = container de VPN de que aquele worker depende; sem ele o worker usa a
+VPN do runtime). Todos precisam montar o mesmo /data.
+
+A escolha acontece quando o escalonador libera o estagio do job:
+
+- "download" so roda em worker pronto do runtime do lote (tunel/VPN certo);
+- "process" (transcricao/contexto) nao precisa de VPN: prefere os workers do
+  runtime sem VPN e cai para os do proprio lote se nenhum estiver pronto;
+- entre os candidatos vence o com menos execs em andamento (empate: ordem
+  acima), entao subir mais containers espalha a carga sem configuracao extra.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable
+
+PROCESS_MODE = "none"
+
+
+@dataclass(frozen=True)
+class WorkerSpec:
+    name: str
+    vpn: str | None = None
+
+
+def parse_workers(spec: str | None = None) -> dict[str, list[WorkerSpec]]:
+    """Workers extras por runtime a partir de VDL_STUDIO_WORKERS (entradas vazias sao ignoradas)."""
+    spec = os.getenv("VDL_STUDIO_WORKERS", "") if spec is None else spec
+    pools: dict[str, list[WorkerSpec]] = {}
+    for entry in spec.split(";"):
+        mode, _, names = entry.partition("=")
+        for item in names.split(","):
+            name, _, vpn = item.strip().partition("@")
+            if mode.strip() and name.strip():
+                pools.setdefault(mode.strip(), []).append(WorkerSpec(name.strip(), vpn.strip() or None))
+    return pools
+
+
+class WorkerPlacement:
+    def __init__(self, status_fn: Callable[[str], dict[str, Any]]) -> None:
+        # status_fn(mode) -> runtime_status do orquestrador (com a lista "workers").
+        self.status_fn = status_fn
+        self._lock = threading.Lock()
+        self._load: dict[str, int] = {}
+
+    def candidates(self, stage: str, mode: str) -> list[str]:
+        """Workers prontos para o estagio, na ordem de preferencia."""
+        modes = [PROCESS_MODE, mode] if stage == "process" and mode != PROCESS_MODE else [mode]
+        names: list[str] = []
+        for candidate_mode in modes:
+            try:
+                workers = self.status_fn(candidate_mode).get("workers") or []
+            except Exception:
+                continue
+            names.extend(w["name"] for w in workers if w.get("ready") and w["name"] not in names)
+        return names
+
+    def acquire(self, stage: str, mode: str) -> str | None:
+        """Reserva o worker menos carregado para um exec (None = nenhum pronto)."""
+        names = self.candidates(stage, mode)
+        if not names:
+            return None
+        with self._lock:
+            name = min(names, key=lambda n: (self._load.get(n, 0), names.index(n)))
+            self._load[name] = self._load.get(name, 0) + 1
+        return name
+
+    def hold(self, name: str) -> None:
+        """Conta um exec ja em andamento (job reatado no boot)."""
+        with self._lock:
+            self._load[name] = self._load.get(name, 0) + 1
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            self._load[name] = self._load.get(name, 0) - 1
+            if self._load[name] <= 0:
+                del self._load[name]
+
+    def load(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._load)
@@ -0,0 +1,125 @@
+"""Cache do estado dos containers dos runtimes, mantido em segundo plano.
+
+Antes cada `runtime_status` fazia um `docker inspect` por container (worker e
+VPN), e `_ensure_runtime_ready`/`_run_batch`/o painel chamavam isso varias
+vezes por minuto. Agora um thread unico:
+
+- ao (re)conectar, inspeciona de uma vez todos os containers conhecidos;
+- acompanha `docker events` filtrado por esses containers e, a cada evento
+  (start/die/stop/health_status...), re-inspeciona so o container afetado;
+- se `docker events` nao estiver disponivel ou cair, volta a fazer o inspect
+  em lote a cada `poll_interval` segundos (VDL_STUDIO_RUNTIME_POLL, padrao 30).
+
+As leituras (`get`) so consultam o dicionario em memoria. Listeners sao
+avisados quando o estado de algum container muda (ex.: evento SSE "runtime").
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Iterable
+
+# Eventos que mudam estado/saude (exec_* dos jobs nao interessam aqui).
+_STATE_EVENTS = ("create", "start", "restart", "stop", "die", "kill", "oom", "pause", "unpause", "destroy", "health_status")
+
+
+def container_state(name: str, data: dict[str, Any] | None) -> dict[str, Any]:
+    """Resumo de um item do `docker inspect` (None = container inexistente)."""
+    if not data:
+        return {"name": name, "exists": False, "running": False, "healthy": False}
+    state = data.get("State", {})
+    health_status = (state.get("Health") or {}).get("Status")
+    return {
+        "name": name,
+        "exists": True,
+        "running": bool(state.get("Running")),
+        "status": state.get("Status"),
+        "health": health_status,
+        "healthy": health_status == "healthy",
+        "started_at": state.get("StartedAt"),
+    }
+
+
+def _poll_interval() -> float:
+    try:
+        return max(2.0, float(os.getenv("VDL_STUDIO_RUNTIME_POLL", "30")))
+    except ValueError:
+        return 30.0
+
+
+class ContainerMonitor:
+    def __init__(self, runner: Any, names: Iterable[str], poll_interval: float | None = None) -> None:
+        self.runner = runner
+        self.names = tuple(dict.fromkeys(name for name in names if name))
+        self.poll_interval = poll_interval if poll_interval is not None else _poll_interval()
+        self._lock = threading.Lock()
+        self._cache: dict[str, dict[str, Any]] = {}
+        self._listeners: list[Callable[[], None]] = []
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            self._listeners.append(callback)
+
+    def get(self, name: str) -> dict[str, Any]:
+        """Estado em cache; o primeiro acesso faz o inspect em lote e liga o watcher."""
+        if name not in self.names:
+            return self._inspect([name])[name]
+        with self._lock:
+            cached = self._cache.get(name)
+        if cached is None:
+            self.refresh()
+            self._ensure_running()
+            with self._lock:
+                cached = self._cache.get(name) or container_state(name, None)
+        return dict(cached)
+
+    def refresh(self, names: Iterable[str] | None = None) -> None:
+        """Re-inspeciona os containers e avisa os listeners se algo mudou."""
+        targets = [name for name in (names or self.names) if name]
+        if targets:
+            self._store(self._inspect(targets))
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _inspect(self, names: list[str]) -> dict[str, dict[str, Any]]:
+        found = {str(item.get("Name", "")).lstrip("/"): item for item in self.runner.inspect(*names)}
+        return {name: container_state(name, found.get(name)) for name in names}
+
+    def _store(self, states: dict[str, dict[str, Any]]) -> None:
+        with self._lock:
+            changed = any(self._cache.get(name) != state for name, state in states.items())
+            self._cache.update(states)
+            listeners = list(self._listeners) if changed else []
+        for callback in listeners:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def _ensure_running(self) -> None:
+        with self._lock:
+            if self._thread is None and self.names:
+                self._thread = threading.Thread(target=self._watch_loop, daemon=True, name="vdl-studio-runtime-monitor")
+                self._thread.start()
+
+    def _watch_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refresh()  # ressincroniza o que mudou enquanto estava desconectado
+                self._follow_events()
+            except Exception:
+                pass
+            # docker events indisponivel/caiu: polling em intervalo fixo ate reconectar.
+            self._stopped.wait(self.poll_interval)
+
+    def _follow_events(self) -> None:
+        filters = {"type": ["container"], "container": list(self.names), "event": list(_STATE_EVENTS)}
+        for event in self.runner.docker_events(filters):
+            if self._stopped.is_set():
+                return
+            name = ((event.get("Actor") or {}).get("Attributes") or {}).get("name")
+            if name in self.names:
+                self.refresh([name])
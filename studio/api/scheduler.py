@@ -0,0 +1,218 @@
+"""Escalonador global dos jobs do Studio.
+
+Antes cada lote abria o proprio ThreadPoolExecutor (ate 4 downloads, 2
+transcricoes): tres lotes juntos viravam 12 downloads no mesmo tunel VPN e
+nada impedia duas transcricoes Whisper grandes de disputarem a CPU.
+
+Agora todo job vira uma Task que declara os recursos que consome, e o
+escalonador so a despacha quando ha slot livre em TODOS eles:
+
+    runtime:<modo>   downloads simultaneos por runtime (tunel gluetun/VPN)
+    network          downloads/uploads simultaneos no host, somados
+    cpu              transcricao Whisper em CPU (peso = whisper_workers)
+    gpu              transcricao Whisper em GPU
+
+Capacidades em VDL_STUDIO_SLOTS, ex.: "runtime=4,network=6,cpu=2,gpu=1" ou
+por runtime: "runtime:cyberghost=2". O `concurrency` do lote continua valendo
+como teto do proprio lote.
+
+Escolha do proximo job (fila justa): entre os lotes cuja tarefa da frente
+cabe nos slots livres, vence a maior prioridade; no empate, o lote com menos
+jobs rodando e, depois, o atendido ha mais tempo. Assim um lote grande nao
+segura os menores atras dele e prioridades furam a fila sem preempcao.
+
+Estagios (pipeline): cada lote tem uma fila por estagio (`Task.stage`, ex.
+"download" e "process"), e o teto do lote vale por estagio. Um job encadeia o
+proximo estagio devolvendo uma nova Task de `run`; os recursos listados em
+`retain` nao sao liberados no fim do estagio e passam para a Task seguinte
+(liberados quando ela termina ou e cancelada). Com um recurso por lote
+(`pipeline:<lote>`, ver `set_capacity`) isso limita quantos jobs ja baixados
+podem esperar processamento: a fila entre os estagios e limitada.
+"""
+from __future__ import annotations
+
+import itertools
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+DEFAULT_SLOTS = {"runtime": 4, "network": 6, "cpu": 2, "gpu": 1}
+
+
+def load_slots(spec: str | None = None) -> dict[str, int]:
+    """Capacidades a partir de VDL_STUDIO_SLOTS (entradas invalidas sao ignoradas)."""
+    slots = dict(DEFAULT_SLOTS)
+    spec = os.getenv("VDL_STUDIO_SLOTS", "") if spec is None else spec
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        try:
+            slots[name.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return slots
+
+
+@dataclass
+class Task:
+    key: tuple[str, str]
+    group: str
+    # Pode devolver a Task do proximo estagio do mesmo job.
+    run: Callable[[], Task | None]
+    resources: dict[str, int]
+    priority: int = 0
+    group_limit: int | None = None
+    stage: str = ""
+    retain: tuple[str, ...] = ()
+    inherited: dict[str, int] = field(default_factory=dict)
+    seq: int = 0
+
+
+class JobScheduler:
+    def __init__(self, slots: dict[str, int] | None = None) -> None:
+        self.slots = dict(slots or load_slots())
+        self._lock = threading.Lock()
+        self._queues: dict[tuple[str, str], deque[Task]] = {}
+        self._in_use: dict[str, int] = {}
+        self._running: dict[tuple[str, str], Task] = {}
+        self._running_per_group: dict[str, int] = {}
+        self._running_per_stage: dict[tuple[str, str], int] = {}
+        self._last_served: dict[str, int] = {}
+        self._scale: dict[str, int] = {}
+        self._ticks = itertools.count(1)
+
+    def capacity(self, resource: str) -> int:
+        """`runtime:<modo>` sem entrada propria herda a capacidade de `runtime`."""
+        base = self.slots.get(resource) or self.slots.get(resource.split(":", 1)[0], 1)
+        return base * self._scale.get(resource, 1)
+
+    def set_scale(self, resource: str, factor: int) -> None:
+        """Multiplica a capacidade do recurso (ex.: workers prontos do runtime)."""
+        with self._lock:
+            self._scale[resource] = max(1, factor)
+            self._dispatch_locked()
+
+    def set_capacity(self, resource: str, capacity: int | None) -> None:
+        """Capacidade propria de um recurso (None volta ao padrao do prefixo)."""
+        with self._lock:
+            if capacity is None:
+                self.slots.pop(resource, None)
+            else:
+                self.slots[resource] = max(1, capacity)
+            self._dispatch_locked()
+
+    def submit(self, task: Task) -> None:
+        with self._lock:
+            self._enqueue_locked(task)
+            self._dispatch_locked()
+
+    def cancel(self, group: str, key: tuple[str, str] | None = None) -> int:
+        """Remove da fila (nao interrompe o que ja esta rodando)."""
+        with self._lock:
+            removed = 0
+            for queue_key in [queue_key for queue_key in self._queues if queue_key[0] == group]:
+                queue = self._queues[queue_key]
+                kept: deque[Task] = deque()
+                for task in queue:
+                    if key is not None and task.key != key:
+                        kept.append(task)
+                    else:
+                        self._release_locked(task.inherited)
+                        removed += 1
+                if kept:
+                    self._queues[queue_key] = kept
+                else:
+                    del self._queues[queue_key]
+            self._dispatch_locked()
+            return removed
+
+    def set_priority(self, group: str, priority: int) -> None:
+        with self._lock:
+            for (queue_group, _stage), queue in self._queues.items():
+                if queue_group == group:
+                    for task in queue:
+                        task.priority = priority
+            self._dispatch_locked()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            resources = sorted({*self.slots, *self._in_use})
+            return {
+                "slots": {name: {"capacity": self.capacity(name), "in_use": self._in_use.get(name, 0)} for name in resources},
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "running": len(self._running),
+                "queued_by_batch": self._queued_by_group_locked(),
+                "running_by_stage": {f"{group}:{stage}": count for (group, stage), count in self._running_per_stage.items()},
+            }
+
+    def _queued_by_group_locked(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for (group, _stage), queue in self._queues.items():
+            counts[group] = counts.get(group, 0) + len(queue)
+        return counts
+
+    def _enqueue_locked(self, task: Task) -> None:
+        # Peso maior que a capacidade nunca caberia: limita ao total do recurso.
+        task.resources = {name: max(1, min(amount, self.capacity(name))) for name, amount in task.resources.items()}
+        task.seq = next(self._ticks)
+        self._queues.setdefault((task.group, task.stage), deque()).append(task)
+
+    def _release_locked(self, resources: dict[str, int]) -> None:
+        for name, amount in resources.items():
+            self._in_use[name] -= amount
+            if not self._in_use[name]:
+                del self._in_use[name]
+
+    def _fits_locked(self, task: Task) -> bool:
+        if task.group_limit and self._running_per_stage.get((task.group, task.stage), 0) >= task.group_limit:
+            return False
+        return all(self._in_use.get(name, 0) + amount <= self.capacity(name) for name, amount in task.resources.items())
+
+    def _dispatch_locked(self) -> None:
+        while True:
+            candidates = [queue[0] for queue in self._queues.values() if queue and self._fits_locked(queue[0])]
+            if not candidates:
+                return
+            task = max(
+                candidates,
+                key=lambda t: (t.priority, -self._running_per_group.get(t.group, 0), -self._last_served.get(t.group, 0), -t.seq),
+            )
+            queue_key = (task.group, task.stage)
+            queue = self._queues[queue_key]
+            queue.popleft()
+            if not queue:
+                del self._queues[queue_key]
+            for name, amount in task.resources.items():
+                self._in_use[name] = self._in_use.get(name, 0) + amount
+            self._running[task.key] = task
+            self._running_per_group[task.group] = self._running_per_group.get(task.group, 0) + 1
+            self._running_per_stage[queue_key] = self._running_per_stage.get(queue_key, 0) + 1
+            self._last_served[task.group] = next(self._ticks)
+            threading.Thread(target=self._execute, args=(task,), daemon=True, name=f"vdl-studio-{task.key[0]}-{task.key[1]}").start()
+
+    def _execute(self, task: Task) -> None:
+        successor: Task | None = None
+        try:
+            successor = task.run()
+        finally:
+            with self._lock:
+                held = dict(task.inherited)
+                for name, amount in task.resources.items():
+                    held[name] = held.get(name, 0) + amount
+                carried = {name: amount for name, amount in held.items() if successor is not None and name in task.retain}
+                self._release_locked({name: amount for name, amount in held.items() if name not in carried})
+                self._running.pop(task.key, None)
+                queue_key = (task.group, task.stage)
+                self._running_per_stage[queue_key] -= 1
+                if not self._running_per_stage[queue_key]:
+                    del self._running_per_stage[queue_key]
+                self._running_per_group[task.group] -= 1
+                if not self._running_per_group[task.group]:
+                    del self._running_per_group[task.group]
+                if successor is not None:
+                    successor.inherited = carried
+                    self._enqueue_locked(successor)
+                elif task.group not in self._running_per_group and task.group not in self._queued_by_group_locked():
+                    self._last_served.pop(task.group, None)
+                self._dispatch_locked()
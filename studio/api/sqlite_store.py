@@ -0,0 +1,324 @@
+"""Store SQLite (WAL) opcional para o JobManager.
+
+Ativado com VDL_STUDIO_STORE=sqlite. Implementa a mesma interface do
+JobJournal (load/append/current_seq/flush/compact/close), entao o JobManager
+nao sabe qual backend esta usando:
+
+- `batches` e `jobs` tem indices por lote, status e updated_at: a listagem
+  filtrada e paginada da API (query_batches) sai direto deles;
+- os logs ficam na tabela `job_logs`, separada: nao sao carregados no boot nem
+  ficam na memoria do JobManager; o endpoint de logs le um job por vez;
+- WAL + synchronous=NORMAL: cada delta e um UPDATE pequeno, sem reescrever
+  nada alem da linha alterada.
+
+Migracao: na primeira abertura com o banco vazio, o estado de jobs.json +
+jobs.journal (backend antigo) e importado e os arquivos sao renomeados para
+*.migrated.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any
+
+try:
+    from .journal import JobJournal
+except ImportError:  # imagem da API: modulos copiados planos em /app
+    from journal import JobJournal
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    processing_mode TEXT NOT NULL,
+    concurrency INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    job_type TEXT NOT NULL,
+    source_path TEXT,
+    priority INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    batch_id TEXT NOT NULL REFERENCES batches(batch_id) ON DELETE CASCADE,
+    job_id TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    processing_mode TEXT NOT NULL,
+    job_type TEXT NOT NULL,
+    input_path TEXT,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (batch_id, job_id)
+);
+CREATE TABLE IF NOT EXISTS job_logs (
+    batch_id TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    logs TEXT NOT NULL,
+    PRIMARY KEY (batch_id, job_id),
+    FOREIGN KEY (batch_id, job_id) REFERENCES jobs(batch_id, job_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_batches_created_at ON batches(created_at, batch_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_batch_status ON jobs(batch_id, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs(updated_at);
+"""
+
+_BATCH_COLUMNS = (
+    "batch_id", "mode", "destination", "processing_mode", "concurrency", "created_at", "job_type", "source_path",
+    "priority",
+)
+_JOB_COLUMNS = (
+    "batch_id", "job_id", "mode", "position", "url", "filename", "destination", "processing_mode",
+    "job_type", "input_path", "options", "status", "stage", "attempt", "error", "started_at",
+    "finished_at", "updated_at",
+)
+
+
+class SqliteJobStore:
+    def __init__(self, state_dir: Path) -> None:
+        self.state_dir = state_dir
+        self.db_file = state_dir / "jobs.sqlite3"
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        # Bancos criados antes da coluna priority (escalonador global).
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(batches)")}
+        if "priority" not in columns:
+            self._conn.execute("ALTER TABLE batches ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+
+    def load(self) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        """Estado no formato do snapshot do journal, sem os logs (ficam em job_logs)."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM batches LIMIT 1").fetchone() is None:
+                self._migrate_from_journal_locked()
+            batches: dict[str, dict[str, Any]] = {}
+            for row in self._conn.execute("SELECT * FROM batches ORDER BY created_at"):
+                batches[row["batch_id"]] = {**dict(row), "jobs": []}
+            for row in self._conn.execute("SELECT * FROM jobs ORDER BY batch_id, position"):
+                job = _job_from_row(row)
+                batch = batches.get(row["batch_id"])
+                if batch is not None:
+                    batch["jobs"].append(job)
+        return {"batches": list(batches.values())}, []
+
+    def current_seq(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def append(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            self._seq += 1
+            self._apply_locked(record)
+
+    def query_batches(
+        self,
+        statuses: set[str] | None = None,
+        mode: str | None = None,
+        job_type: str | None = None,
+        created_after: str | None = None,
+        created_before: str | None = None,
+        before: tuple[str, str] | None = None,
+        limit: int | None = None,
+    ) -> tuple[list[tuple[str, set[str] | None]], bool]:
+        """Pagina da listagem (lotes mais recentes primeiro) resolvida pelos indices.
+
+        Retorna ([(batch_id, job_ids no status pedido ou None)], ha_mais_paginas).
+        `before` e a posicao (created_at, batch_id) do cursor; as datas sao
+        comparadas como instantes (julianday), independente do fuso gravado.
+        """
+        clauses, params = [], []
+        if mode:
+            clauses.append("b.mode = ?")
+            params.append(mode)
+        if job_type:
+            clauses.append("b.job_type = ?")
+            params.append(job_type)
+        if created_after:
+            clauses.append("julianday(b.created_at) >= julianday(?)")
+            params.append(created_after)
+        if created_before:
+            clauses.append("julianday(b.created_at) < julianday(?)")
+            params.append(created_before)
+        if before:
+            clauses.append("(b.created_at, b.batch_id) < (?, ?)")
+            params.extend(before)
+        if statuses:
+            marks = ", ".join("?" for _ in statuses)
+            clauses.append(f"EXISTS (SELECT 1 FROM jobs j WHERE j.batch_id = b.batch_id AND j.status IN ({marks}))")
+            params.extend(sorted(statuses))
+        sql = "SELECT b.batch_id FROM batches b"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY b.created_at DESC, b.batch_id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit) + 1)
+        with self._lock:
+            batch_ids = [row["batch_id"] for row in self._conn.execute(sql, params)]
+            has_more = bool(limit) and len(batch_ids) > int(limit)
+            batch_ids = batch_ids[:limit] if limit else batch_ids
+            matches: dict[str, set[str]] = {}
+            if statuses and batch_ids:
+                rows = self._conn.execute(
+                    f"SELECT batch_id, job_id FROM jobs WHERE batch_id IN ({', '.join('?' for _ in batch_ids)}) "
+                    f"AND status IN ({', '.join('?' for _ in statuses)})",
+                    [*batch_ids, *sorted(statuses)],
+                )
+                for row in rows:
+                    matches.setdefault(row["batch_id"], set()).add(row["job_id"])
+        return [(batch_id, matches.get(batch_id) if statuses else None) for batch_id in batch_ids], has_more
+
+    def batch_logs(self, batch_ids: list[str]) -> dict[tuple[str, str], str]:
+        """Logs dos jobs dos lotes pedidos (listagem com logs=true)."""
+        if not batch_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT batch_id, job_id, logs FROM job_logs WHERE batch_id IN ({', '.join('?' for _ in batch_ids)})",
+                batch_ids,
+            )
+            return {(row["batch_id"], row["job_id"]): row["logs"] for row in rows}
+
+    def job_logs(self, batch_id: str, job_id: str) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT logs FROM job_logs WHERE batch_id = ? AND job_id = ?", (batch_id, job_id)
+            ).fetchone()
+        return row["logs"] if row else ""
+
+    def flush(self) -> None:
+        """Cada append ja e uma transacao confirmada (interface do JobJournal)."""
+
+    def compact(self) -> None:
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _apply_locked(self, record: dict[str, Any]) -> None:
+        op = record.get("op")
+        with self._conn:
+            if op == "batch":
+                self._insert_batch_locked(record["batch"])
+            elif op == "delete":
+                self._conn.execute("DELETE FROM batches WHERE batch_id = ?", (record.get("batch_id"),))
+            elif op == "job":
+                fields = dict(record.get("fields") or {})
+                key = (record.get("batch_id"), record.get("job_id"))
+                logs = fields.pop("logs", None)
+                columns = [name for name in fields if name in _JOB_COLUMNS and name not in ("batch_id", "job_id")]
+                if columns:
+                    values = [json.dumps(fields[c]) if c == "options" else fields[c] for c in columns]
+                    self._conn.execute(
+                        f"UPDATE jobs SET {', '.join(f'{c} = ?' for c in columns)} WHERE batch_id = ? AND job_id = ?",
+                        (*values, *key),
+                    )
+                if logs is not None and self._job_exists_locked(*key):
+                    self._conn.execute(
+                        "INSERT INTO job_logs (batch_id, job_id, logs) VALUES (?, ?, ?) "
+                        "ON CONFLICT(batch_id, job_id) DO UPDATE SET logs = excluded.logs",
+                        (*key, logs),
+                    )
+
+    def _job_exists_locked(self, batch_id: str, job_id: str) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM jobs WHERE batch_id = ? AND job_id = ?", (batch_id, job_id)
+        ).fetchone() is not None
+
+    def _insert_batch_locked(self, batch: dict[str, Any]) -> None:
+        row = {
+            "processing_mode": "download",
+            "concurrency": 1,
+            "job_type": "download",
+            "source_path": None,
+            "priority": 0,
+            **{k: v for k, v in batch.items() if k in _BATCH_COLUMNS},
+        }
+        # Upsert, nao INSERT OR REPLACE: o REPLACE apaga a linha antes e o ON
+        # DELETE CASCADE levaria junto os jobs e os logs (que nao estao na memoria).
+        self._conn.execute(_upsert_sql("batches", _BATCH_COLUMNS, ("batch_id",)), [row[c] for c in _BATCH_COLUMNS])
+        for job in batch.get("jobs", []):
+            values = {
+                "processing_mode": row["processing_mode"],
+                "job_type": "download",
+                "input_path": None,
+                "status": "queued",
+                "stage": "queued",
+                "attempt": 0,
+                "error": None,
+                "started_at": None,
+                "finished_at": None,
+                "updated_at": row["created_at"],
+                **{k: v for k, v in job.items() if k in _JOB_COLUMNS},
+            }
+            values["options"] = json.dumps(job.get("options") or {}, ensure_ascii=False)
+            self._conn.execute(
+                _upsert_sql("jobs", _JOB_COLUMNS, ("batch_id", "job_id")), [values.get(c) for c in _JOB_COLUMNS],
+            )
+            if job.get("logs"):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO job_logs (batch_id, job_id, logs) VALUES (?, ?, ?)",
+                    (values["batch_id"], values["job_id"], job["logs"]),
+                )
+
+    def _migrate_from_journal_locked(self) -> None:
+        journal = JobJournal(self.state_dir, snapshot_fn=lambda: {})
+        if not (journal.snapshot_file.exists() or journal.journal_file.exists()):
+            return
+        snapshot, records = journal.load()
+        batches = {batch["batch_id"]: batch for batch in snapshot.get("batches", [])}
+        for record in records:
+            op = record.get("op")
+            if op == "batch":
+                batches[record["batch"]["batch_id"]] = record["batch"]
+            elif op == "delete":
+                batches.pop(record.get("batch_id"), None)
+            elif op == "job":
+                batch = batches.get(record.get("batch_id"))
+                job = next((j for j in (batch or {}).get("jobs", []) if j.get("job_id") == record.get("job_id")), None)
+                if job is not None:
+                    job.update(record.get("fields") or {})
+        with self._conn:
+            for batch in batches.values():
+                self._insert_batch_locked(batch)
+        for path in (journal.snapshot_file, journal.journal_file):
+            if path.exists():
+                path.replace(path.with_name(path.name + ".migrated"))
+
+
+def _upsert_sql(table: str, columns: tuple[str, ...], key: tuple[str, ...]) -> str:
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c not in key)
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT({', '.join(key)}) DO UPDATE SET {updates}"
+    )
+
+
+def _job_from_row(row: sqlite3.Row) -> dict[str, Any]:
+    job = dict(row)
+    try:
+        job["options"] = json.loads(job.get("options") or "{}")
+    except ValueError:
+        job["options"] = {}
+    return job
@@ -73,6 +73,9 @@ const batchOperationMeta = {
   },
 };
 
+// Lotes por página no histórico; "Carregar mais" amplia a janela.
+const JOBS_PAGE_SIZE = 50;
+
 const sidebarPreference = localStorage.getItem("vdl.sidebarCollapsed");
 
 const state = {
@@ -85,6 +88,10 @@ const state = {
   transcribeEngine: "local",
   runtimeStatus: null,
   batches: [],
+  serverNow: null,
+  serverNowAt: 0,
+  jobsLimit: JOBS_PAGE_SIZE,
+  jobsHasMore: false,
   selectedJobId: null,
   currentFilePath: "/data",
   fileDialogTarget: "destination",
@@ -131,9 +138,9 @@ function setToken(token) {
   else localStorage.removeItem("vdl.token");
 }
 
-async function api(path, options = {}) {
+function apiFetch(path, options = {}) {
   const token = getToken();
-  const response = await fetch(`/api${path}`, {
+  return fetch(`/api${path}`, {
     ...options,
     headers: {
       "Content-Type": "application/json",
@@ -141,6 +148,28 @@ async function api(path, options = {}) {
       ...(options.headers || {}),
     },
   });
+}
+
+async function api(path, options = {}) {
+  return readApiResponse(path, await apiFetch(path, options));
+}
+
+// GET condicional: reenvia o ETag da última resposta do mesmo path. Devolve
+// null quando o servidor responde 304 (nada mudou; o chamador mantém o estado).
+const apiEtags = new Map();
+async function apiIfChanged(path) {
+  const etag = apiEtags.get(path);
+  const response = await apiFetch(path, {
+    cache: "no-store",
+    headers: etag ? { "If-None-Match": etag } : {},
+  });
+  if (response.status === 304) return null;
+  const data = await readApiResponse(path, response);
+  if (response.headers.get("ETag")) apiEtags.set(path, response.headers.get("ETag"));
+  return data;
+}
+
+async function readApiResponse(path, response) {
   const text = await response.text();
   const data = text ? JSON.parse(text) : {};
   if (!response.ok) {
@@ -210,7 +239,8 @@ function relativeAge(iso) {
   if (!iso) return "";
   const then = new Date(iso).getTime();
   if (Number.isNaN(then)) return "";
-  const now = state.serverNow ? new Date(state.serverNow).getTime() : Date.now();
+  // Avança o relógio do servidor pelo tempo local decorrido desde a última leitura.
+  const now = state.serverNow ? new Date(state.serverNow).getTime() + (Date.now() - state.serverNowAt) : Date.now();
   const sec = Math.max(0, Math.round((now - then) / 1000));
   if (sec < 60) return `há ${sec}s`;
   if (sec < 3600) return `há ${Math.floor(sec / 60)} min`;
@@ -433,7 +463,8 @@ function updateTranscriptionHint() {
 
 function updatePipelineSummary() {
   const t = state.transcriptionMode;
-  const steps = ["Baixar vídeo"];
+  const keepVideo = t === "none" || $("#downloadVideo")?.checked !== false;
+  const steps = [keepVideo ? "Baixar vídeo" : "Baixar só o áudio"];
   if (t !== "none" || $("#extractAudio")?.checked) steps.push("extrair MP3");
   if (t === "local") steps.push("transcrever (Whisper local)");
   else if (t === "openai") steps.push("transcrever (OpenAI)");
@@ -474,21 +505,21 @@ function applyProcessingRules() {
   }
 
   if (mode === "openai") {
-    setCheckbox("downloadVideo", true, true);
+    setCheckbox("downloadVideo", true, false);
     setCheckbox("extractAudio", true, false);
     setCheckbox("useGpu", false, true);
     setCheckbox("generateContext", true, false);
     setCheckbox("generateSubtitles", true, false);
-    setText("#processingRuleText", "OpenAI usa o modo unificado do VDL; download permanece obrigatório e GPU local fica desativada.");
+    setText("#processingRuleText", "OpenAI usa o modo unificado do VDL; sem manter o vídeo, só o áudio é baixado. GPU local fica desativada.");
     return;
   }
 
-  setCheckbox("downloadVideo", true, true);
+  setCheckbox("downloadVideo", true, false);
   setCheckbox("extractAudio", true, false);
   setCheckbox("useGpu", false, false);
   setCheckbox("generateContext", false, false);
   setCheckbox("generateSubtitles", true, false);
-  setText("#processingRuleText", "Transcrição local permite legendas e contexto; download permanece obrigatório.");
+  setText("#processingRuleText", "Transcrição local permite legendas e contexto; sem manter o vídeo, só o áudio é baixado.");
 }
 
 function selectedProcessingMode() {
@@ -531,6 +562,10 @@ function renderRuntime() {
     .map((runtime) => {
       const worker = runtime.worker || {};
       const vpn = runtime.vpn || {};
+      const pool = runtime.workers || [];
+      const poolRow = pool.length > 1
+        ? `<div>Workers: <span>${pool.filter((item) => item.ready).length}/${pool.length} prontos</span></div>`
+        : "";
       return `
         <article class="runtime-card ${runtime.mode === state.selectedMode ? "selected" : ""}" data-card-mode="${runtime.mode}">
           <h3>${runtime.label} ${badge(runtime)}</h3>
@@ -538,6 +573,7 @@ function renderRuntime() {
             <div>Worker: <span>${worker.running ? worker.status : "off"}</span></div>
             <div>VPN: <span>${vpn.name ? vpn.health || vpn.status || "off" : "não aplicada"}</span></div>
             <div>Container: <span>${worker.name || "-"}</span></div>
+            ${poolRow}
           </div>
         </article>
       `;
@@ -874,9 +910,15 @@ function buildPayload() {
     concurrency,
     processing_mode: selectedProcessingMode(),
     filenames: filenameLines(urls.length),
+    concurrent_fragments: fragmentsSetting($("#fragmentsInput")?.value),
+    keep_video: state.transcriptionMode === "none" || $("#downloadVideo")?.checked !== false,
   };
 }
 
+function fragmentsSetting(value) {
+  return value === "auto" ? "auto" : Number(value) || 1;
+}
+
 // Nomes alinhados POSICIONALMENTE às URLs (linha vazia = automático no backend).
 function filenameLines(count) {
   const raw = ($("#filenamesInput")?.value ?? "").split(/\r?\n/).map((line) => line.trim());
@@ -971,6 +1013,7 @@ function buildLocalPayload() {
     processing_mode: openai ? "unified" : state.localProcessingMode,
     use_gpu: openai ? false : $("#localUseGpu").checked,
     whisper_model: openai ? "base" : $("#localWhisperModel").value,
+    whisper_workers: openai ? 1 : Number($("#localWhisperWorkers").value) || 1,
   };
 }
 
@@ -981,7 +1024,7 @@ function setTranscribeEngine(engine) {
     button.classList.toggle("active", button.dataset.transcribeEngine === state.transcribeEngine);
   });
   // Whisper local/GPU/modo só fazem sentido no engine local
-  ["localModeField", "localWhisperField", "localGpuField"].forEach((id) => $(`#${id}`)?.classList.toggle("hidden", openai));
+  ["localModeField", "localWhisperField", "localWorkersField", "localGpuField"].forEach((id) => $(`#${id}`)?.classList.toggle("hidden", openai));
   const hint = $("#transcribeOpenaiHint");
   if (hint) hint.hidden = !openai;
   setText(
@@ -1227,6 +1270,7 @@ async function libraryNewFolder() {
 function renderJobs() {
   renderMetrics();
   renderJobsHistory("#jobsTable", state.batches);
+  $("#loadMoreJobs")?.classList.toggle("hidden", !state.jobsHasMore);
   if ($("#transcribeJobsTable")) {
     renderJobsHistory("#transcribeJobsTable", state.batches.filter((batch) => (batch.job_type || "download") === "local"));
   }
@@ -1306,6 +1350,12 @@ function batchActionsHtml(batch) {
   if ((batch.job_type || "download") === "download") {
     buttons.push(`<button class="batch-action" data-batch-action="import" data-batch-id="${id}" type="button" title="Carregar URLs, nomes e opções no formulário">Importar</button>`);
   }
+  if (jobs.some((job) => job.status === "queued")) {
+    const urgent = (batch.priority || 0) > 0;
+    buttons.push(
+      `<button class="batch-action" data-batch-action="priority" data-batch-id="${id}" type="button" title="${urgent ? "Voltar à fila normal" : "Passar os jobs na fila deste lote à frente dos outros lotes"}">${urgent ? "Prioridade normal" : "Priorizar"}</button>`,
+    );
+  }
   if (hasPending) {
     buttons.push(`<button class="batch-action" data-batch-action="cancel" data-batch-id="${id}" type="button">Cancelar</button>`);
   }
@@ -1349,10 +1399,26 @@ function renderJobsHistory(selector, batches) {
       else if (button.dataset.batchAction === "retry") retryBatch(batchId, batch);
       else if (button.dataset.batchAction === "delete") deleteBatch(batchId);
       else if (button.dataset.batchAction === "import") importBatch(batch);
+      else if (button.dataset.batchAction === "priority") setBatchPriority(batchId, (batch?.priority || 0) > 0 ? 0 : 5);
     });
   });
 }
 
+async function setBatchPriority(batchId, priority) {
+  try {
+    upsertBatch(
+      await api(`/jobs/batch/${encodeURIComponent(batchId)}/priority`, {
+        method: "POST",
+        body: JSON.stringify({ priority }),
+      }),
+    );
+    renderJobs();
+    toast(priority > 0 ? `Lote ${escapeHtml(batchId)} priorizado.` : `Lote ${escapeHtml(batchId)} voltou à fila normal.`, "ok");
+  } catch (error) {
+    toast(`Falha ao mudar prioridade: ${escapeHtml(error.message)}`, "error");
+  }
+}
+
 function importBatch(batch) {
   if (!batch) return;
   const jobs = batch.jobs || [];
@@ -1366,10 +1432,13 @@ function importBatch(batch) {
   const pm = batch.processing_mode || "download";
   setTranscription(pm === "unified" ? "openai" : pm === "download" ? "none" : "local");
   if (pm === "context") setCheckbox("generateContext", true, false);
+  if (pm !== "download" && jobs[0] && jobs[0].options && jobs[0].options.audio_only) setCheckbox("downloadVideo", false, false);
 
   const conc = Math.max(1, Math.min(4, Number(batch.concurrency) || 1));
   setExecution(conc > 1 ? "parallel" : "sequential");
   if ($("#concurrencyInput")) $("#concurrencyInput").value = String(conc);
+  const fragments = String((jobs[0] && jobs[0].options && jobs[0].options.concurrent_fragments) || 1);
+  if ($("#fragmentsInput")) $("#fragmentsInput").value = fragments;
 
   $("#cookieInput").value = "";
   state.credentialValidated = false;
@@ -1466,15 +1535,49 @@ async function deleteBatch(batchId) {
 function jobProgress(job) {
   if (job.status === "succeeded") return 1;
   if (["failed", "blocked", "canceled", "interrupted"].includes(job.status)) return 1;
-  if (job.status === "running") return 0.6;
+  if (job.status === "running") {
+    // Percentual real lido do yt-dlp/ffmpeg; sem ele, barra indeterminada.
+    const percent = job.progress && job.progress.percent;
+    return typeof percent === "number" ? Math.min(percent, 100) / 100 : 0.6;
+  }
   return 0;
 }
 
+function formatEta(seconds) {
+  if (typeof seconds !== "number") return "";
+  const h = Math.floor(seconds / 3600);
+  const m = Math.floor((seconds % 3600) / 60);
+  const s = Math.floor(seconds % 60);
+  return h ? `${h}h${String(m).padStart(2, "0")}` : `${m}:${String(s).padStart(2, "0")}`;
+}
+
+function progressDetail(job) {
+  const progress = job.status === "running" && job.progress;
+  const stats = job.options && job.options.download_stats;
+  if (!progress) {
+    // Resumo do download concluído: velocidade média e fragmentos simultâneos.
+    if (!stats || !stats.average_speed_bps) return "";
+    return `média ${formatSize(stats.average_speed_bps)}/s · ${stats.concurrent_fragments} frag. simult.`;
+  }
+  const parts = [];
+  if (progress.speed_bps) parts.push(`${formatSize(progress.speed_bps)}/s`);
+  else if (progress.speed_factor) parts.push(`${progress.speed_factor}x`);
+  if (typeof progress.eta_seconds === "number") parts.push(`ETA ${formatEta(progress.eta_seconds)}`);
+  if (progress.fragments) parts.push(`frag ${progress.fragment}/${progress.fragments}`);
+  if (progress.concurrent_fragments) parts.push(`${progress.concurrent_fragments} simult.`);
+  return parts.join(" · ");
+}
+
 function progressHtml(job) {
   const pct = Math.round(jobProgress(job) * 100);
   const color = ["failed", "blocked", "canceled", "interrupted"].includes(job.status) ? "var(--red)" : "var(--cyan)";
-  const label = job.status === "queued" ? "—" : `${pct}%`;
-  return `<div class="progress-cell"><div class="progress-track"><i style="width:${pct}%;background:${color}"></i></div><span>${label}</span></div>`;
+  const known = job.status !== "running" || (job.progress && typeof job.progress.percent === "number");
+  // Download concluído esperando o estágio de transcrição/contexto (pipeline).
+  const waiting = job.stage === "downloaded" ? "baixado" : "—";
+  const label = job.status === "queued" ? waiting : known ? `${pct}%` : "…";
+  const detail = progressDetail(job);
+  const speed = detail.split(" · ")[0];
+  return `<div class="progress-cell"${detail ? ` title="${escapeHtml(detail)}"` : ""}><div class="progress-track"><i style="width:${pct}%;background:${color}"></i></div><span>${escapeHtml(speed ? `${label} · ${speed}` : label)}</span></div>`;
 }
 
 function renderQueue(selector, jobs) {
@@ -1508,9 +1611,11 @@ function renderQueue(selector, jobs) {
 
 async function refreshJobs() {
   try {
-    const data = await api("/jobs");
+    const data = await apiIfChanged(`/jobs?limit=${state.jobsLimit}`);
+    if (!data) return;
     state.batches = data.batches || [];
-    state.serverNow = data.server_now || null;
+    state.jobsHasMore = Boolean(data.next_cursor);
+    setServerNow(data.server_now);
     renderJobs();
   } catch (error) {
     const message = `<div class="table-empty error">Falha ao carregar jobs: ${escapeHtml(error.message)}</div>`;
@@ -1520,6 +1625,98 @@ async function refreshJobs() {
   }
 }
 
+function setServerNow(iso) {
+  state.serverNow = iso || null;
+  state.serverNowAt = Date.now();
+}
+
+// --- Stream SSE (/api/events): deltas de jobs e status do runtime ---
+let eventSource = null;
+let pollTimers = [];
+
+function startPolling() {
+  if (pollTimers.length) return;
+  pollTimers.push(setInterval(refreshStatus, 6000));
+  pollTimers.push(setInterval(refreshJobs, 4000));
+}
+
+function stopPolling() {
+  pollTimers.forEach(clearInterval);
+  pollTimers = [];
+}
+
+function upsertBatch(batch) {
+  const index = state.batches.findIndex((item) => item.batch_id === batch.batch_id);
+  if (index >= 0) state.batches[index] = batch;
+  else state.batches.unshift(batch);
+}
+
+function applyJobEvent(job) {
+  const batch = state.batches.find((item) => item.batch_id === job.batch_id);
+  if (!batch) return false;
+  const current = batch.jobs.find((item) => item.job_id === job.job_id);
+  if (current) Object.assign(current, job);
+  else batch.jobs.push(job);
+  return true;
+}
+
+function closeEvents() {
+  if (eventSource) eventSource.close();
+  eventSource = null;
+}
+
+// Conecta no stream SSE; enquanto ele estiver aberto o polling fica desligado.
+// Sem EventSource (ou com o stream caído) volta ao polling de 4s/6s.
+function connectEvents() {
+  if (!window.EventSource || !getToken()) {
+    startPolling();
+    return;
+  }
+  closeEvents();
+  eventSource = new EventSource(`/api/events?token=${encodeURIComponent(getToken())}`);
+  const on = (type, handler) =>
+    eventSource.addEventListener(type, (event) => {
+      const data = JSON.parse(event.data || "{}");
+      if (data.server_now) setServerNow(data.server_now);
+      handler(data);
+    });
+  on("hello", () => {
+    stopPolling();
+    setApiHealth(true);
+    refreshJobs(); // ressincroniza o que pode ter mudado enquanto estava desconectado
+  });
+  on("resync", () => refreshJobs());
+  on("batch", (data) => {
+    upsertBatch(data.batch);
+    renderJobs();
+  });
+  on("batch_deleted", (data) => {
+    state.batches = state.batches.filter((item) => item.batch_id !== data.batch_id);
+    renderJobs();
+  });
+  on("job", (data) => {
+    if (applyJobEvent(data.job)) renderJobs();
+    else refreshJobs();
+  });
+  on("job_progress", (data) => {
+    const batch = state.batches.find((item) => item.batch_id === data.batch_id);
+    const job = batch && batch.jobs.find((item) => item.job_id === data.job_id);
+    if (!job) return;
+    job.progress = data.progress;
+    renderJobs();
+  });
+  on("runtime", (data) => {
+    state.runtimeStatus = data.status;
+    setApiHealth(true);
+    renderRuntime();
+  });
+  eventSource.onerror = () => {
+    // O EventSource reconecta sozinho; até lá o polling cobre as atualizações.
+    setApiHealth(false);
+    startPolling();
+  };
+}
+
 async function openFileDialog(path = "/data", target = "destination") {
   state.currentFilePath = path;
   state.fileDialogTarget = target;
@@ -1666,6 +1863,7 @@ function clearActiveOperation() {
   state.credentialValue = "";
   $("#destinationInput").value = $("#currentDestinationLabel")?.textContent || "/data/downloads";
   setExecution("sequential");
+  if ($("#fragmentsInput")) $("#fragmentsInput").value = "1";
   setTranscription("none");
   renderNamePreview();
   updateDownloadValidation(true);
@@ -1676,6 +1874,7 @@ function clearLocalOperation() {
   $("#localSourceInput").value = $("#currentDestinationLabel")?.textContent || "/data/storage/media";
   $("#localDestinationInput").value = $("#localSourceInput").value;
   $("#localWhisperModel").value = "base";
+  $("#localWhisperWorkers").value = "1";
   $("#localConcurrencyInput").value = "1";
   $("#localUseGpu").checked = false;
   setLocalProcessing("transcribe");
@@ -1781,6 +1980,10 @@ function bindEvents() {
   $("#testIp").addEventListener("click", testRuntimeIp);
   $("#loadLogs").addEventListener("click", loadLogs);
   $("#refreshJobs").addEventListener("click", refreshJobs);
+  $("#loadMoreJobs")?.addEventListener("click", () => {
+    state.jobsLimit += JOBS_PAGE_SIZE;
+    refreshJobs();
+  });
   $("#refreshQueue").addEventListener("click", refreshJobs);
   $("#downloadForm").addEventListener("submit", createBatch);
   $("#localTranscriptionForm").addEventListener("submit", createLocalTranscriptionBatch);
@@ -1788,7 +1991,7 @@ function bindEvents() {
   $("#filenamesInput")?.addEventListener("input", renderNamePreview);
   $("#destinationInput").addEventListener("input", () => updateDownloadValidation());
   $("#cookieInput").addEventListener("input", () => updateDownloadValidation());
-  ["extractAudio", "generateContext", "generateSubtitles", "useGpu"].forEach((id) => {
+  ["downloadVideo", "extractAudio", "generateContext", "generateSubtitles", "useGpu"].forEach((id) => {
     $(`#${id}`)?.addEventListener("change", () => {
       updateDownloadValidation();
       updatePipelineSummary();
@@ -1868,6 +2071,8 @@ function handleUnauthorized() {
   appStarted = false;
   refreshTimers.forEach(clearInterval);
   refreshTimers = [];
+  stopPolling();
+  closeEvents();
   showView("login");
 }
 
@@ -2064,8 +2269,9 @@ async function startApp() {
   await refreshStatus();
   await refreshJobs();
   await loadLibrary(state.libraryPath);
-  refreshTimers.push(setInterval(refreshStatus, 6000));
-  refreshTimers.push(setInterval(refreshJobs, 4000));
+  connectEvents();
+  // Idades relativas ("há 12s") andam sem rede: re-render local dos jobs.
+  refreshTimers.push(setInterval(() => state.batches.length && renderJobs(), 15000));
   refreshTimers.push(
     setInterval(() => {
       if (state.selectedPanel === "library") loadLibrary(state.libraryPath, false);
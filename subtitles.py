@@ -18,9 +18,7 @@ import argparse
 import gc
 import json
 import os
-import subprocess
 import sys
-import tempfile
 import time
 from pathlib import Path
 from typing import Any, Dict, List
@@ -65,15 +63,6 @@ def write_utf8(path: Path, text: str):
         f.write(text)
 
 # ───────────── I/O helpers ─────────────
-def extract_audio(video: Path) -> Path:
-    tmp = Path(tempfile.gettempdir()) / f"{video.stem}_{int(time.time())}.wav"
-    subprocess.run(
-        ["ffmpeg", "-loglevel", "error", "-y", "-i", str(video),
-         "-ac", "1", "-ar", "16000", "-vn", str(tmp)],
-        check=True
-    )
-    return tmp
-
 def sanitize_line(t: str) -> str:
     """Remove backticks e aspas duplas/curvas nas pontas."""
     t = t.strip()
@@ -148,14 +137,36 @@ def translate(texts: List[str], engine: str, lang: str,
 
     raise ValueError("engine de tradução inválido")
 
+# ───────────── Transcrição (com cache) ─────────────
+def transcribe_cached(model, vid: Path, model_name: str) -> Dict[str, Any]:
+    """Transcreve a mídia consultando antes o cache compartilhado com o vdl.py.
+
+    A chave usa o hash do áudio da mídia, então legendas geradas depois de
+    um `vdl -t` (mesmo modelo) não pagam o Whisper de novo."""
+    import _transcript_cache
+
+    key = None
+    if _transcript_cache.enabled():
+        key = _transcript_cache.cache_key(vid, model_name, "faster-whisper")
+        cached = _transcript_cache.load(key)
+        if cached is not None:
+            print("   • transcrição reaproveitada do cache")
+            return cached
+
+    # O adapter decodifica a mídia via pipe do ffmpeg (PCM 16 kHz em memória):
+    # sem WAV temporário no disco.
+    res = model.transcribe(str(vid), verbose=False)
+    if key:
+        _transcript_cache.store(key, res, model_name, "faster-whisper")
+    return res
+
 # ───────────── Processa um vídeo ─────────────
 def process_file(model, vid: Path, args):
     print(f"▶  {vid.name}")
-    audio = extract_audio(vid)
     try:
         output_dir = Path(args.output_dir) if args.output_dir else vid.parent
         output_dir.mkdir(parents=True, exist_ok=True)
-        res = model.transcribe(str(audio), verbose=False)
+        res = transcribe_cached(model, vid, args.model)
         # Usa o idioma detectado pelo Whisper para nomear a legenda source.
         # (antes era hardcoded "en", causando arquivos .en.srt com PT/ES/etc.)
         detected_lang = res.get("language") or "und"
@@ -189,7 +200,6 @@ def process_file(model, vid: Path, args):
         except Exception as e:
             print(f"   ! Tradução falhou ({e}) – gerado apenas {source_code}")
     finally:
-        audio.unlink(missing_ok=True)
         gc.collect()
 
 # ───────────── CLI / main ─────────────
@@ -209,6 +219,8 @@ def main():
                     help="Delay entre chamadas OpenAI (segundos)")
     ap.add_argument("--threads", type=int, default=0,
                     help="Threads do torch (0=padrão do sistema, recomendado para CPU multi-core).")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Processos paralelos de transcrição em CPU (áudio dividido nos silêncios; padrão: VDL_WHISPER_WORKERS ou 1).")
     ap.add_argument("--output-dir", default=None,
                     help="Diretório onde os arquivos .srt serão gravados (padrão: ao lado da mídia).")
     args = ap.parse_args()
@@ -229,7 +241,7 @@ def main():
 
     print(f"╭─ Carregando modelo {args.model}…")
     use_gpu = args.device == "cuda"
-    model, _device = load_whisper_model(args.model, use_gpu=use_gpu)
+    model, _device = load_whisper_model(args.model, use_gpu=use_gpu, workers=args.workers)
     print("╰─ Modelo pronto.\n")
 
     root = Path(args.target)
@@ -239,11 +251,14 @@ def main():
     if not vids:
         sys.exit("Nada a processar.")
 
-    for v in sorted(vids):
-        try:
-            process_file(model, v, args)
-        except Exception as exc:
-            print(f"   ! Erro inesperado: {exc}")
+    try:
+        for v in sorted(vids):
+            try:
+                process_file(model, v, args)
+            except Exception as exc:
+                print(f"   ! Erro inesperado: {exc}")
+    finally:
+        model.close()
 
 if __name__ == "__main__":
     main()
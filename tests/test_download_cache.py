@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import _download_cache
+
+HOUR = 3600
+
+
+class CollectTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        # ~1073 bytes de limite: duas entradas de 500 cabem, três não.
+        env = mock.patch.dict(os.environ, {
+            "VDL_DOWNLOAD_CACHE": tmp.name,
+            "VDL_DOWNLOAD_CACHE_MAX_GB": "0.000001",
+            "VDL_DOWNLOAD_CACHE_MAX_AGE_HOURS": "72",
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        self.now = time.time()
+
+    def entry(self, name, age_seconds, size=500):
+        """Entrada com um fragmento de `size` bytes e última atividade há `age_seconds`."""
+        path = self.root / name
+        path.mkdir()
+        fragment = path / "frag1.part"
+        fragment.write_bytes(b"x" * size)
+        stamp = self.now - age_seconds
+        for target in (fragment, path):
+            os.utime(target, (stamp, stamp))
+        return path
+
+    def test_removes_entries_idle_longer_than_max_age(self) -> None:
+        stale = self.entry("stale", 73 * HOUR, size=10)
+        recent = self.entry("recent", 71 * HOUR, size=10)
+
+        freed = _download_cache.collect(now=self.now)
+
+        self.assertEqual(freed, 10)
+        self.assertFalse(stale.exists())
+        self.assertTrue(recent.exists())
+
+    def test_active_entry_is_never_removed(self) -> None:
+        active = self.entry("active", 100 * HOUR, size=5000)
+
+        self.assertEqual(_download_cache.collect(active=active, now=self.now), 0)
+        self.assertTrue(active.exists())
+
+    def test_over_the_size_limit_removes_least_recent_entries_first(self) -> None:
+        oldest = self.entry("oldest", 3 * HOUR)
+        older = self.entry("older", 2 * HOUR)
+        newest = self.entry("newest", 1 * HOUR)
+
+        freed = _download_cache.collect(now=self.now)
+
+        self.assertEqual(freed, 500)
+        self.assertFalse(oldest.exists())
+        self.assertTrue(older.exists())
+        self.assertTrue(newest.exists())
+
+    def test_size_limit_counts_the_active_entry_and_spares_recent_writes(self) -> None:
+        idle = self.entry("idle", 2 * HOUR)
+        in_progress = self.entry("in-progress", 60)  # outro processo ainda escrevendo
+        active = self.entry("active", 0, size=1000)
+
+        _download_cache.collect(active=active, now=self.now)
+
+        self.assertFalse(idle.exists())
+        self.assertTrue(in_progress.exists())
+        self.assertTrue(active.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
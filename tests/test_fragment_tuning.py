@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from _fragment_tuning import AUTO, DEFAULT_START, FragmentTuner, parse_setting
+
+URL = "https://cdn.example.com/aula/master.m3u8"
+
+
+class FragmentTuningTestCase(unittest.TestCase):
+    """Estado do ajuste (tuning.json) num VDL_DOWNLOAD_CACHE temporário."""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state_path = os.path.join(tmp.name, "tuning.json")
+        env = mock.patch.dict(os.environ, {"VDL_DOWNLOAD_CACHE": tmp.name, "VDL_MAX_CONCURRENT_FRAGMENTS": "16"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def remember(self, fragments, per_fragment_bps):
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump({"cdn.example.com": {"fragments": fragments, "per_fragment_bps": per_fragment_bps}}, f)
+
+    def remembered(self):
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)["cdn.example.com"]
+
+    @staticmethod
+    def run_at(tuner, speed):
+        for _ in range(3):
+            tuner.observe(f"[download]  42.0% of ~ 1.00GiB at  {speed} ETA 01:00 (frag 10/100)")
+        tuner.finish()
+
+
+class ParseSettingTests(FragmentTuningTestCase):
+    def test_accepts_auto_and_positive_integers(self) -> None:
+        self.assertEqual(parse_setting(" Auto "), AUTO)
+        self.assertEqual(parse_setting("4"), 4)
+        self.assertEqual(parse_setting(1), 1)
+
+    def test_caps_at_the_configured_maximum(self) -> None:
+        self.assertEqual(parse_setting("64"), 16)
+        with mock.patch.dict(os.environ, {"VDL_MAX_CONCURRENT_FRAGMENTS": "8"}):
+            self.assertEqual(parse_setting("10"), 8)
+
+    def test_rejects_zero_negative_and_garbage(self) -> None:
+        for value in ("0", "-2", "muitos", "2.5"):
+            with self.assertRaises(ValueError):
+                parse_setting(value)
+
+
+class FragmentTunerTests(FragmentTuningTestCase):
+    def test_fixed_setting_is_used_as_is_and_never_recorded(self) -> None:
+        tuner = FragmentTuner(URL, 3)
+        self.run_at(tuner, "2.00MiB/s")
+
+        self.assertFalse(tuner.adaptive)
+        self.assertEqual(tuner.fragments, 3)
+        self.assertFalse(os.path.exists(self.state_path))
+
+    def test_auto_starts_at_the_default_then_at_the_remembered_value(self) -> None:
+        self.assertEqual(FragmentTuner(URL, AUTO).fragments, DEFAULT_START)
+
+        self.remember(10, 1000)
+
+        self.assertEqual(FragmentTuner(URL, AUTO).fragments, 10)
+
+    def test_steps_up_while_per_fragment_throughput_still_scales(self) -> None:
+        self.remember(4, 400_000)
+        tuner = FragmentTuner(URL, AUTO)
+
+        self.run_at(tuner, "1.60MB/s")  # 400 kB/s por fragmento: igual à anterior
+
+        self.assertEqual(tuner.average_bps(), 1_600_000)
+        self.assertEqual(self.remembered(), {"fragments": 6, "per_fragment_bps": 400_000})
+
+    def test_steps_down_when_per_fragment_throughput_drops(self) -> None:
+        self.remember(4, 400_000)
+        tuner = FragmentTuner(URL, AUTO)
+
+        self.run_at(tuner, "800.00KB/s")  # 200 kB/s por fragmento: < 75% da anterior
+
+        self.assertEqual(self.remembered()["fragments"], 3)
+
+    def test_throttling_halves_in_auto_mode_and_keeps_the_reduced_value(self) -> None:
+        self.remember(8, 400_000)
+        tuner = FragmentTuner(URL, AUTO)
+
+        for status in (429, 403):
+            self.assertTrue(tuner.observe(f"[download] Got error: HTTP Error {status}. Retrying fragment 12 (1/10)..."))
+            tuner.back_off()
+        self.run_at(tuner, "1.00MB/s")
+
+        self.assertEqual(tuner.fragments, 2)
+        self.assertEqual(self.remembered()["fragments"], 2)
+
+    def test_throttling_does_not_restart_fixed_or_single_fragment_downloads(self) -> None:
+        fixed = FragmentTuner(URL, 8)
+        self.assertFalse(fixed.observe("HTTP Error 429: Too Many Requests"))
+
+        self.remember(1, 0)
+        single = FragmentTuner(URL, AUTO)
+        self.assertFalse(single.observe("HTTP Error 429: Too Many Requests"))
+        self.assertEqual(single.back_off(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import unittest
+
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad
+
+import _hls_native
+from _hls_native import HlsError, Key, parse_media, select_variant
+
+BASE = "https://cdn.example.com/aula/master.m3u8"
+KEY_BYTES = bytes(range(16))
+
+MASTER = """#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="English",LANGUAGE="en",URI="audio/en.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="Português",DEFAULT=YES,LANGUAGE="pt",URI="audio/pt.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="Español",LANGUAGE="es",URI="audio/es.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2",AUDIO="aac"
+360p.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080,AUDIO="aac"
+https://other.example.com/1080p.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2000000,RESOLUTION=1280x720,AUDIO="aac"
+720p.m3u8
+"""
+
+
+def media_playlist(*tags, endlist=True, segments=("s0.ts", "s1.ts")):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:6", *tags]
+    for name in segments:
+        lines += ["#EXTINF:6.0,", name]
+    if endlist:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+class SelectVariantTests(unittest.TestCase):
+    def test_picks_highest_bandwidth_with_the_default_audio_of_its_group(self) -> None:
+        video, audio = select_variant(MASTER, BASE)
+
+        self.assertEqual(video, "https://other.example.com/1080p.m3u8")
+        self.assertEqual(audio, "https://cdn.example.com/aula/audio/pt.m3u8")
+
+    def test_lowest_picks_the_smallest_variant(self) -> None:
+        video, _audio = select_variant(MASTER, BASE, lowest=True)
+
+        self.assertEqual(video, "https://cdn.example.com/aula/360p.m3u8")
+
+    def test_muxed_audio_has_no_separate_track(self) -> None:
+        master = "#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=1000\nv.m3u8\n"
+
+        self.assertEqual(select_variant(master, BASE), ("https://cdn.example.com/aula/v.m3u8", None))
+
+    def test_master_without_variants_is_rejected(self) -> None:
+        with self.assertRaises(HlsError):
+            select_variant("#EXTM3U\n#EXT-X-VERSION:3\n", BASE)
+
+
+class ParseMediaTests(unittest.TestCase):
+    URL = "https://cdn.example.com/aula/720p.m3u8"
+
+    def test_numbers_segments_from_the_media_sequence(self) -> None:
+        playlist = parse_media(media_playlist("#EXT-X-MEDIA-SEQUENCE:41"), self.URL)
+
+        self.assertEqual(
+            [(segment.url, segment.sequence) for segment in playlist.segments],
+            [("https://cdn.example.com/aula/s0.ts", 41), ("https://cdn.example.com/aula/s1.ts", 42)],
+        )
+        self.assertIsNone(playlist.segments[0].key)
+
+    def test_keeps_an_explicit_iv_and_leaves_it_unset_otherwise(self) -> None:
+        explicit = parse_media(
+            media_playlist('#EXT-X-KEY:METHOD=AES-128,URI="k.bin",IV=0x000102030405060708090A0B0C0D0E0F'), self.URL
+        )
+        derived = parse_media(media_playlist('#EXT-X-KEY:METHOD=AES-128,URI="k.bin"'), self.URL)
+
+        self.assertEqual(explicit.segments[0].key, Key("AES-128", "https://cdn.example.com/aula/k.bin", bytes(range(16))))
+        self.assertIsNone(derived.segments[0].key.iv)
+
+    def test_method_none_clears_the_key(self) -> None:
+        text = media_playlist('#EXT-X-KEY:METHOD=AES-128,URI="k.bin"', segments=("s0.ts",))
+        text = text.replace("#EXT-X-ENDLIST", '#EXT-X-KEY:METHOD=NONE\n#EXTINF:6.0,\ns1.ts\n#EXT-X-ENDLIST')
+
+        playlist = parse_media(text, self.URL)
+
+        self.assertIsNotNone(playlist.segments[0].key)
+        self.assertIsNone(playlist.segments[1].key)
+
+    def test_init_map_is_resolved_against_the_playlist(self) -> None:
+        playlist = parse_media(media_playlist('#EXT-X-MAP:URI="init.mp4"', segments=("s0.m4s",)), self.URL)
+
+        self.assertEqual(playlist.init_url, "https://cdn.example.com/aula/init.mp4")
+
+    def test_rejects_what_the_engine_does_not_cover(self) -> None:
+        cases = {
+            "live": media_playlist(endlist=False),
+            "byterange": media_playlist("#EXT-X-BYTERANGE:1000@0"),
+            "map byterange": media_playlist('#EXT-X-MAP:URI="init.mp4",BYTERANGE="720@0"'),
+            "sample-aes": media_playlist('#EXT-X-KEY:METHOD=SAMPLE-AES,URI="skd://k"'),
+            "empty": media_playlist(segments=()),
+        }
+        for name, text in cases.items():
+            with self.subTest(name), self.assertRaises(HlsError):
+                parse_media(text, self.URL)
+
+
+class DecryptTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fetcher = _hls_native._Fetcher(client=None, log=lambda _line: None)
+        self.fetcher._keys["https://k"] = KEY_BYTES
+
+    @staticmethod
+    def encrypt(data, iv):
+        return AES.new(KEY_BYTES, AES.MODE_CBC, iv).encrypt(pad(data, 16))
+
+    def test_uses_the_explicit_iv(self) -> None:
+        iv = b"\x07" * 16
+        key = Key("AES-128", "https://k", iv)
+
+        self.assertEqual(self.fetcher.decrypt(self.encrypt(b"segmento ts", iv), key, 99), b"segmento ts")
+
+    def test_derives_the_iv_from_the_media_sequence(self) -> None:
+        key = Key("AES-128", "https://k")
+        data = self.encrypt(b"segmento 42", (42).to_bytes(16, "big"))
+
+        self.assertEqual(self.fetcher.decrypt(data, key, 42), b"segmento 42")
+
+    def test_clear_segments_pass_through(self) -> None:
+        self.assertEqual(self.fetcher.decrypt(b"claro", None, 0), b"claro")
+
+
+class TrackDirTests(unittest.TestCase):
+    def test_each_playlist_gets_its_own_segment_dir(self) -> None:
+        work = os.path.join("cache", "native")
+        lowest = _hls_native._track_dir(work, "audio", "https://cdn.example.com/aula/360p.m3u8")
+        rendition = _hls_native._track_dir(work, "audio", "https://cdn.example.com/aula/audio/pt.m3u8")
+
+        self.assertNotEqual(lowest, rendition)
+        self.assertEqual(lowest, _hls_native._track_dir(work, "audio", "https://cdn.example.com/aula/360p.m3u8"))
+        self.assertTrue(os.path.basename(lowest).startswith("audio-"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from unittest import mock
+
+import _openai_limits
+from _openai_limits import RateLimiter, parse_reset
+
+
+class FakeClock:
+    """time.monotonic/time.sleep controlados: sleep só avança o relógio."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ParseResetTests(unittest.TestCase):
+    def test_parses_openai_duration_formats(self) -> None:
+        self.assertEqual(parse_reset("1s"), 1.0)
+        self.assertEqual(parse_reset("6m0s"), 360.0)
+        self.assertAlmostEqual(parse_reset("20ms"), 0.02)
+        self.assertAlmostEqual(parse_reset("1h2m3.5s"), 3723.5)
+
+    def test_parses_plain_seconds(self) -> None:
+        self.assertEqual(parse_reset("0.5"), 0.5)
+        self.assertEqual(parse_reset(3), 3.0)
+
+    def test_unknown_values_are_none(self) -> None:
+        self.assertIsNone(parse_reset(None))
+        self.assertIsNone(parse_reset("amanhã"))
+
+
+class RateLimiterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        patcher = mock.patch.object(_openai_limits, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_spends_the_burst_then_waits_for_refill(self) -> None:
+        limiter = RateLimiter(requests_per_minute=60)  # 1 ficha por segundo
+
+        for _ in range(60):
+            limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+
+        limiter.acquire()
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertAlmostEqual(self.clock.sleeps[0], 1.0)
+
+    def test_refill_is_capped_at_capacity(self) -> None:
+        limiter = RateLimiter(requests_per_minute=2)
+        limiter.acquire()
+        limiter.acquire()
+        self.clock.now += 3600
+
+        for _ in range(2):
+            limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        limiter.acquire()
+        self.assertAlmostEqual(self.clock.sleeps[0], 30.0)
+
+    def test_headers_shrink_the_bucket_and_block_until_reset(self) -> None:
+        limiter = RateLimiter(requests_per_minute=60)
+
+        limiter.update({
+            "x-ratelimit-limit-requests": "500",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "2s",
+        })
+        limiter.acquire()
+
+        self.assertEqual(limiter.capacity, 500)
+        self.assertAlmostEqual(sum(self.clock.sleeps), 2.0)
+
+    def test_exhausted_tokens_block_until_tokens_reset(self) -> None:
+        limiter = RateLimiter(requests_per_minute=60)
+
+        limiter.update({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "6m0s"})
+        limiter.acquire()
+
+        self.assertAlmostEqual(sum(self.clock.sleeps), 360.0)
+
+    def test_pause_blocks_every_caller(self) -> None:
+        limiter = RateLimiter(requests_per_minute=60)
+
+        limiter.pause(5)
+        limiter.acquire()
+
+        self.assertAlmostEqual(sum(self.clock.sleeps), 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,20 +1,37 @@
+import asyncio
 import base64
 import datetime
+import http.server
 import json
+import os
+import socketserver
+import struct
 import tempfile
+import threading
 import time
 import unittest
 from pathlib import Path
-
+from unittest import mock
+
+from studio.api.detached import WRAPPER_NAME, RunDir
+from studio.api.docker_api import DockerClient
+from studio.api.events import EventHub, format_sse
+from studio.api.job_output import JobOutput, parse_progress
+from studio.api.placement import WorkerPlacement, WorkerSpec, parse_workers
+from studio.api.runtime_monitor import ContainerMonitor
+from studio.api.scheduler import JobScheduler, Task, load_slots
 from studio.api.orchestrator import (
     BatchRecord,
     CommandResult,
     FileExplorer,
     JobManager,
     JobRecord,
+    MAX_CONCURRENT_FRAGMENTS,
+    RUNTIMES,
     build_download_filenames,
     list_local_media_files,
     local_processing_args,
+    normalize_concurrent_fragments,
     normalize_cookie_to_vdl_token,
     normalize_data_destination,
     now_iso,
@@ -33,6 +50,22 @@ class FakeRunner:
         self.calls.append(list(args))
         return CommandResult(list(args), 0, "ok", "")
 
+    def exec(self, container, command, env=None, detach=False, timeout=60, on_output=None) -> CommandResult:
+        # Registra no formato equivalente do CLI para as asserções continuarem legíveis.
+        args = ["exec", *(["-d"] if detach else [])]
+        for key, value in (env or {}).items():
+            args.extend(["-e", f"{key}={value}"])
+        if detach and command[:2] == ["sh", "-c"] and command[3:4] == [WRAPPER_NAME]:
+            # Job destacado: registra o comando interno e faz o papel do wrapper.
+            result = self.docker(*args, container, *command[5:], timeout=timeout)
+            self.run_job(Path(command[4]))
+            return result
+        return self.docker(*args, container, *command, timeout=timeout)
+
+    def run_job(self, run_dir: Path) -> None:
+        (run_dir / "output.log").write_text("ok\n", encoding="utf-8")
+        (run_dir / "exit").write_text("0", encoding="utf-8")
+
 
 class FakeOrchestrator:
     def __init__(self, ready: bool = True) -> None:
@@ -40,7 +73,8 @@ class FakeOrchestrator:
         self._ready = ready
 
     def runtime_status(self, mode: str) -> dict:
-        return {"ready": self._ready, "worker": {"running": self._ready}}
+        worker = {"name": RUNTIMES[mode].worker, "running": self._ready, "ready": self._ready}
+        return {"ready": self._ready, "worker": {"running": self._ready}, "workers": [worker]}
 
 
 def _wait_until(predicate, timeout: float = 5.0) -> None:
@@ -360,6 +394,33 @@ class FilenameTests(unittest.TestCase):
             ))
 
 
+    def test_concurrent_fragments_option_reaches_vdl_and_stats_are_kept(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            orchestrator = FakeOrchestrator(ready=True)
+            runner = orchestrator.runner
+            runner.run_job = lambda run_dir: (
+                (run_dir / "output.log").write_text("[INFO] Velocidade média do download: 2.00MiB/s (6 fragmento(s) simultâneo(s))\n", encoding="utf-8"),
+                (run_dir / "exit").write_text("0", encoding="utf-8"),
+            )
+            manager = JobManager(Path(tmpdir), orchestrator=orchestrator)
+            with self.assertRaisesRegex(ValueError, "Fragmentos"):
+                manager.create_download_batch(
+                    mode="none", urls=["https://x/a.m3u8"], destination="/data/curso", cookie="session=abc",
+                    concurrency=1, processing_mode="download", concurrent_fragments="muitos",
+                )
+            batch = manager.create_download_batch(
+                mode="none", urls=["https://x/a.m3u8"], destination="/data/curso", cookie="session=abc",
+                concurrency=1, processing_mode="download", concurrent_fragments="AUTO",
+            )
+            self.assertEqual(batch["jobs"][0]["options"], {"concurrent_fragments": "auto"})
+            _wait_until(lambda: manager.list_batches()["batches"][0]["jobs"][0]["status"] == "succeeded")
+            call = next(c for c in runner.calls if "vdl" in c)
+            self.assertEqual(call[call.index("--concurrent-fragments") + 1], "auto")
+            job = manager.list_batches()["batches"][0]["jobs"][0]
+            self.assertEqual(job["options"]["download_stats"], {"average_speed_bps": 2 * 1024**2, "concurrent_fragments": 6})
+            self.assertEqual(normalize_concurrent_fragments(99), MAX_CONCURRENT_FRAGMENTS)
+
+
 class RetrySingleJobTests(unittest.TestCase):
     def test_retry_single_failed_job_keeps_filename(self):
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -467,6 +528,7 @@ class LocalTranscriptionEngineTests(unittest.TestCase):
             self.assertNotIn("--whisper-model", call)
             self.assertNotIn("--gpu", call)
             self.assertIn("--local", call)
+            self.assertFalse(any("vdl-transcribed" in c for c in orchestrator.runner.calls))
 
     def test_local_whisper_engine_passes_model_and_gpu(self):
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -494,6 +556,736 @@ class LocalTranscriptionEngineTests(unittest.TestCase):
             self.assertIn("--whisper-model", call)
             self.assertIn("small", call)
             self.assertIn("--gpu", call)
+            # o servidor residente de transcricao e garantido antes do job
+            self.assertIn(["exec", "-d", "vdl-novpn", "vdl-transcribed"], orchestrator.runner.calls)
+
+    def test_local_whisper_workers_are_forwarded_only_when_parallel(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data_root = Path(tmpdir)
+            (data_root / "curso").mkdir()
+            (data_root / "curso" / "01.mp4").write_text("video", encoding="utf-8")
+            orchestrator = FakeOrchestrator(ready=True)
+            manager = JobManager(data_root, orchestrator=orchestrator)
+
+            manager.create_local_transcription_batch(
+                mode="none",
+                source_path="/data/curso",
+                destination="/data/curso",
+                concurrency=1,
+                processing_mode="transcribe",
+                use_gpu=False,
+                whisper_model="base",
+                whisper_workers=4,
+            )
+            _wait_until(lambda: all(
+                job["status"] in {"succeeded", "failed", "blocked", "canceled"}
+                for job in manager.list_batches()["batches"][0]["jobs"]
+            ))
+            call = next(c for c in orchestrator.runner.calls if "vdl" in c)
+            index = call.index("--whisper-workers")
+            self.assertEqual(call[index + 1], "4")
+
+
+class JobJournalTests(unittest.TestCase):
+    def _journaled_batch(self, manager: JobManager) -> BatchRecord:
+        batch = _make_blocked_batch(manager, "batch-j", ["failed", "succeeded"])
+        with manager._lock:
+            manager._record_batch_locked(batch)
+        return batch
+
+    def test_transitions_are_appended_as_deltas_and_replayed_on_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data_root = Path(tmpdir)
+            manager = JobManager(data_root, orchestrator=FakeOrchestrator())
+            self._journaled_batch(manager)
+            manager._transition("batch-j", "job-01", "failed", "vdl", "erro 2", logs="tail", started=True)
+            manager._store.flush()
+
+            # Nenhuma reescrita do estado completo: so o journal cresce.
+            self.assertFalse(manager.state_file.exists())
+            last = json.loads(manager._store.journal_file.read_text(encoding="utf-8").splitlines()[-1])
+            self.assertEqual(last["op"], "job")
+            self.assertEqual(last["fields"]["logs"], "tail")
+            self.assertNotIn("url", last["fields"])
+
+            reloaded = JobManager(data_root, orchestrator=FakeOrchestrator())
+            job = reloaded.list_batches()["batches"][0]["jobs"][0]
+            self.assertEqual((job["error"], job["logs"], job["attempt"]), ("erro 2", "tail", 1))
+
+    def test_compaction_snapshots_state_and_truncates_journal(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data_root = Path(tmpdir)
+            manager = JobManager(data_root, orchestrator=FakeOrchestrator())
+            self._journaled_batch(manager)
+            manager._transition("batch-j", "job-01", "failed", "vdl", "antes")
+            manager._store.flush()
+            manager._store.compact()
+
+            snapshot = json.loads(manager.state_file.read_text(encoding="utf-8"))
+            self.assertEqual(snapshot["journal_seq"], manager._store.current_seq())
+            self.assertEqual(manager._store.journal_file.read_text(encoding="utf-8"), "")
+
+            manager._transition("batch-j", "job-01", "failed", "vdl", "depois")
+            manager.delete_batch("batch-j")
+            manager._store.flush()
+            reloaded = JobManager(data_root, orchestrator=FakeOrchestrator())
+            self.assertEqual(reloaded.list_batches()["batches"], [])
+
+    def test_truncated_journal_tail_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data_root = Path(tmpdir)
+            manager = JobManager(data_root, orchestrator=FakeOrchestrator())
+            self._journaled_batch(manager)
+            manager._transition("batch-j", "job-01", "failed", "vdl", "ok")
+            manager._store.flush()
+            with manager._store.journal_file.open("a", encoding="utf-8") as f:
+                f.write('{"seq": 99, "op": "job", "batch_')
+
+            reloaded = JobManager(data_root, orchestrator=FakeOrchestrator())
+            self.assertEqual(reloaded.list_batches()["batches"][0]["jobs"][0]["error"], "ok")
+            reloaded._transition("batch-j", "job-01", "failed", "vdl", "depois")
+            reloaded._store.flush()
+            again = JobManager(data_root, orchestrator=FakeOrchestrator())
+            self.assertEqual(again.list_batches()["batches"][0]["jobs"][0]["error"], "depois")
+
+
+@mock.patch.dict(os.environ, {"VDL_STUDIO_STORE": "sqlite"})
+class SqliteJobStoreTests(unittest.TestCase):
+    def test_migrates_existing_jobs_json_into_sqlite(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data_root = Path(tmpdir)
+            BootReconciliationTests()._write_state(data_root, ["succeeded", "running"])
+            manager = JobManager(data_root, orchestrator=FakeOrchestrator())
+            state_dir = data_root / ".vdl-studio-web"
+            self.assertTrue((state_dir / "jobs.sqlite3").exists())
+            self.assertFalse((state_dir / "jobs.json").exists())
+            self.assertTrue((state_dir / "jobs.json.migrated").exists())
+            manager._store.close()
+
+            reloaded = JobManager(data_root, orchestrator=FakeOrchestrator())
+            statuses = [j["status"] for j in reloaded.list_batches()["batches"][0]["jobs"]]
+            self.assertEqual(statuses, ["succeeded", "interrupted"])
+
+    def test_logs_live_apart_from_indexed_status_queries(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data_root = Path(tmpdir)
+            manager = JobManager(data_root, orchestrator=FakeOrchestrator())
+            batch = _make_blocked_batch(manager, "batch-s", ["queued", "queued"])
+            with manager._lock:
+                manager._record_batch_locked(batch)
+            manager._transition("batch-s", "job-02", "failed", "vdl", "erro", logs="log longo")
+
+            page, has_more = manager._store.query_batches(statuses={"failed"})
+            self.assertEqual((page, has_more), ([("batch-s", {"job-02"})], False))
+            self.assertEqual(manager._store.job_logs("batch-s", "job-02"), "log longo")
+            self.assertEqual(manager._find_job_locked("batch-s", "job-02").logs, "")
+            manager.set_batch_priority("batch-s", 3)
+            manager._store.close()
+
+            reloaded = JobManager(data_root, orchestrator=FakeOrchestrator())
+            self.assertEqual(reloaded._find_job_locked("batch-s", "job-02").logs, "")
+            batch = reloaded.list_batches()["batches"][0]
+            self.assertEqual(batch["priority"], 3)
+            job = batch["jobs"][1]
+            self.assertEqual((job["status"], job["logs"]), ("failed", "log longo"))
+            self.assertEqual(reloaded.job_logs("batch-s", "job-02")["logs"], "log longo")
+
+    def test_listing_filters_and_pages_through_sql(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = JobManager(Path(tmpdir), orchestrator=FakeOrchestrator())
+            for i, statuses in enumerate([["succeeded"], ["failed", "succeeded"], ["queued"]], start=1):
+                batch = _make_blocked_batch(manager, f"batch-{i}", statuses)
+                batch.created_at = f"2026-10-0{i}T10:00:00-03:00"
+                with manager._lock:
+                    manager._record_batch_locked(batch)
+
+            first = manager.list_batches(limit=2, include_logs=False)
+            self.assertEqual([b["batch_id"] for b in first["batches"]], ["batch-3", "batch-2"])
+            second = manager.list_batches(limit=2, cursor=first["next_cursor"])
+            self.assertEqual([b["batch_id"] for b in second["batches"]], ["batch-1"])
+            self.assertIsNone(second["next_cursor"])
+            failed = manager.list_batches(status="failed")["batches"]
+            self.assertEqual([(b["batch_id"], [j["job_id"] for j in b["jobs"]]) for b in failed], [("batch-2", ["job-01"])])
+            recent = manager.list_batches(created_after="2026-10-02T12:00:00-01:00")["batches"]
+            self.assertEqual([b["batch_id"] for b in recent], ["batch-3", "batch-2"])
+
+
+class JobListingTests(unittest.TestCase):
+    def _manager(self, tmpdir):
+        manager = JobManager(Path(tmpdir), orchestrator=FakeOrchestrator())
+        for i, statuses in enumerate([["succeeded"], ["failed", "succeeded"], ["queued"]], start=1):
+            batch = _make_blocked_batch(manager, f"batch-{i}", statuses)
+            batch.created_at = f"2026-10-0{i}T10:00:00-03:00"
+            batch.jobs[0].logs = "log"
+        return manager
+
+    def test_cursor_pages_through_batches_newest_first(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = self._manager(tmpdir)
+            first = manager.list_batches(limit=2, include_logs=False)
+            self.assertEqual([b["batch_id"] for b in first["batches"]], ["batch-3", "batch-2"])
+            self.assertNotIn("logs", first["batches"][0]["jobs"][0])
+            second = manager.list_batches(limit=2, cursor=first["next_cursor"])
+            self.assertEqual([b["batch_id"] for b in second["batches"]], ["batch-1"])
+            self.assertIsNone(second["next_cursor"])
+            with self.assertRaisesRegex(ValueError, "Cursor invalido"):
+                manager.list_batches(cursor="!!")
+
+    def test_filters_by_status_and_creation_date(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = self._manager(tmpdir)
+            failed = manager.list_batches(status="failed")["batches"]
+            self.assertEqual([(b["batch_id"], len(b["jobs"])) for b in failed], [("batch-2", 1)])
+            recent = manager.list_batches(created_after="2026-10-02T00:00:00-03:00")["batches"]
+            self.assertEqual([b["batch_id"] for b in recent], ["batch-3", "batch-2"])
+            with self.assertRaisesRegex(ValueError, "Data invalida"):
+                manager.list_batches(created_before="ontem")
+
+    def test_etag_changes_only_with_state_version(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = self._manager(tmpdir)
+            etag = manager.etag("limit=50")
+            self.assertEqual(manager.etag("limit=50"), etag)
+            self.assertNotEqual(manager.etag("limit=10"), etag)
+            manager._transition("batch-3", "job-01", "failed", "vdl", "erro", logs="novo log")
+            self.assertNotEqual(manager.etag("limit=50"), etag)
+            self.assertEqual(manager.job_logs("batch-3", "job-01")["logs"], "novo log")
+            with self.assertRaises(KeyError):
+                manager.job_logs("batch-3", "job-99")
+
+
+class InspectRunner:
+    """inspect/events falsos do SafeRunner: `states` mapeia container -> State."""
+
+    def __init__(self, states: dict) -> None:
+        self.states = states
+        self.inspects: list[tuple[str, ...]] = []
+        self.events: list[dict] = []
+
+    def inspect(self, *names: str) -> list[dict]:
+        self.inspects.append(names)
+        return [{"Name": f"/{n}", "State": self.states[n]} for n in names if n in self.states]
+
+    def docker_events(self, filters):
+        yield from self.events
+
+
+class ContainerMonitorTests(unittest.TestCase):
+    def test_status_is_served_from_cache_after_one_batched_inspect(self):
+        runner = InspectRunner({"worker": {"Running": True, "Status": "running"}})
+        monitor = ContainerMonitor(runner, ["worker", "vpn"], poll_interval=60)
+        try:
+            self.assertTrue(monitor.get("worker")["running"])
+            self.assertFalse(monitor.get("vpn")["exists"])
+            for _ in range(10):
+                monitor.get("worker")
+            _wait_until(lambda: len(runner.inspects) >= 2)
+            # 1 inspect no primeiro acesso + 1 ressincronizacao do watcher, nunca 1 por chamada
+            self.assertEqual(runner.inspects[0], ("worker", "vpn"))
+            self.assertLessEqual(len(runner.inspects), 2)
+        finally:
+            monitor.stop()
+
+    def test_container_event_refreshes_only_that_container_and_notifies(self):
+        runner = InspectRunner({"worker": {"Running": True}, "vpn": {"Running": True, "Health": {"Status": "starting"}}})
+        monitor = ContainerMonitor(runner, ["worker", "vpn"], poll_interval=60)
+        changes = []
+        monitor.add_listener(lambda: changes.append(monitor.get("vpn")["healthy"]))
+        try:
+            monitor.refresh()
+            runner.states["vpn"]["Health"]["Status"] = "healthy"
+            runner.events = [{"Action": "health_status: healthy", "Actor": {"Attributes": {"name": "vpn"}}}]
+            monitor._follow_events()
+            self.assertEqual(runner.inspects[-1], ("vpn",))
+            self.assertTrue(monitor.get("vpn")["healthy"])
+            self.assertEqual(changes[-1], True)
+        finally:
+            monitor.stop()
+
+
+class _FakeDaemonHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    exec_state = {"Running": False, "ExitCode": 3}
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def address_string(self):
+        return "unix"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/v1.41/containers/worker/json":
+            self._send_json(200, {"Name": "/worker", "State": {"Running": True}})
+        elif self.path == "/v1.41/exec/e1/json":
+            self._send_json(200, self.exec_state)
+        else:
+            self._send_json(404, {"message": "No such container"})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path == "/v1.41/containers/worker/exec":
+            self._send_json(201, {"Id": "e1"})
+            return
+        # exec start: o daemon sequestra a conexao e manda frames multiplexados.
+        self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/vnd.docker.raw-stream\r\n\r\n")
+        for kind, text in ((1, "baixando "), (2, "aviso"), (1, "ok")):
+            data = text.encode("utf-8")
+            self.wfile.write(struct.pack(">BxxxL", kind, len(data)) + data)
+        self.close_connection = True
+
+
+class DockerClientTests(unittest.TestCase):
+    def test_exec_streams_demuxed_output_and_inspect_reuses_connection(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "docker.sock")
+            server = socketserver.ThreadingUnixStreamServer(path, _FakeDaemonHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            client = DockerClient(path)
+            try:
+                _FakeDaemonHandler.connections = 0
+                self.assertTrue(client.inspect("worker")["State"]["Running"])
+                self.assertIsNone(client.inspect("ausente"))
+                self.assertEqual(_FakeDaemonHandler.connections, 1)
+
+                chunks = []
+                code, stdout, stderr = client.exec_run(
+                    "worker", ["vdl", "x"], on_output=lambda stream, text: chunks.append((stream, text))
+                )
+                self.assertEqual((code, stdout, stderr), (3, "baixando ok", "aviso"))
+                self.assertEqual(chunks[0], ("stdout", "baixando "))
+            finally:
+                client.close()
+                server.shutdown()
+                server.server_close()
+
+    def test_exec_still_running_after_the_stream_is_reported_as_failure(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "docker.sock")
+            server = socketserver.ThreadingUnixStreamServer(path, _FakeDaemonHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            client = DockerClient(path)
+            try:
+                with mock.patch.object(_FakeDaemonHandler, "exec_state", {"Running": True, "ExitCode": None}), \
+                        mock.patch("studio.api.docker_api._EXIT_CODE_GRACE", 0.05):
+                    code, _stdout, stderr = client.exec_run("worker", ["vdl", "x"])
+                self.assertEqual(code, -1)
+                self.assertIn("codigo de saida", stderr)
+            finally:
+                client.close()
+                server.shutdown()
+                server.server_close()
+
+
+class StreamingRunner(FakeRunner):
+    """Grava a saida do job em pedacos (cortando linhas) e so depois o codigo de saida."""
+
+    def __init__(self, chunks) -> None:
+        super().__init__()
+        self.chunks = chunks
+        self.seen_live: list[dict] = []
+        self.manager = None
+
+    def run_job(self, run_dir: Path) -> None:
+        def worker():
+            with (run_dir / "output.log").open("w", encoding="utf-8") as log:
+                for chunk in self.chunks:
+                    log.write(chunk)
+                    log.flush()
+            _wait_until(lambda: "feito" in self.manager.job_logs("batch-p", "job-01")["logs"])
+            self.seen_live.append(self.manager.job_logs("batch-p", "job-01"))
+            (run_dir / "exit").write_text("0", encoding="utf-8")
+
+        threading.Thread(target=worker, daemon=True).start()
+
+
+class JobOutputTests(unittest.TestCase):
+    def test_parses_ytdlp_fragment_progress(self):
+        progress = parse_progress("[download]  12.5% of ~ 452.31MiB at    3.21MiB/s ETA 02:03 (frag 25/200)")
+        self.assertEqual(progress["percent"], 12.5)
+        self.assertEqual(progress["total_bytes"], int(452.31 * 1024**2))
+        self.assertEqual(progress["speed_bps"], int(3.21 * 1024**2))
+        self.assertEqual(progress["eta_seconds"], 123)
+        self.assertEqual((progress["fragment"], progress["fragments"]), (25, 200))
+        self.assertIsNone(parse_progress("[info] Downloading 1 format(s): 720p"))
+
+    def test_parses_ffmpeg_time_against_duration(self):
+        progress = parse_progress("frame= 100 size=    2048kB time=00:05:00.00 bitrate=1.0kbits/s speed=2.0x", duration=600)
+        self.assertEqual(progress["percent"], 50.0)
+        self.assertEqual(progress["eta_seconds"], 150)
+        self.assertEqual(progress["downloaded_bytes"], 2048 * 1024)
+
+    def test_progress_lines_overwrite_each_other_and_tail_is_bounded(self):
+        output = JobOutput(max_chars=60)
+        output.feed("stdout", "[info] inicio\n[download]   1.0% of 10.00MiB at 1.00MiB/s ETA 00:09\n[down")
+        output.feed("stdout", "load]  50.0% of 10.00MiB at 1.00MiB/s ETA 00:05\n")
+        self.assertEqual(output.progress["percent"], 50.0)
+        self.assertEqual(output.text().count("[download]"), 1)
+        output.feed("stdout", "x" * 50 + "\nfim")
+        output.close()
+        self.assertTrue(output.text().endswith("fim"))
+        self.assertLessEqual(len(output.text()), 60)
+
+    def test_tracks_concurrent_fragments_and_download_stats(self):
+        output = JobOutput()
+        output.feed("stdout", "[INFO] Fragmentos simultâneos: 8\n[download]  10.0% of 1.00GiB at 8.00MiB/s ETA 01:00 (frag 10/100)\n")
+        self.assertEqual(output.progress["concurrent_fragments"], 8)
+        self.assertIsNone(output.download_stats)
+        output.feed("stdout", "[INFO] Velocidade média do download: 6.50MiB/s (4 fragmento(s) simultâneo(s))\n")
+        self.assertEqual(output.download_stats, {"average_speed_bps": int(6.5 * 1024**2), "concurrent_fragments": 4})
+
+    def test_manager_exposes_live_logs_and_progress(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            orchestrator = FakeOrchestrator()
+            runner = StreamingRunner(["[download]  40.0% of 1.00GiB at 2.00MiB/s ETA 08:00 (frag 4/10)\n", "feito\n"])
+            orchestrator.runner = runner
+            manager = JobManager(Path(tmpdir), orchestrator=orchestrator)
+            runner.manager = manager
+            batch = _make_blocked_batch(manager, "batch-p", ["queued"])
+            manager._run_job(batch.jobs[0], token="t")
+
+            live = runner.seen_live[0]
+            self.assertTrue(live["live"])
+            self.assertIn("feito", live["logs"])
+            self.assertEqual(live["progress"]["fragments"], 10)
+            job = manager.list_batches()["batches"][0]["jobs"][0]
+            self.assertEqual(job["status"], "succeeded")
+            self.assertIn("feito", job["logs"])
+            self.assertFalse(manager.job_logs("batch-p", "job-01")["live"])
+            call = next(c for c in runner.calls if "vdl" in c)
+            self.assertIn("PYTHONUNBUFFERED=1", call)
+
+
+class JobSchedulerTests(unittest.TestCase):
+    def _task(self, batch, job, started, release, resources=None, priority=0, limit=None):
+        def run():
+            started.append((batch, job))
+            release.wait(5)
+
+        return Task(
+            key=(batch, job), group=batch, run=run, priority=priority, group_limit=limit,
+            resources=resources or {"runtime:cyberghost": 1, "network": 1},
+        )
+
+    def test_runtime_cap_is_global_and_batches_share_it_fairly(self):
+        scheduler = JobScheduler({"runtime": 2, "network": 10})
+        started, release = [], threading.Event()
+        for job in ("j1", "j2", "j3"):
+            scheduler.submit(self._task("batch-a", job, started, release))
+        for job in ("j1", "j2"):
+            scheduler.submit(self._task("batch-b", job, started, release))
+        try:
+            _wait_until(lambda: len(started) == 2)
+            time.sleep(0.05)
+            self.assertEqual(scheduler.stats()["running"], 2)
+            self.assertEqual(scheduler.stats()["slots"]["runtime:cyberghost"]["in_use"], 2)
+        finally:
+            release.set()
+        _wait_until(lambda: len(started) == 5)
+        # o lote b entra assim que o primeiro slot libera, sem esperar o lote a acabar
+        self.assertIn(("batch-b", "j1"), started[:3])
+
+    def test_priority_jumps_queue_and_other_resources_are_not_blocked(self):
+        scheduler = JobScheduler({"runtime": 1, "network": 10, "cpu": 1})
+        started, release = [], threading.Event()
+        scheduler.submit(self._task("batch-a", "j1", started, release))
+        scheduler.submit(self._task("batch-a", "j2", started, release))
+        scheduler.submit(self._task("batch-b", "j1", started, release, priority=5))
+        scheduler.submit(self._task("batch-c", "j1", started, release, resources={"cpu": 4}))
+        try:
+            _wait_until(lambda: len(started) == 2)
+            # transcricao (cpu) nao espera a fila de downloads; peso 4 e limitado a capacidade 1
+            self.assertEqual(set(started), {("batch-a", "j1"), ("batch-c", "j1")})
+        finally:
+            release.set()
+        _wait_until(lambda: len(started) == 4)
+        self.assertEqual(started[2], ("batch-b", "j1"))
+
+    def test_next_stage_inherits_retained_slot_and_overlaps_next_download(self):
+        scheduler = JobScheduler({"runtime": 1, "network": 10, "cpu": 1})
+        scheduler.set_capacity("pipeline:batch-p", 2)
+        started, release = [], threading.Event()
+
+        def download(job):
+            def run():
+                started.append(("download", job))
+                process = self._task("batch-p", job, started, release, resources={"cpu": 1}, limit=1)
+                process.stage = "process"
+                return process
+            return Task(
+                key=("batch-p", job), group="batch-p", run=run, stage="download", group_limit=1,
+                resources={"runtime:none": 1, "network": 1, "pipeline:batch-p": 1}, retain=("pipeline:batch-p",),
+            )
+
+        for job in ("j1", "j2", "j3"):
+            scheduler.submit(download(job))
+        # j1 processa enquanto j2 baixa; j3 espera: o pipeline do lote esta cheio.
+        _wait_until(lambda: len(started) == 3)
+        time.sleep(0.05)
+        self.assertEqual(started[0], ("download", "j1"))
+        self.assertEqual(set(started[1:]), {("batch-p", "j1"), ("download", "j2")})
+        stats = scheduler.stats()
+        self.assertEqual(stats["slots"]["pipeline:batch-p"]["in_use"], 2)
+        self.assertEqual(stats["queued_by_batch"], {"batch-p": 2})
+        release.set()
+        _wait_until(lambda: len(started) == 6)
+        _wait_until(lambda: scheduler.stats()["running"] == 0)
+        self.assertEqual(scheduler.stats()["slots"]["pipeline:batch-p"]["in_use"], 0)
+
+    def test_load_slots_reads_per_runtime_overrides(self):
+        slots = load_slots("runtime=3,runtime:windscribe=1,gpu=x")
+        scheduler = JobScheduler(slots)
+        self.assertEqual(scheduler.capacity("runtime:cyberghost"), 3)
+        self.assertEqual(scheduler.capacity("runtime:windscribe"), 1)
+        self.assertEqual(scheduler.capacity("gpu"), 1)
+
+    def test_cancel_drops_queued_jobs_of_batch(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = JobManager(Path(tmpdir), orchestrator=FakeOrchestrator())
+            manager.scheduler = JobScheduler({"runtime": 1, "network": 1})
+            started, release = [], threading.Event()
+            manager.scheduler.submit(self._task("batch-x", "j1", started, release))
+            _make_blocked_batch(manager, "batch-q", ["queued", "queued"])
+            manager._run_batch("batch-q", token=None)
+            self.assertEqual(manager.scheduler_status()["queued"], 2)
+            manager.cancel_batch("batch-q")
+            self.assertEqual(manager.scheduler_status()["queued"], 0)
+            release.set()
+
+
+class PipelinedDownloadTests(unittest.TestCase):
+    def test_download_with_transcription_runs_as_download_then_local_stage(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            orchestrator = FakeOrchestrator(ready=True)
+            manager = JobManager(Path(tmpdir), orchestrator=orchestrator)
+            manager.create_download_batch(
+                mode="none",
+                urls=["https://example.com/a.mpd", "https://example.com/b.mpd"],
+                destination="/data/curso",
+                cookie="session=abc",
+                concurrency=1,
+                processing_mode="context",
+            )
+            _wait_until(lambda: all(
+                job["status"] == "succeeded" for job in manager.list_batches()["batches"][0]["jobs"]
+            ))
+            vdl_calls = [c[c.index("vdl"):] for c in orchestrator.runner.calls if "vdl" in c]
+            self.assertIn(["vdl", "https://example.com/a.mpd", "01.mp4", "-d", "/data/curso", "--only-download"], vdl_calls)
+            self.assertIn(["vdl", "/data/curso/01.mp4", "--local", "-d", "/data/curso", "--context"], vdl_calls)
+            job = manager.list_batches()["batches"][0]["jobs"][0]
+            self.assertTrue(job["options"]["downloaded"])
+            self.assertEqual(job["attempt"], 1)
+
+    def test_batch_without_video_downloads_audio_only_and_processes_it(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            orchestrator = FakeOrchestrator(ready=True)
+            manager = JobManager(Path(tmpdir), orchestrator=orchestrator)
+            manager.create_download_batch(
+                mode="none",
+                urls=["https://example.com/a.m3u8"],
+                destination="/data/curso",
+                cookie="session=abc",
+                concurrency=1,
+                processing_mode="transcribe",
+                keep_video=False,
+            )
+            _wait_until(lambda: manager.list_batches()["batches"][0]["jobs"][0]["status"] == "succeeded")
+            vdl_calls = [c[c.index("vdl"):] for c in orchestrator.runner.calls if "vdl" in c]
+            self.assertIn(["vdl", "https://example.com/a.m3u8", "01.mp4", "-d", "/data/curso", "--only-download", "--audio-only"], vdl_calls)
+            self.assertIn(["vdl", "/data/curso/01.m4a", "--local", "-d", "/data/curso", "--transcribe"], vdl_calls)
+
+    def test_retry_of_downloaded_job_skips_the_download(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            orchestrator = FakeOrchestrator(ready=True)
+            manager = JobManager(Path(tmpdir), orchestrator=orchestrator)
+            batch = _make_blocked_batch(manager, "batch-pr", ["failed"])
+            batch.processing_mode = batch.jobs[0].processing_mode = "transcribe"
+            batch.jobs[0].options = {"downloaded": True}
+
+            manager.retry_job("batch-pr", "job-01", cookie="session=abc")
+            _wait_until(lambda: batch.jobs[0].status == "succeeded")
+
+            vdl_calls = [c[c.index("vdl"):] for c in orchestrator.runner.calls if "vdl" in c]
+            self.assertEqual(vdl_calls, [["vdl", "/data/downloads/01.mp4", "--local", "-d", "/data/downloads", "--transcribe"]])
+
+
+class PoolOrchestrator(FakeOrchestrator):
+    """Runtimes com varios workers; `down` lista os containers parados."""
+
+    def __init__(self, pools: dict, down=()) -> None:
+        super().__init__(ready=True)
+        self.pools = pools
+        self.down = set(down)
+
+    def runtime_status(self, mode: str) -> dict:
+        workers = [
+            {"name": name, "running": name not in self.down, "ready": name not in self.down}
+            for name in self.pools.get(mode, [])
+        ]
+        ready = any(worker["ready"] for worker in workers)
+        return {"ready": ready, "worker": {"running": ready}, "workers": workers}
+
+
+class WorkerPlacementTests(unittest.TestCase):
+    def test_parse_workers_reads_pools_and_optional_vpn(self):
+        pools = parse_workers("cyberghost=vdl-2@gluetun-2, vdl-3;none=vdl-novpn-2;;broken")
+        self.assertEqual(pools["cyberghost"], [WorkerSpec("vdl-2", "gluetun-2"), WorkerSpec("vdl-3")])
+        self.assertEqual(pools["none"], [WorkerSpec("vdl-novpn-2")])
+        self.assertNotIn("broken", pools)
+
+    def test_downloads_spread_by_load_and_skip_stopped_workers(self):
+        orchestrator = PoolOrchestrator({"cyberghost": ["vdl", "vdl-2", "vdl-3"]}, down={"vdl-3"})
+        placement = WorkerPlacement(orchestrator.runtime_status)
+        first = placement.acquire("download", "cyberghost")
+        second = placement.acquire("download", "cyberghost")
+        self.assertEqual({first, second}, {"vdl", "vdl-2"})
+        placement.release(first)
+        self.assertEqual(placement.acquire("download", "cyberghost"), first)
+        self.assertEqual(placement.load(), {"vdl": 1, "vdl-2": 1})
+
+    def test_processing_prefers_novpn_workers_and_falls_back_to_batch_runtime(self):
+        orchestrator = PoolOrchestrator({"cyberghost": ["vdl"], "none": ["vdl-novpn"]})
+        placement = WorkerPlacement(orchestrator.runtime_status)
+        self.assertEqual(placement.candidates("process", "cyberghost"), ["vdl-novpn", "vdl"])
+        self.assertEqual(placement.candidates("download", "cyberghost"), ["vdl"])
+        orchestrator.down.add("vdl-novpn")
+        self.assertEqual(placement.acquire("process", "cyberghost"), "vdl")
+
+    def test_pipelined_batch_downloads_on_vpn_and_transcribes_on_novpn_worker(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            orchestrator = PoolOrchestrator({"cyberghost": ["vdl", "vdl-2"], "none": ["vdl-novpn"]})
+            manager = JobManager(Path(tmpdir), orchestrator=orchestrator)
+            manager.create_download_batch(
+                mode="cyberghost",
+                urls=["https://example.com/a.mpd"],
+                destination="/data/curso",
+                cookie="session=abc",
+                concurrency=1,
+                processing_mode="transcribe",
+            )
+            _wait_until(lambda: manager.list_batches()["batches"][0]["jobs"][0]["status"] == "succeeded")
+            runs = []
+            for call in orchestrator.runner.calls:
+                if "vdl" in call:
+                    cmd = len(call) - 1 - call[::-1].index("vdl")  # o container pode se chamar "vdl"
+                    runs.append((call[cmd - 1], call[cmd + 1]))
+            self.assertEqual(len(runs), 2)
+            self.assertIn(runs[0], [("vdl", "https://example.com/a.mpd"), ("vdl-2", "https://example.com/a.mpd")])
+            self.assertEqual(runs[1], ("vdl-novpn", "/data/curso/01.mp4"))
+            # 2 workers prontos no runtime: o teto de downloads do tunel dobra
+            self.assertEqual(manager.scheduler.capacity("runtime:cyberghost"), 8)
+
+    def test_job_is_blocked_when_no_worker_is_ready_at_start(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            orchestrator = PoolOrchestrator({"none": ["vdl-novpn"]})
+            manager = JobManager(Path(tmpdir), orchestrator=orchestrator)
+            batch = _make_blocked_batch(manager, "batch-w", ["queued"])
+            orchestrator.down.add("vdl-novpn")
+            manager._schedule_job(batch.jobs[0], token=None)
+            _wait_until(lambda: batch.jobs[0].status == "blocked")
+            self.assertEqual(batch.jobs[0].status, "blocked")
+            self.assertFalse(any("vdl" in c for c in orchestrator.runner.calls))
+
+
+class RunDirTests(unittest.TestCase):
+    def test_follow_streams_output_until_exit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            run = RunDir(Path(tmpdir) / "run")
+            run.prepare({"container": "vdl-worker"})
+            run.output_path.write_text("linha 1\n", encoding="utf-8")
+            chunks: list[str] = []
+
+            def finish():
+                time.sleep(0.05)
+                with run.output_path.open("a", encoding="utf-8") as handle:
+                    handle.write("linha 2\n")
+                (run.path / "exit").write_text("3\n", encoding="utf-8")
+
+            threading.Thread(target=finish).start()
+            code = run.follow(lambda _stream, text: chunks.append(text), lambda _pid: True, poll_interval=0.01)
+            self.assertEqual(code, 3)
+            self.assertEqual("".join(chunks), "linha 1\nlinha 2\n")
+            self.assertEqual(run.meta(), {"container": "vdl-worker"})
+
+    def test_follow_returns_none_when_wrapper_is_gone(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            run = RunDir(Path(tmpdir) / "run")
+            run.prepare({})
+            with mock.patch("studio.api.detached.LIVENESS_INTERVAL", 0):
+                self.assertIsNone(run.follow(lambda *_: None, lambda _pid: False, poll_interval=0.01))
+
+    def test_timed_out_run_is_killed_before_its_dir_is_cleared(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = JobManager(Path(tmpdir), orchestrator=FakeOrchestrator())
+            job = _make_blocked_batch(manager, "batch-t", ["running"]).jobs[0]
+            run = manager._run_dir("batch-t", "job-01")
+            run.prepare({})
+            (run.path / "pid").write_text("42\n", encoding="utf-8")
+            killed_with_dir = []
+            runner = manager.orchestrator.runner
+            exec_ = runner.exec
+
+            def exec_spy(container, command, **kwargs):
+                killed_with_dir.append(run.path.exists())
+                return exec_(container, command, **kwargs)
+
+            with mock.patch.object(RunDir, "follow", return_value=124), \
+                    mock.patch.object(runner, "exec", side_effect=exec_spy):
+                result, _logs = manager._follow_run(job, "vdl-worker", run, ["vdl", job.url])
+
+            self.assertEqual(result.returncode, 124)
+            kill = runner.calls[-1]
+            self.assertEqual(kill[:2], ["exec", "vdl-worker"])
+            self.assertIn("kill -KILL", kill[-3])
+            self.assertEqual(kill[-1], "42")
+            self.assertEqual(killed_with_dir, [True])
+            self.assertFalse(run.path.exists())
+
+
+class EventStreamTests(unittest.TestCase):
+    def test_job_transitions_are_published_without_logs(self):
+        async def scenario(manager):
+            subscription = manager.events.subscribe()
+            await asyncio.to_thread(
+                manager._transition, "batch-e", "job-01", "failed", "vdl", "erro", logs="log longo"
+            )
+            return await asyncio.wait_for(subscription.queue.get(), timeout=2)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = JobManager(Path(tmpdir), orchestrator=FakeOrchestrator(), events=EventHub())
+            _make_blocked_batch(manager, "batch-e", ["queued"])
+            before = manager.version
+            event = asyncio.run(scenario(manager))
+            self.assertEqual(event["type"], "job")
+            self.assertEqual((event["job"]["job_id"], event["job"]["status"]), ("job-01", "failed"))
+            self.assertNotIn("logs", event["job"])
+            self.assertGreater(event["version"], before)
+            self.assertTrue(format_sse(event).startswith("event: job\ndata: {"))
+
+    def test_slow_subscriber_gets_single_resync(self):
+        async def scenario():
+            hub = EventHub(max_queue=2)
+            subscription = hub.subscribe()
+            for i in range(5):
+                hub.publish("job", n=i)
+            await asyncio.sleep(0.05)
+            return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+
+        events = asyncio.run(scenario())
+        self.assertIn({"type": "resync"}, events)
+        self.assertLessEqual(len(events), 2)
 
 
 class BootReconciliationTests(unittest.TestCase):
@@ -524,6 +1316,24 @@ class BootReconciliationTests(unittest.TestCase):
             # running/queued órfãos viram 'interrupted'; succeeded/failed intactos
             self.assertEqual(statuses, ["succeeded", "interrupted", "interrupted", "failed"])
 
+    def test_detached_job_finished_during_restart_is_reattached(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data_root = Path(tmpdir)
+            self._write_state(data_root, ["running", "running"])
+            run = RunDir(data_root / ".vdl-studio-web" / "runs" / "batch-x" / "job-01")
+            run.prepare({"container": "vdl-worker", "stage": "download", "command": ["vdl", "https://x/1"]})
+            (run.path / "pid").write_text("42\n", encoding="utf-8")
+            (run.path / "output.log").write_text("[download] 100% of 1.00MiB\nbaixado durante o restart\n", encoding="utf-8")
+            (run.path / "exit").write_text("0\n", encoding="utf-8")
+            manager = JobManager(data_root, orchestrator=FakeOrchestrator())
+            _wait_until(lambda: manager.list_batches()["batches"][0]["jobs"][0]["status"] == "succeeded")
+            jobs = manager.list_batches()["batches"][0]["jobs"]
+            # com diretorio de execucao: resultado coletado; sem ele: interrompido
+            self.assertIn("baixado durante o restart", jobs[0]["logs"])
+            self.assertEqual(jobs[1]["status"], "interrupted")
+            self.assertFalse(run.path.exists())
+            self.assertEqual(manager.placement.load(), {})
+
     def test_interrupted_jobs_are_retryable(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             manager = JobManager(Path(tmpdir), orchestrator=FakeOrchestrator(ready=True))
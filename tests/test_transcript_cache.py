@@ -0,0 +1,108 @@
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import _transcript_cache
+
+
+RESULT = {"text": "olá", "segments": [{"start": 0.0, "end": 1.0, "text": "olá"}], "language": "pt"}
+
+
+class TranscriptCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+        env = mock.patch.dict(os.environ, {
+            "VDL_TRANSCRIPT_CACHE": str(self.root / "cache"),
+            "VDL_TRANSCRIPT_CACHE_MAX_MB": "1",
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        memo = mock.patch.dict(_transcript_cache._digest_memo, clear=True)
+        memo.start()
+        self.addCleanup(memo.stop)
+        no_ffmpeg = mock.patch.object(_transcript_cache.shutil, "which", return_value=None)
+        self.which = no_ffmpeg.start()
+        self.addCleanup(no_ffmpeg.stop)
+
+    def media(self, name, content=b"audio"):
+        path = self.root / name
+        path.write_bytes(content)
+        return path
+
+    def test_hit_for_same_content_model_and_engine(self) -> None:
+        key = _transcript_cache.cache_key(self.media("a.mp4"), "base", "faster-whisper")
+        _transcript_cache.store(key, RESULT, "base", "faster-whisper")
+
+        copy_key = _transcript_cache.cache_key(self.media("copia.mp4"), "base", "faster-whisper")
+
+        self.assertEqual(copy_key, key)
+        self.assertEqual(_transcript_cache.load(copy_key), RESULT)
+
+    def test_miss_when_content_model_or_engine_differ(self) -> None:
+        media = self.media("a.mp4")
+        key = _transcript_cache.cache_key(media, "base", "faster-whisper")
+        _transcript_cache.store(key, RESULT, "base", "faster-whisper")
+
+        others = [
+            _transcript_cache.cache_key(self.media("b.mp4", b"outro"), "base", "faster-whisper"),
+            _transcript_cache.cache_key(media, "small", "faster-whisper"),
+            _transcript_cache.cache_key(media, "base", "mlx-whisper"),
+            _transcript_cache.cache_key(media, "base", "faster-whisper", language="en"),
+        ]
+
+        self.assertEqual(len(set(others + [key])), 5)
+        for other in others:
+            self.assertIsNone(_transcript_cache.load(other))
+
+    def test_evicts_least_recently_used_entries_first(self) -> None:
+        keys = [f"{index:02d}" + "0" * 62 for index in range(3)]
+        for key in keys:
+            _transcript_cache.store(key, RESULT, "base", "faster-whisper")
+        paths = [_transcript_cache._entry_path(key) for key in keys]
+        now = time.time()
+        for age, path in zip((300, 200, 100), paths):
+            os.utime(path, (now - age, now - age))
+        _transcript_cache.load(keys[0])  # uso recente: passa a ser a mais nova
+
+        limit = paths[0].stat().st_size + paths[2].stat().st_size  # cabem só as duas mais recentes
+        _transcript_cache.evict(limit)
+
+        self.assertTrue(paths[0].exists())
+        self.assertFalse(paths[1].exists())
+        self.assertTrue(paths[2].exists())
+
+    def test_hashes_decoded_audio_when_ffmpeg_is_available(self) -> None:
+        self.which.return_value = "/usr/bin/ffmpeg"
+        digest = "ab" * 32
+        completed = subprocess.CompletedProcess([], 0, stdout=f"SHA256={digest}\n", stderr="")
+
+        with mock.patch.object(_transcript_cache.subprocess, "run", return_value=completed) as run:
+            original = _transcript_cache.media_digest(self.media("aula.mp4", b"mp4"))
+            remuxed = _transcript_cache.media_digest(self.media("aula.mkv", b"mkv"))
+
+        self.assertEqual(original, f"pcm-sha256:{digest}")
+        self.assertEqual(remuxed, original)
+        command = run.call_args.args[0]
+        self.assertIn("0:a:0", command)
+        self.assertEqual(command[command.index("-f") + 1], "hash")
+
+    def test_digest_is_remembered_across_processes(self) -> None:
+        media = self.media("a.mp4")
+        first = _transcript_cache.media_digest(media)
+        _transcript_cache._digest_memo.clear()
+
+        with mock.patch.object(_transcript_cache, "_file_digest") as file_digest:
+            second = _transcript_cache.media_digest(media)
+
+        file_digest.assert_not_called()
+        self.assertEqual(second, first)
+
+
+if __name__ == "__main__":
+    unittest.main()
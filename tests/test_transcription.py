@@ -0,0 +1,281 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+import _transcription
+import _transcription_server
+from _transcription import SAMPLE_RATE, _ChunkedWhisperAdapter, decode_audio_pcm, split_on_silence
+from _transcription_server import ModelCache
+
+
+def tone_with_gaps(seconds, silences):
+    """Áudio 16 kHz com ruído constante e silêncio nos intervalos (em segundos) dados."""
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(seconds * SAMPLE_RATE) * 0.5).astype(np.float32)
+    for start, end in silences:
+        audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] = 0.0
+    return audio
+
+
+class InlinePool:
+    """Executor que roda cada submit na hora, no próprio processo."""
+
+    def __init__(self):
+        self.calls = []
+        self.closed = False
+
+    def submit(self, fn, *args):
+        self.calls.append((fn.__name__, args))
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, cancel_futures=False):
+        self.closed = True
+
+
+class FakeWhisper:
+    """Devolve um segmento por chamada, no idioma que recebeu (ou 'pt')."""
+
+    def __init__(self):
+        self.languages = []
+
+    def transcribe(self, audio, beam_size=5, language=None):
+        self.languages.append(language)
+        seconds = len(audio) / SAMPLE_RATE
+        segment = SimpleNamespace(start=0.5, end=seconds, text=f" {seconds:.0f}s")
+        return iter([segment]), SimpleNamespace(language=language or "pt")
+
+
+class SplitOnSilenceTests(unittest.TestCase):
+    def test_short_audio_is_a_single_chunk(self) -> None:
+        audio = np.zeros(14 * SAMPLE_RATE, dtype=np.float32)
+
+        self.assertEqual(split_on_silence(audio, chunk_seconds=10), [0, len(audio)])
+
+    def test_wide_search_window_never_yields_tiny_chunks(self) -> None:
+        audio = np.zeros(40 * SAMPLE_RATE, dtype=np.float32)
+
+        cuts = split_on_silence(audio, chunk_seconds=10, search_seconds=15)
+
+        sizes = [end - start for start, end in zip(cuts, cuts[1:])]
+        self.assertGreaterEqual(min(sizes), 5 * SAMPLE_RATE)
+
+    def test_cuts_at_the_quietest_frame_near_each_boundary(self) -> None:
+        audio = tone_with_gaps(35, [(11.0, 11.5), (22.0, 22.5)])
+
+        cuts = split_on_silence(audio, chunk_seconds=10, search_seconds=3)
+
+        self.assertEqual(cuts[0], 0)
+        self.assertEqual(cuts[-1], len(audio))
+        self.assertEqual(len(cuts), 4)
+        self.assertTrue(11.0 <= cuts[1] / SAMPLE_RATE < 11.5)
+        self.assertTrue(22.0 <= cuts[2] / SAMPLE_RATE < 22.5)
+
+    def test_tail_shorter_than_half_a_chunk_joins_the_last_chunk(self) -> None:
+        audio = tone_with_gaps(24, [(10.0, 10.3)])
+
+        cuts = split_on_silence(audio, chunk_seconds=10, search_seconds=2)
+
+        self.assertEqual(len(cuts), 3)
+        self.assertGreater(len(audio) - cuts[1], 10 * SAMPLE_RATE)
+
+
+FAKE_FFMPEG = """#!{python}
+import struct, sys
+sys.stderr.write("aviso de decodificação\\n" * 20000)  # ~460 KB, muito além do pipe
+sys.stderr.write("ultima linha\\n")
+sys.stderr.flush()
+sys.stdout.buffer.write(struct.pack("<2f", 0.5, -0.25))
+sys.exit({code})
+"""
+
+
+class DecodeAudioPcmTests(unittest.TestCase):
+    def fake_ffmpeg(self, code):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "ffmpeg")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable, code=code))
+        os.chmod(path, 0o755)
+        patcher = mock.patch.object(_transcription.shutil, "which", return_value=path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_verbose_stderr_does_not_block_the_decode(self) -> None:
+        self.fake_ffmpeg(0)
+
+        audio = decode_audio_pcm("aula.mp4")
+
+        self.assertEqual(audio.tolist(), [0.5, -0.25])
+
+    def test_failure_reports_only_the_tail_of_stderr(self) -> None:
+        self.fake_ffmpeg(1)
+
+        with self.assertRaises(RuntimeError) as raised:
+            decode_audio_pcm("aula.mp4")
+
+        message = str(raised.exception)
+        self.assertIn("rc=1", message)
+        self.assertTrue(message.endswith("ultima linha"))
+        self.assertLess(len(message), 5000)
+
+
+class ChunkedWhisperAdapterTests(unittest.TestCase):
+    def make_adapter(self):
+        adapter = object.__new__(_ChunkedWhisperAdapter)
+        adapter.workers = 2
+        adapter._pool = InlinePool()
+        return adapter
+
+    def test_offsets_segments_and_detects_language_once(self) -> None:
+        adapter = self.make_adapter()
+        model = FakeWhisper()
+        audio = np.zeros(30 * SAMPLE_RATE, dtype=np.float32)
+
+        with mock.patch.object(_transcription, "_worker_model", model), \
+                mock.patch.object(_transcription, "split_on_silence", return_value=[0, 12 * SAMPLE_RATE, len(audio)]):
+            result = adapter.transcribe(audio)
+
+        calls = [name for name, _args in adapter._pool.calls]
+        self.assertEqual(calls.count("_worker_detect_language"), 1)
+        self.assertEqual(calls.count("_worker_transcribe"), 2)
+        # Detecção sem idioma; os pedaços recebem o idioma detectado.
+        self.assertEqual(model.languages, [None, "pt", "pt"])
+        self.assertEqual(result["language"], "pt")
+        self.assertEqual(
+            [(seg["start"], seg["end"]) for seg in result["segments"]],
+            [(0.5, 12.0), (12.5, 30.0)],
+        )
+        self.assertEqual(result["text"], "12s 18s")
+
+    def test_close_shuts_the_pool_down(self) -> None:
+        adapter = self.make_adapter()
+
+        adapter.close()
+
+        self.assertTrue(adapter._pool.closed)
+
+
+class FakeLoadedModel:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ModelCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loaded = []
+        self.gates = {}
+        patcher = mock.patch.object(_transcription, "load_whisper_model", side_effect=self.fake_load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        quiet = mock.patch.object(_transcription_server, "_log")
+        quiet.start()
+        self.addCleanup(quiet.stop)
+
+    def fake_load(self, model_name, use_gpu=False, workers=1, use_server=True):
+        gate = self.gates.get(model_name)
+        if gate is not None:
+            gate.wait(5)
+        model = FakeLoadedModel(model_name)
+        self.loaded.append(model)
+        return model, "cpu"
+
+    @staticmethod
+    def use_once(cache, name):
+        with cache.use(name, False, 1):
+            pass
+
+    def hold(self, cache, name):
+        """Mantém o modelo reservado numa thread até o evento devolvido ser setado."""
+        entered = threading.Event()
+        leave = threading.Event()
+
+        def run():
+            with cache.use(name, False, 1):
+                entered.set()
+                leave.wait(5)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        self.assertTrue(entered.wait(5))
+        return leave, thread
+
+    def test_reuses_loaded_models_and_evicts_least_recently_used(self) -> None:
+        cache = ModelCache(2)
+
+        for name in ("base", "small", "base", "medium", "base"):
+            self.use_once(cache, name)
+
+        self.assertEqual([model.name for model in self.loaded], ["base", "small", "medium"])
+        closed = [model.name for model in self.loaded if model.closed]
+        self.assertEqual(closed, ["small"])
+
+    def test_loading_one_model_does_not_block_another(self) -> None:
+        cache = ModelCache(2)
+        self.use_once(cache, "base")
+        self.gates["large"] = threading.Event()
+        loader = threading.Thread(target=self.use_once, args=(cache, "large"))
+        loader.start()
+
+        done = threading.Event()
+
+        def cached_request():
+            with cache.use("base", False, 1):
+                done.set()
+
+        threading.Thread(target=cached_request).start()
+        try:
+            self.assertTrue(done.wait(2), "pedido do modelo em cache esperou a carga do outro")
+        finally:
+            self.gates["large"].set()
+            loader.join(5)
+
+    def test_concurrent_requests_load_a_model_once(self) -> None:
+        cache = ModelCache(2)
+        self.gates["base"] = threading.Event()
+        threads = [threading.Thread(target=self.use_once, args=(cache, "base")) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.gates["base"].set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(self.loaded), 1)
+
+    def test_evicted_model_is_closed_only_after_its_last_user(self) -> None:
+        cache = ModelCache(1)
+        leave, thread = self.hold(cache, "base")
+
+        self.use_once(cache, "small")
+        base = self.loaded[0]
+        self.assertFalse(base.closed)
+
+        leave.set()
+        thread.join(5)
+        self.assertTrue(base.closed)
+
+    def test_failed_load_is_not_cached(self) -> None:
+        cache = ModelCache(2)
+        with mock.patch.object(_transcription, "load_whisper_model", side_effect=RuntimeError("sem rede")):
+            with self.assertRaises(RuntimeError):
+                self.use_once(cache, "base")
+
+        with cache.use("base", False, 1) as entry:
+            self.assertEqual(entry.model.name, "base")
+
+
+if __name__ == "__main__":
+    unittest.main()
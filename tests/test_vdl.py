@@ -0,0 +1,438 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import _download_cache
+import _openai_limits
+import vdl
+
+
+SILENCEDETECT_STDERR = """\
+Input #0, mp3, from 'aula.mp3':
+[silencedetect @ 0x5581] silence_start: -0.01
+[silencedetect @ 0x5581] silence_end: 0.5 | silence_duration: 0.51
+[silencedetect @ 0x5581] silence_start: 590
+[silencedetect @ 0x5581] silence_end: 591 | silence_duration: 1
+[silencedetect @ 0x5581] silence_start: 1190.5
+[silencedetect @ 0x5581] silence_end: 1191.5 | silence_duration: 1
+size=N/A time=00:30:00.00 bitrate=N/A speed= 900x
+"""
+
+
+class FakeCompletions:
+    """client.chat.completions falso: responde pelo `reply(prompt)` e guarda os prompts."""
+
+    def __init__(self, reply=None):
+        self.prompts = []
+        self.reply = reply or (lambda prompt: f"resumo {len(self.prompts)}")
+        self.with_raw_response = self
+
+    def create(self, model, messages, stream=False, **_kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        message = SimpleNamespace(content=self.reply(prompt))
+        parsed = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return SimpleNamespace(headers={}, parse=lambda: parsed)
+
+
+def fake_client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+class OpenAITestCase(unittest.TestCase):
+    """Limitador sem espera e diretório temporário para cada teste."""
+
+    def setUp(self) -> None:
+        limiter = mock.patch.object(_openai_limits, "_shared", _openai_limits.RateLimiter(100000))
+        limiter.start()
+        self.addCleanup(limiter.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        quiet = mock.patch.object(vdl, "print_to_console_and_log")
+        quiet.start()
+        self.addCleanup(quiet.stop)
+
+
+class SummarizeChaptersTests(OpenAITestCase):
+    def write(self, name, text):
+        with open(os.path.join(self.dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_inserting_a_chapter_only_pays_for_the_new_one(self) -> None:
+        for name in ("02.md", "03.md"):
+            self.write(name, f"conteúdo de {name}")
+        completions = FakeCompletions()
+        client = fake_client(completions)
+        vdl.summarize_chapters(client, self.dir, ["02.md", "03.md"], concurrency=2)
+
+        self.write("01.md", "capítulo novo")
+        summaries, failed = vdl.summarize_chapters(client, self.dir, ["01.md", "02.md", "03.md"], concurrency=2)
+
+        self.assertEqual(failed, [])
+        self.assertEqual(len(completions.prompts), 3)
+        self.assertIn("capítulo novo", completions.prompts[-1])
+        self.assertEqual(
+            [summary.splitlines()[0] for summary in summaries],
+            ["# CAPÍTULO 1: 01.md", "# CAPÍTULO 2: 02.md", "# CAPÍTULO 3: 03.md"],
+        )
+
+    def test_prompt_depends_only_on_the_chapter_content(self) -> None:
+        self.write("a.md", "mesmo texto")
+        self.write("b.md", "mesmo texto")
+        completions = FakeCompletions()
+
+        vdl.summarize_chapters(fake_client(completions), self.dir, ["a.md", "b.md"], concurrency=1)
+
+        self.assertEqual(len(completions.prompts), 1)
+        self.assertNotIn("a.md", completions.prompts[0])
+
+
+def words(text, model=None):
+    return len(text.split())
+
+
+class EbookReduceTests(OpenAITestCase):
+    TEMPLATES = {
+        "ebook_reduce.md": "FINAL E-BOOK {combined}",
+        "ebook_part_reduce.md": "PARTE {part}/{total_parts} {combined}",
+    }
+
+    def setUp(self) -> None:
+        super().setUp()
+        for name, value in (
+            ("count_tokens", words),
+            ("_load_prompt_template", self.TEMPLATES.__getitem__),
+            ("ebook_reduce_budget", lambda: 20),
+        ):
+            patcher = mock.patch.object(vdl, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def reduce(self, summaries, reply, mode="auto"):
+        completions = FakeCompletions(reply)
+        text = vdl.reduce_chapters(fake_client(completions), self.dir, summaries, mode)
+        return text, completions.prompts
+
+    def test_groups_consecutive_items_within_the_budget(self) -> None:
+        with mock.patch.object(vdl, "count_tokens", words):
+            groups = vdl.group_by_token_budget(["a b c", "d e f", "g h i", "j k l"], 7)
+
+        self.assertEqual(groups, [["a b c", "d e f"], ["g h i", "j k l"]])
+
+    def test_group_budget_includes_the_prompt_overhead(self) -> None:
+        with mock.patch.object(vdl, "count_tokens", words):
+            groups = vdl.group_by_token_budget(["a b c", "d e f"], 7, overhead=2)
+
+        self.assertEqual(groups, [["a b c"], ["d e f"]])
+
+    def test_oversized_item_becomes_its_own_group(self) -> None:
+        with mock.patch.object(vdl, "count_tokens", words):
+            groups = vdl.group_by_token_budget(["a", "b c d e f g h i j", "k"], 5)
+
+        self.assertEqual(groups, [["a"], ["b c d e f g h i j"], ["k"]])
+
+    def test_small_input_goes_straight_to_the_final_call(self) -> None:
+        text, prompts = self.reduce(["um dois", "três"], lambda prompt: "livro")
+
+        self.assertEqual(text, "livro")
+        self.assertEqual(len(prompts), 1)
+
+    def test_tree_reduces_until_the_final_prompt_fits(self) -> None:
+        summaries = [" ".join(["palavra"] * 6) for _ in range(4)]
+
+        def reply(prompt):
+            return "livro" if prompt.startswith("FINAL") else "rascunho curto"
+
+        text, prompts = self.reduce(summaries, reply)
+
+        self.assertEqual(text, "livro")
+        self.assertTrue(prompts[-1].startswith("FINAL"))
+        self.assertTrue(all(words(prompt) <= 20 for prompt in prompts))
+
+    def test_fails_instead_of_sending_an_oversized_final_prompt(self) -> None:
+        summaries = [" ".join(["palavra"] * 6) for _ in range(4)]
+
+        # Rascunhos que não encolhem: nenhum nível consegue caber no orçamento.
+        completions = FakeCompletions(lambda prompt: " ".join(["longo"] * 12))
+        with self.assertRaises(vdl.EbookBudgetError):
+            vdl.reduce_chapters(fake_client(completions), self.dir, summaries, "auto")
+
+        self.assertFalse(any(prompt.startswith("FINAL") for prompt in completions.prompts))
+
+    def test_fails_when_a_single_summary_exceeds_the_budget(self) -> None:
+        with self.assertRaises(vdl.EbookBudgetError):
+            self.reduce([" ".join(["palavra"] * 30)], lambda prompt: "livro")
+
+
+class ContextChunkingTests(OpenAITestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = mock.patch.object(vdl, "count_tokens", words)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_split_transcript_cuts_only_at_sentence_ends(self) -> None:
+        text = "Primeira frase curta. Segunda frase um pouco maior! Terceira? Quarta frase final."
+
+        chunks = vdl.split_transcript(text, 6)
+
+        self.assertEqual(chunks, [
+            "Primeira frase curta.",
+            "Segunda frase um pouco maior! Terceira?",
+            "Quarta frase final.",
+        ])
+
+    def test_split_transcript_breaks_on_newlines_and_keeps_every_word(self) -> None:
+        text = "linha sem ponto\noutra linha sem ponto\n\nmais uma"
+
+        chunks = vdl.split_transcript(text, 7)
+
+        self.assertEqual(chunks, ["linha sem ponto outra linha sem ponto", "mais uma"])
+        self.assertEqual(" ".join(chunks).split(), text.split())
+
+    def test_split_transcript_cuts_a_sentence_longer_than_the_budget(self) -> None:
+        sentence = " ".join(["palavra"] * 10) + "."
+
+        chunks = vdl.split_transcript(f"Curta. {sentence}", 4)
+
+        self.assertEqual(chunks[0], "Curta.")
+        self.assertEqual([len(chunk.split()) for chunk in chunks[1:]], [4, 4, 2])
+        self.assertEqual(" ".join(chunks[1:]), sentence)
+
+    def test_split_transcript_bounds_unpunctuated_whisper_output(self) -> None:
+        # Transcrição sem pontuação nem quebras: uma única "frase".
+        text = " ".join(f"palavra{i}" for i in range(1000))
+
+        chunks = vdl.split_transcript(text, 300)
+
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(all(vdl.count_tokens(chunk) <= 300 for chunk in chunks))
+        self.assertEqual(" ".join(chunks).split(), text.split())
+
+    def test_split_by_tokens_slices_the_tiktoken_encoding(self) -> None:
+        encoding = SimpleNamespace(
+            encode=lambda text, disallowed_special=(): text.split(),
+            decode=lambda tokens: " ".join(tokens),
+        )
+        text = " ".join(str(i) for i in range(7))
+
+        with mock.patch.object(vdl, "_token_encoding", return_value=encoding):
+            self.assertEqual(vdl.split_by_tokens(text, 3), ["0 1 2", "3 4 5", "6"])
+
+    def generate(self, text, mode):
+        fake_openai = SimpleNamespace(OpenAI=lambda: object())
+        with mock.patch.dict(sys.modules, {"openai": fake_openai}), \
+                mock.patch.object(vdl, "_load_prompt_template", return_value="{transcription_text}"), \
+                mock.patch.object(vdl, "_chat", return_value="single") as chat, \
+                mock.patch.object(vdl, "_generate_chunked_context", return_value="chunked") as chunked:
+            vdl.generate_context_from_text(text, os.path.join(self.dir, "aula.mp4"), self.dir, mode)
+        return chat.called, chunked.called
+
+    def test_auto_uses_a_single_call_when_the_model_window_fits(self) -> None:
+        # Uma aula de ~1 h (dezenas de milhares de tokens) passa do trecho
+        # padrão, mas cabe na janela do modelo.
+        text = " ".join(["palavra"] * 40000)
+
+        self.assertEqual(self.generate(text, "auto"), (True, False))
+
+    def test_auto_chunks_only_beyond_the_model_window(self) -> None:
+        text = " ".join(["palavra"] * (vdl.context_single_limit() + 1))
+
+        self.assertEqual(self.generate(text, "auto"), (False, True))
+
+    def test_chunked_mode_is_forced(self) -> None:
+        self.assertEqual(self.generate("curta.", "chunked"), (False, True))
+
+
+def stream_chunk(content=None, finish_reason=None):
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+class FakeStreamingCompletions:
+    """Cada chamada devolve o próximo roteiro de chunks (lista de stream_chunk)."""
+
+    def __init__(self, *scripts):
+        self.scripts = list(scripts)
+        self.requests = []
+        self.with_raw_response = self
+
+    def create(self, model, messages, stream=False, **_kwargs):
+        self.requests.append(messages)
+        chunks = self.scripts.pop(0)
+        return SimpleNamespace(headers={}, parse=lambda: iter(chunks))
+
+
+class StreamCompletionTests(OpenAITestCase):
+    def stream(self, *scripts):
+        completions = FakeStreamingCompletions(*scripts)
+        path = os.path.join(self.dir, "contexto.md")
+        result = vdl._stream_completion(fake_client(completions), "gpt-4o", "sys", "prompt", path, "teste")
+        return result, path, completions
+
+    def test_promotes_the_partial_when_the_response_stops(self) -> None:
+        text, path, _completions = self.stream([stream_chunk("# Tí"), stream_chunk("tulo", "stop")])
+
+        self.assertEqual(text, "# Título")
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "# Título")
+        self.assertFalse(os.path.exists(path + ".partial"))
+        self.assertFalse(os.path.exists(path + ".partial.key"))
+
+    def test_continues_after_a_stream_that_ends_without_finish_reason(self) -> None:
+        text, _path, completions = self.stream(
+            [stream_chunk("começo ")],
+            [stream_chunk("e fim", "stop")],
+        )
+
+        self.assertEqual(text, "começo e fim")
+        self.assertEqual(completions.requests[1][2], {"role": "assistant", "content": "começo "})
+
+    def test_keeps_the_partial_when_every_attempt_hits_the_length_limit(self) -> None:
+        path = os.path.join(self.dir, "contexto.md")
+        with self.assertRaises(vdl.IncompleteStreamError):
+            self.stream(*[[stream_chunk("parte ", "length")] for _ in range(3)])
+
+        self.assertFalse(os.path.exists(path))
+        with open(path + ".partial", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "parte parte parte ")
+
+    def test_never_publishes_a_stream_without_finish_reason(self) -> None:
+        path = os.path.join(self.dir, "contexto.md")
+        with self.assertRaises(vdl.IncompleteStreamError):
+            self.stream(*[[stream_chunk("x")] for _ in range(3)])
+
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(path + ".partial"))
+
+    def test_content_filter_stops_without_retrying(self) -> None:
+        completions = FakeStreamingCompletions([stream_chunk("x", "content_filter")], [stream_chunk("y", "stop")])
+        path = os.path.join(self.dir, "contexto.md")
+
+        with self.assertRaises(vdl.IncompleteStreamError):
+            vdl._stream_completion(fake_client(completions), "gpt-4o", "sys", "prompt", path, "teste")
+
+        self.assertEqual(len(completions.requests), 1)
+        self.assertFalse(os.path.exists(path))
+
+
+class SplitPointTests(unittest.TestCase):
+    def test_detect_silences_returns_midpoints_from_ffmpeg_stderr(self) -> None:
+        completed = subprocess.CompletedProcess([], 0, stdout="", stderr=SILENCEDETECT_STDERR)
+
+        with mock.patch.object(vdl.subprocess, "run", return_value=completed) as run:
+            silences = vdl._detect_silences("aula.mp3")
+
+        self.assertEqual(silences, [0.25, 590.5, 1191.0])
+        self.assertIn("silencedetect=noise=-35dB:d=0.4", run.call_args.args[0])
+
+    def test_short_audio_needs_no_split(self) -> None:
+        self.assertEqual(vdl._plan_split_points(500, 600, [100, 300]), [])
+
+    def test_cuts_at_the_last_silence_before_each_boundary(self) -> None:
+        points = vdl._plan_split_points(1500, 600, [0.25, 560, 590.5, 1150.0, 1191.0], search_seconds=60)
+
+        self.assertEqual(points, [590.5, 1150.0])
+
+    def test_falls_back_to_the_boundary_without_silence_in_the_window(self) -> None:
+        # Silêncio longe demais (fora da janela) ou depois da fronteira não serve.
+        points = vdl._plan_split_points(1300, 600, [100, 610], search_seconds=60)
+
+        self.assertEqual(points, [600, 1200])
+
+    def test_never_cuts_at_the_previous_point(self) -> None:
+        points = vdl._plan_split_points(700, 600, [0.25, 0.5], search_seconds=600)
+
+        self.assertEqual(points, [600])
+
+
+class FakePopen:
+    """subprocess.Popen do yt-dlp falso: guarda o comando e devolve `output`."""
+
+    def __init__(self, calls, output="", returncode=0):
+        self.calls = calls
+        self.output = output
+        self.returncode = returncode
+
+    def __call__(self, command, **_kwargs):
+        self.calls.append(command)
+        self.stdout = io.StringIO(self.output)
+        return self
+
+    def wait(self):
+        return self.returncode
+
+    def terminate(self):
+        pass
+
+
+class DownloadVideoTests(unittest.TestCase):
+    URL = "https://cdn.example.com/aula/master.m3u8"
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.cache = os.path.join(self.dir, "cache")
+        env = mock.patch.dict(os.environ, {"VDL_DOWNLOAD_CACHE": self.cache})
+        env.start()
+        self.addCleanup(env.stop)
+        quiet = mock.patch.object(vdl, "print_to_console_and_log")
+        quiet.start()
+        self.addCleanup(quiet.stop)
+        self.calls = []
+
+    def download(self, output_path, returncode=0, **kwargs):
+        popen = FakePopen(self.calls, returncode=returncode)
+        with mock.patch.object(vdl.subprocess, "Popen", popen), \
+                mock.patch.object(vdl.shutil, "which", return_value="/usr/bin/ffmpeg"):
+            return vdl.download_video(self.URL, output_path, "UA", "session=abc", **kwargs)
+
+    @staticmethod
+    def option_values(command, option):
+        return [command[i + 1] for i, arg in enumerate(command) if arg == option]
+
+    def test_destination_goes_in_paths_home_so_temp_files_use_the_url_cache(self) -> None:
+        output_path = os.path.join(self.dir, "downloads", "aula.mp4")
+
+        self.assertTrue(self.download(output_path))
+
+        command = self.calls[0]
+        fragments_dir = _download_cache.entry_dir(self.URL)
+        self.assertEqual(
+            self.option_values(command, "--paths"),
+            [f"home:{os.path.join(self.dir, 'downloads')}", f"temp:{fragments_dir}"],
+        )
+        # -o absoluto faria o yt-dlp ignorar os --paths.
+        self.assertEqual(self.option_values(command, "--output"), ["aula.mp4"])
+        self.assertNotIn("--continue", command)
+        self.assertEqual(command[-1], self.URL)
+
+    def test_audio_only_output_keeps_only_the_name_template(self) -> None:
+        output_path = os.path.join(self.dir, "aula.m4a")
+
+        self.download(output_path, audio_only=True)
+
+        self.assertEqual(self.option_values(self.calls[0], "--output"), ["aula.%(ext)s"])
+
+    def test_failed_download_keeps_fragments_and_success_discards_them(self) -> None:
+        output_path = os.path.join(self.dir, "aula.mp4")
+        fragments_dir = _download_cache.entry_dir(self.URL)
+        with open(os.path.join(fragments_dir, "aula.mp4.part-Frag1"), "wb") as f:
+            f.write(b"x")
+
+        self.assertFalse(self.download(output_path, returncode=1))
+        self.assertTrue(_download_cache.has_fragments(fragments_dir))
+
+        self.assertTrue(self.download(output_path))
+        self.assertFalse(os.path.exists(fragments_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
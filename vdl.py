@@ -3,15 +3,18 @@ import argparse
 import base64
 import json
 import os
-import random
 import re
 import shutil
 import subprocess
 import sys
 import tempfile
-import time
 from datetime import datetime
 
+import _download_cache
+import _fragment_tuning
+import _hls_native
+import _transcript_cache
+
 # Regex compilada para limpar ANSI escape codes (CSI sequences) do output do
 # yt-dlp ao gravar no arquivo de log. Cobre ESC[...m, ESC[...K, etc.
 _ANSI_ESCAPE_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
@@ -62,31 +65,6 @@ def _load_prompt_template(name):
         return f.read()
 
 
-# --- Helpers de retry (OpenAI) ---
-def _retry_with_backoff(fn, *args, max_attempts=4, base_delay=2.0, op_name="operação", **kwargs):
-    """Executa fn(*args, **kwargs) com retry exponencial + jitter para falhas
-    transitórias da API OpenAI (rate limit, 5xx, conexão). Levanta a última
-    exceção se todas as tentativas falharem."""
-    for attempt in range(1, max_attempts + 1):
-        try:
-            return fn(*args, **kwargs)
-        except Exception as e:
-            err_text = str(e).lower()
-            transient = any(s in err_text for s in (
-                "rate limit", "ratelimit", "timeout", "connection", "5xx",
-                "service unavailable", "overloaded", "internal server", "503", "502", "504",
-            ))
-            if not transient or attempt == max_attempts:
-                raise
-            delay = base_delay * (2 ** (attempt - 1)) + random.uniform(0, 1)
-            print_to_console_and_log(
-                f"[AVISO] Falha transitória em {op_name} (tentativa {attempt}/{max_attempts}): {e}. "
-                f"Tentando novamente em {delay:.1f}s...",
-                C_YELLOW,
-            )
-            time.sleep(delay)
-
-
 # --- Funções de Setup e Verificação ---
 def setup_logging():
     """Configura o logging automaticamente.
@@ -114,8 +92,8 @@ def check_dependencies(args):
         print_error("Dependência não encontrada: 'yt-dlp'. Instale-a.")
         has_error = True
 
-    # ffmpeg é necessário para quase tudo, exceto --only-download
-    if not args.only_download and not shutil.which("ffmpeg"):
+    # ffmpeg é necessário para quase tudo, exceto --only-download (sem --audio-only)
+    if (not args.only_download or args.audio_only) and not shutil.which("ffmpeg"):
         print_error("Dependência não encontrada: 'ffmpeg'. Instale-a.")
         has_error = True
 
@@ -130,10 +108,6 @@ def check_dependencies(args):
         except ImportError:
             print_error("Dependência para a API OpenAI não encontrada: 'openai'. Use: pip install openai")
             has_error = True
-        try: import pydub
-        except ImportError:
-            print_error("Dependência para manipulação de áudio não encontrada: 'pydub'. Use: pip install pydub")
-            has_error = True
         if not os.getenv("OPENAI_API_KEY"):
             print_error("A variável de ambiente OPENAI_API_KEY não está definida.")
             has_error = True
@@ -430,27 +404,74 @@ def _write_netscape_cookies(cookies_list, path):
         f.write("\n".join(lines) + "\n")
 
 
-def download_video(url, output_path, user_agent, cookie_header, referer=None, cookies_list=None):
-    """Baixa o vídeo usando um diretório temporário isolado para segurança em paralelo.
+# Relançamentos do yt-dlp com menos fragmentos simultâneos após 429/403 (modo auto).
+_THROTTLE_RESTARTS = 3
+# Contêiner do --audio-only: AAC dos HLS/DASH entra por cópia, sem reencode.
+AUDIO_ONLY_EXTENSION = ".m4a"
+
+def audio_only_path(output_path):
+    """Destino do --audio-only: mesmo nome, extensão do áudio."""
+    return os.path.splitext(output_path)[0] + AUDIO_ONLY_EXTENSION
+
+def download_video(url, output_path, user_agent, cookie_header, referer=None, cookies_list=None, concurrent_fragments=1, hls_engine="yt-dlp", audio_only=False):
+    """Baixa o vídeo com os fragmentos num diretório de cache próprio da URL.
+
+    Os temporários do yt-dlp ficam em _download_cache (um diretório por URL,
+    isolado entre downloads paralelos) e o yt-dlp, que retoma fragmentos por
+    padrão, faz uma nova tentativa continuar do último fragmento completo. O
+    diretório é removido no sucesso.
+
+    concurrent_fragments (N ou "auto") vira o -N do yt-dlp; no "auto" o
+    _fragment_tuning escolhe o N pelo histórico do host e, num 429/403, o
+    yt-dlp é relançado com metade dos fragmentos simultâneos.
+
+    hls_engine="native" tenta antes a engine em processo (_hls_native); fonte
+    não suportada ou falha nela cai para o yt-dlp.
+
+    audio_only baixa só o áudio (rendição de áudio do HLS/DASH quando existe,
+    senão o áudio é separado durante o download) em output_path, que deve ter a
+    extensão AUDIO_ONLY_EXTENSION (ver audio_only_path).
 
     Quando cookies_list é fornecido, usa --cookies <netscape file> (preferencial,
     sem aviso de yt-dlp e com escopo de domínio correto). Caso contrário, faz
     fallback para --add-header "Cookie: ..." (caminho legado)."""
     print_info(f"Iniciando o download de: {url}")
-    output_dir = os.path.dirname(output_path)
+    output_dir, output_name = os.path.split(output_path)
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
     ffmpeg_path = shutil.which("ffmpeg")
 
+    fragments_dir = None
+    if _download_cache.enabled():
+        try:
+            fragments_dir = _download_cache.entry_dir(url)
+            _download_cache.collect(active=fragments_dir)
+        except OSError as e:
+            print_info(f"Cache de fragmentos indisponível ({e}); usando diretório temporário.")
+            fragments_dir = None
+
+    # O diretório temporário guarda só os cookies (nunca persistidos no cache).
     with tempfile.TemporaryDirectory() as temp_dir:
-        print_info(f"Usando diretório temporário isolado: {temp_dir}")
+        if fragments_dir is None:
+            print_info(f"Usando diretório temporário isolado: {temp_dir}")
+        elif _download_cache.has_fragments(fragments_dir):
+            print_info(f"Retomando o download a partir do cache de fragmentos: {fragments_dir}")
+        else:
+            print_info(f"Cache de fragmentos: {fragments_dir}")
 
         command = [
             "yt-dlp",
             "--user-agent", user_agent,
             "--ffmpeg-location", ffmpeg_path,
-            "--paths", f"temp:{temp_dir}",
-            "--output", output_path,
+            # O yt-dlp ignora --paths quando o --output é absoluto: o destino vai
+            # no home e o -o leva só o nome, senão os temporários caem ao lado do
+            # arquivo final e o cache da URL nunca é usado.
+            "--paths", f"home:{output_dir or os.curdir}",
+            "--paths", f"temp:{fragments_dir or temp_dir}",
+            "--output", os.path.splitext(output_name)[0] + ".%(ext)s" if audio_only else output_name,
+            # Uma linha por atualização de progresso (sem "\r"): quem lê a saída
+            # em stream (ex.: VDL Studio) acompanha o download ao vivo.
+            "--newline",
         ]
 
         if cookies_list:
@@ -465,21 +486,88 @@ def download_video(url, output_path, user_agent, cookie_header, referer=None, co
             print_info(f"Usando Referer: {referer}")
             command += ["--referer", referer, "--add-header", f"Origin: {referer.rstrip('/')}"]
 
+        if audio_only:
+            # Só a rendição de áudio; em fonte sem áudio separado o -x fica só
+            # com o áudio (cópia do AAC, sem reencode) e descarta o vídeo.
+            print_info("Modo somente áudio: o vídeo não será mantido.")
+            command += ["-f", "bestaudio[ext=m4a]/bestaudio/best", "--extract-audio", "--audio-format", AUDIO_ONLY_EXTENSION.lstrip(".")]
+
         command.append(url)
 
+        tuner = _fragment_tuning.FragmentTuner(url, concurrent_fragments)
+        if hls_engine == "native" and _download_native(url, output_path, fragments_dir or temp_dir, user_agent, cookie_header, cookies_list, referer, tuner, audio_only):
+            if fragments_dir is not None:
+                _download_cache.discard(fragments_dir)
+            return True
         try:
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', bufsize=1)
-            for line in iter(process.stdout.readline, ''): print_to_console_and_log(line.strip())
-            process.stdout.close()
-            if process.wait() != 0:
+            for attempt in range(_THROTTLE_RESTARTS + 1):
+                if tuner.fragments > 1 or tuner.adaptive:
+                    print_info(f"Fragmentos simultâneos: {tuner.fragments}")
+                fragment_args = ["--concurrent-fragments", str(tuner.fragments)] if tuner.fragments > 1 else []
+                process = subprocess.Popen(command[:-1] + fragment_args + command[-1:], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', bufsize=1)
+                throttled = False
+                for line in iter(process.stdout.readline, ''):
+                    print_to_console_and_log(line.strip())
+                    if tuner.observe(line.strip()) and attempt < _THROTTLE_RESTARTS:
+                        throttled = True
+                        process.terminate()
+                        break
+                process.stdout.close()
+                returncode = process.wait()
+                if throttled:
+                    print_info(f"Servidor limitando as requisições (429/403): reduzindo para {tuner.back_off()} fragmento(s) simultâneo(s) e retomando.")
+                    continue
+                break
+            if returncode != 0:
                 print_error("O download falhou.")
+                if fragments_dir is not None:
+                    print_info("Fragmentos mantidos no cache: uma nova tentativa continua de onde parou.")
                 return False
+            if fragments_dir is not None:
+                _download_cache.discard(fragments_dir)
+            tuner.finish()
+            average = tuner.average_bps()
+            if average:
+                print_info(f"Velocidade média do download: {_format_rate(average)} ({tuner.fragments} fragmento(s) simultâneo(s))")
             print_success(f"Download concluído. Vídeo salvo em: {output_path}")
             return True
         except Exception as e:
             print_error(f"Ocorreu um erro ao executar o yt-dlp: {e}")
             return False
 
+def _download_native(url, output_path, work_dir, user_agent, cookie_header, cookies_list, referer, tuner, audio_only=False):
+    """Engine HLS nativa; False (com o motivo no log) manda o download para o yt-dlp."""
+    # Sem -N explícito a engine usa o pool padrão: conexões reaproveitadas são o ponto dela.
+    workers = tuner.fragments if tuner.adaptive or tuner.fragments > 1 else _hls_native.DEFAULT_WORKERS
+
+    def log(line):
+        print_to_console_and_log(line)
+        tuner.observe(line)
+
+    print_info("Tentando a engine HLS nativa.")
+    try:
+        _hls_native.download(
+            url, output_path, os.path.join(work_dir, "native"), user_agent,
+            cookie_header=cookie_header, cookies_list=cookies_list, referer=referer, workers=workers, log=log,
+            audio_only=audio_only,
+        )
+    except _hls_native.HlsError as e:
+        print_info(f"Engine HLS nativa não concluiu ({e}); usando o yt-dlp.")
+        return False
+    tuner.fragments = workers
+    tuner.finish()
+    average = tuner.average_bps()
+    if average:
+        print_info(f"Velocidade média do download: {_format_rate(average)} ({workers} fragmento(s) simultâneo(s))")
+    print_success(f"Download concluído (engine HLS nativa). Vídeo salvo em: {output_path}")
+    return True
+
+def _format_rate(bps):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if bps < 1024 or unit == "GiB":
+            return f"{bps:.2f}{unit}/s"
+        bps /= 1024
+
 def extract_audio(video_path, output_dir, for_transcription=True):
     """Extrai o áudio para um subdiretório 'mp3' e retorna o caminho completo.
 
@@ -514,10 +602,32 @@ def extract_audio(video_path, output_dir, for_transcription=True):
         print_error(f"A extração de áudio falhou (rc={e.returncode}): {stderr}")
         return None
 
+def needs_mp3(args):
+    """O mp3 em <dest>/mp3 só é gerado quando alguém o consome: o modo
+    unificado (upload para a API) ou o arquivamento pedido com --keep-audio.
+    A transcrição local decodifica o vídeo direto para PCM num pipe."""
+    return bool(args.unified_mode or args.keep_audio)
+
 # --- Funções de IA ---
-def load_whisper_model(model_name, use_gpu):
+def _transcript_cache_key(media_path, model_name, engine):
+    """Chave do cache de transcrições para a mídia, ou None se indisponível.
+
+    Falhas de hash (arquivo ilegível, cache desativado) nunca impedem a
+    transcrição: apenas desligam o cache para este arquivo."""
+    if not _transcript_cache.enabled():
+        return None
+    try:
+        return _transcript_cache.cache_key(media_path, model_name, engine)
+    except OSError as e:
+        print_to_console_and_log(f"[AVISO] Cache de transcrição indisponível para '{media_path}': {e}", C_YELLOW)
+        return None
+
+
+def load_whisper_model(model_name, use_gpu, workers=None):
     """Wrapper amigável (com logs) sobre _transcription.load_whisper_model.
-    Retorna (model, device) ou (None, None) em caso de falha."""
+    Retorna (model, device) ou (None, None) em caso de falha.
+
+    workers > 1 ativa a transcrição em pedaços paralelos (somente CPU)."""
     try:
         from _transcription import load_whisper_model as _load, _cuda_available
     except ImportError as e:
@@ -528,28 +638,54 @@ def load_whisper_model(model_name, use_gpu):
         if use_gpu and not _cuda_available():
             print_to_console_and_log("[AVISO] CUDA não disponível. Usando CPU.", C_YELLOW)
         print_info(f"Carregando modelo Whisper '{model_name}'...")
-        model, device = _load(model_name, use_gpu=use_gpu)
-        print_info(f"Modelo carregado (device={device}).")
+        model, device = _load(model_name, use_gpu=use_gpu, workers=workers)
+        parallel = getattr(model, "workers", 1)
+        if getattr(model, "remote", False):
+            print_info(f"Usando modelo residente do servidor de transcrição (device={device}).")
+        elif parallel > 1:
+            print_info(f"Modelo carregado (device={device}, {parallel} workers em paralelo).")
+        else:
+            print_info(f"Modelo carregado (device={device}).")
         return model, device
     except Exception as e:
         print_error(f"Falha ao carregar modelo Whisper: {e}")
         return None, None
 
 
-def transcribe_audio_local(audio_path, model_name, use_gpu, output_dir, model=None, device=None):
+def transcribe_audio_local(audio_path, model_name, use_gpu, output_dir, model=None, device=None, workers=None, source_path=None):
     """Transcreve áudio localmente. Aceita modelo pré-carregado para evitar
     recarregar quando processando múltiplos arquivos no modo --local diretório.
-    fp16 é usado dinamicamente: True em CUDA (mais rápido), False em CPU."""
+    fp16 é usado dinamicamente: True em CUDA (mais rápido), False em CPU.
+    audio_path pode ser o próprio vídeo: o áudio é decodificado em memória.
+
+    Consulta antes o cache de transcrições (_transcript_cache), chaveado pelo
+    hash de source_path (mídia de origem; padrão: o próprio áudio), modelo e
+    engine: em caso de acerto, o Whisper nem é carregado."""
     transcription_dir = os.path.join(output_dir, "transcriptions")
     os.makedirs(transcription_dir, exist_ok=True)
     transcription_path = os.path.join(transcription_dir, os.path.basename(os.path.splitext(audio_path)[0] + ".txt"))
     print_info(f"Iniciando a transcrição LOCAL do áudio para: {transcription_path}")
     try:
-        if model is None:
-            model, device = load_whisper_model(model_name, use_gpu)
+        cache_key = _transcript_cache_key(source_path or audio_path, model_name, "faster-whisper")
+        result = _transcript_cache.load(cache_key) if cache_key else None
+        if result is not None:
+            print_info("Transcrição encontrada no cache (mesmo conteúdo, modelo e engine).")
+        elif model is None:
+            # Modelo carregado só para este arquivo: encerra o pool de workers
+            # (modo em pedaços) em vez de deixá-lo para o fim do interpretador.
+            model, device = load_whisper_model(model_name, use_gpu, workers=workers)
             if model is None:
                 return None
-        result = model.transcribe(audio_path, fp16=(device == "cuda"))
+            try:
+                result = model.transcribe(audio_path, fp16=(device == "cuda"))
+            finally:
+                model.close()
+            if cache_key:
+                _transcript_cache.store(cache_key, result, model_name, "faster-whisper")
+        else:
+            result = model.transcribe(audio_path, fp16=(device == "cuda"))
+            if cache_key:
+                _transcript_cache.store(cache_key, result, model_name, "faster-whisper")
         with open(transcription_path, 'w', encoding='utf-8') as f: f.write(result["text"])
         print_success(f"Transcrição local salva com sucesso em: {transcription_path}")
         return result["text"]
@@ -557,14 +693,103 @@ def transcribe_audio_local(audio_path, model_name, use_gpu, output_dir, model=No
         print_error(f"Ocorreu um erro durante a transcrição local: {e}")
         return None
 
-def generate_context_from_text(transcription_text, base_output_path, output_dir):
+_CONTEXT_MODEL = "gpt-4o"
+_CONTEXT_SYSTEM = "Você é um especialista em design instrucional e editor de conteúdo."
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+# Janela de contexto do gpt-4o e a saída máxima reservada para a resposta.
+_CONTEXT_WINDOW_TOKENS = 128000
+_CONTEXT_OUTPUT_TOKENS = 16384
+
+
+def context_single_limit():
+    """Maior prompt (tokens) que cabe numa chamada única do modelo de contexto."""
+    return _CONTEXT_WINDOW_TOKENS - _CONTEXT_OUTPUT_TOKENS
+
+
+def context_chunk_budget():
+    """Tokens máximos de transcrição por trecho do modo chunked (VDL_CONTEXT_CHUNK_TOKENS)."""
+    try:
+        return max(500, int(os.getenv("VDL_CONTEXT_CHUNK_TOKENS", "12000")))
+    except ValueError:
+        return 12000
+
+
+def split_transcript(text, budget):
+    """Divide a transcrição em trechos de até `budget` tokens, cortando em fim
+    de frase (ou quebra de linha/segmento).
+
+    Whisper com pouca pontuação gera "frases" enormes: uma frase que sozinha
+    passa do orçamento é cortada por contagem de tokens (split_by_tokens)."""
+    sentences = []
+    for part in _SENTENCE_RE.split(text):
+        if not part.strip():
+            continue
+        sentences.extend(split_by_tokens(part, budget) if count_tokens(part) > budget else [part])
+    return [" ".join(group) for group in group_by_token_budget(sentences, budget)]
+
+
+def _chat(client, prompt, op_name, stream_to=None):
+    if stream_to:
+        return _stream_completion(client, _CONTEXT_MODEL, _CONTEXT_SYSTEM, prompt, stream_to, op_name)
+    response = _api_call(
+        client.chat.completions.with_raw_response.create,
+        model=_CONTEXT_MODEL,
+        messages=[
+            {"role": "system", "content": _CONTEXT_SYSTEM},
+            {"role": "user", "content": prompt},
+        ],
+        op_name=op_name,
+    )
+    return response.choices[0].message.content
+
+
+def _generate_chunked_context(client, transcription_text, budget, concurrency, stream_to=None):
+    """Map em trechos paralelos + uma chamada de consolidação (context_merge.md)."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    chunk_template = _load_prompt_template("context_chunk.md")
+    merge_template = _load_prompt_template("context_merge.md")
+    chunks = split_transcript(transcription_text, budget - count_tokens(chunk_template))
+    total = len(chunks)
+    workers = max(1, min(concurrency, total))
+    print_info(f"Transcrição longa: {total} trecho(s) de até {budget} tokens ({workers} em paralelo).")
+
+    def _notes(index):
+        prompt = chunk_template.format(part=index + 1, total_parts=total, transcription_text=chunks[index])
+        notes = _chat(client, prompt, op_name=f"chat.completions (contexto trecho {index + 1}/{total})")
+        print_info(f"Trecho {index + 1}/{total} analisado.")
+        return f"## Trecho {index + 1}/{total}\n\n{notes}"
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        partial_notes = list(pool.map(_notes, range(total)))
+    print_info("Consolidando as notas parciais...")
+    return _chat(
+        client, merge_template.format(partial_notes="\n\n".join(partial_notes)),
+        op_name="chat.completions (contexto consolidação)", stream_to=stream_to,
+    )
+
+
+def generate_context_from_text(transcription_text, base_output_path, output_dir, mode="auto", concurrency=None, stream=False):
+    """Gera o Markdown de contexto a partir da transcrição.
+
+    mode: 'single' (uma chamada com prompts/context.md), 'chunked' (trechos de
+    até VDL_CONTEXT_CHUNK_TOKENS em paralelo + consolidação) ou 'auto' (chunked
+    só quando o prompt não cabe na janela do modelo). Com `stream`, o
+    Markdown final é escrito incrementalmente em <contexto>.md.partial."""
     context_dir = os.path.join(output_dir, "context")
     os.makedirs(context_dir, exist_ok=True)
     context_path = os.path.join(context_dir, os.path.basename(os.path.splitext(base_output_path)[0] + ".md"))
     print_info(f"Gerando conteúdo aprofundado com a API da OpenAI. Salvando em: {context_path}")
 
+    budget = context_chunk_budget()
     try:
-        prompt = _load_prompt_template("context.md").format(transcription_text=transcription_text)
+        template = _load_prompt_template("context.md")
+        chunked = mode == "chunked" or (
+            mode == "auto"
+            and count_tokens(template) + count_tokens(transcription_text) > context_single_limit()
+        )
+        if not chunked:
+            prompt = template.format(transcription_text=transcription_text)
     except (FileNotFoundError, KeyError) as e:
         print_error(f"Falha ao carregar prompt 'context.md': {e}")
         return
@@ -572,60 +797,554 @@ def generate_context_from_text(transcription_text, base_output_path, output_dir)
     try:
         from openai import OpenAI
         client = OpenAI()
-        response = _retry_with_backoff(
-            client.chat.completions.create,
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Você é um especialista em design instrucional e editor de conteúdo."},
-                {"role": "user", "content": prompt}
-            ],
-            op_name="chat.completions (contexto)",
-        )
-        context_markdown = response.choices[0].message.content
-        with open(context_path, 'w', encoding='utf-8') as f: f.write(context_markdown)
+        if chunked:
+            context_markdown = _generate_chunked_context(
+                client, transcription_text, budget, resolve_api_concurrency(concurrency),
+                stream_to=context_path if stream else None,
+            )
+        else:
+            context_markdown = _chat(
+                client, prompt, op_name="chat.completions (contexto)",
+                stream_to=context_path if stream else None,
+            )
+        if not stream:
+            with open(context_path, 'w', encoding='utf-8') as f: f.write(context_markdown)
         print_success(f"Contexto em Markdown salvo com sucesso em: {context_path}")
     except Exception as e:
         print_error(f"Falha ao gerar contexto com a API da OpenAI: {e}")
 
-def transcribe_and_generate_context_via_api(audio_path, base_output_path, output_dir):
+# --- Segmentação de áudio para a API (ffmpeg, memória constante) ---
+API_LIMIT_BYTES = 24 * 1024 * 1024
+# Folga sobre o limite: bitrate variável e overhead de container por pedaço.
+_API_CHUNK_HEADROOM = 0.9
+# Janela (antes de cada fronteira) em que procuramos um silêncio para cortar.
+_SILENCE_SEARCH_SECONDS = 20
+_SILENCE_RE = re.compile(r"silence_(start|end): (-?[\d.]+)")
+
+
+def _probe_duration(media_path):
+    """Duração em segundos via ffprobe (lê só o cabeçalho/índice)."""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", media_path],
+        check=True, capture_output=True, text=True,
+    )
+    return float(result.stdout.strip())
+
+
+def _detect_silences(media_path, noise_db=-35, min_duration=0.4):
+    """Pontos médios dos silêncios do áudio (segundos), via filtro silencedetect.
+
+    O ffmpeg decodifica em streaming e só reporta os intervalos no stderr:
+    memória constante mesmo para aulas de horas."""
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-i", media_path, "-vn",
+         "-af", f"silencedetect=noise={noise_db}dB:d={min_duration}", "-f", "null", "-"],
+        capture_output=True, text=True,
+    )
+    midpoints = []
+    start = None
+    for kind, value in _SILENCE_RE.findall(result.stderr):
+        if kind == "start":
+            start = max(0.0, float(value))
+        elif start is not None:
+            midpoints.append((start + float(value)) / 2)
+            start = None
+    return midpoints
+
+
+def _plan_split_points(duration, segment_seconds, silences, search_seconds=_SILENCE_SEARCH_SECONDS):
+    """Escolhe os instantes de corte: a cada ~segment_seconds, o silêncio mais
+    próximo ANTES da fronteira (dentro da janela), para nunca passar do limite
+    de bytes; sem silêncio na janela, corta na própria fronteira."""
+    points = []
+    last = 0.0
+    while duration - last > segment_seconds:
+        target = last + segment_seconds
+        candidates = [t for t in silences if target - search_seconds <= t <= target and t > last + 1]
+        cut = max(candidates) if candidates else target
+        points.append(round(cut, 3))
+        last = cut
+    return points
+
+
+def split_audio_for_api(audio_path, chunk_dir, limit_bytes=API_LIMIT_BYTES):
+    """Divide o áudio em pedaços abaixo de limit_bytes com o segment muxer do
+    ffmpeg em stream copy (sem decodificar para RAM nem re-encodar).
+
+    A duração de cada pedaço sai do bitrate médio real do arquivo (tamanho /
+    duração), e os cortes caem em silêncios próximos das fronteiras para não
+    partir palavras. Retorna a lista ordenada de caminhos dos pedaços."""
+    size = os.path.getsize(audio_path)
+    duration = _probe_duration(audio_path)
+    bytes_per_second = size / duration if duration > 0 else size
+    segment_seconds = max(30.0, limit_bytes * _API_CHUNK_HEADROOM / bytes_per_second)
+    points = _plan_split_points(duration, segment_seconds, _detect_silences(audio_path))
+    print_info(
+        f"Segmentando {duration / 60:.1f} min em {len(points) + 1} pedaço(s) "
+        f"(~{segment_seconds / 60:.1f} min cada, cortes em silêncio)."
+    )
+    ext = os.path.splitext(audio_path)[1] or ".mp3"
+    pattern = os.path.join(chunk_dir, f"chunk_%03d{ext}")
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", audio_path,
+               "-map", "0:a", "-c", "copy", "-f", "segment", "-reset_timestamps", "1"]
+    if points:
+        command += ["-segment_times", ",".join(f"{p:.3f}" for p in points)]
+    command.append(pattern)
+    subprocess.run(command, check=True, capture_output=True, text=True)
+    return sorted(
+        os.path.join(chunk_dir, name) for name in os.listdir(chunk_dir)
+        if name.startswith("chunk_") and name.endswith(ext)
+    )
+
+
+def resolve_api_concurrency(value=None):
+    """Chamadas simultâneas à API da OpenAI: flag, VDL_API_CONCURRENCY ou 4."""
+    if value is None:
+        try:
+            value = int(os.getenv("VDL_API_CONCURRENCY", "4"))
+        except ValueError:
+            value = 4
+    return max(1, int(value))
+
+
+def _api_call(raw_fn, *args, op_name, **kwargs):
+    """Chamada à OpenAI sob o limitador compartilhado (retry pelos cabeçalhos)."""
+    import _openai_limits
+    return _openai_limits.call(
+        raw_fn, *args, op_name=op_name,
+        log=lambda message: print_to_console_and_log(message, C_YELLOW), **kwargs,
+    )
+
+
+def _transcribe_chunks_via_api(client, chunks, concurrency):
+    """Transcreve os pedaços em paralelo e devolve os textos na ordem original.
+
+    Cada pedaço tem o próprio retry; os que ainda falharem são repetidos
+    sozinhos numa segunda rodada, sem reenviar os que já deram certo."""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    total = len(chunks)
+    texts = [None] * total
+
+    def _transcribe(index):
+        with open(chunks[index], "rb") as audio_file:
+            response = _api_call(
+                client.audio.transcriptions.with_raw_response.create,
+                model="whisper-1", file=audio_file,
+                op_name=f"transcriptions chunk {index + 1}/{total}",
+            )
+        return response.text
+
+    pending = list(range(total))
+    for round_number in (1, 2):
+        failed = {}
+        workers = min(concurrency, len(pending)) if round_number == 1 else 1
+        print_info(f"Enviando {len(pending)} pedaço(s) para a API de transcrição ({workers} em paralelo)...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_transcribe, index): index for index in pending}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    texts[index] = future.result()
+                    print_info(f"Pedaço {index + 1}/{total} transcrito.")
+                except Exception as e:
+                    failed[index] = e
+        if not failed:
+            break
+        pending = sorted(failed)
+        if round_number == 1:
+            print_to_console_and_log(
+                f"[AVISO] {len(pending)} pedaço(s) falharam; repetindo só esses: "
+                f"{', '.join(str(i + 1) for i in pending)}.",
+                C_YELLOW,
+            )
+    else:
+        first = pending[0]
+        raise RuntimeError(f"pedaço(s) {', '.join(str(i + 1) for i in pending)} falharam: {failed[first]}")
+    return " ".join(texts)
+
+
+# --- E-book (--all-contexts) ---
+EBOOK_CACHE_DIRNAME = ".ebook-cache"
+_EBOOK_MAP_MODEL = "gpt-4o-mini"  # mini para o map (mais barato)
+_EBOOK_MAP_SYSTEM = "Editor que produz resumos estruturados de capítulos."
+
+
+def _cached_completion(client, cache_dir, model, system, prompt, op_name, stream_to=None):
+    """Chat completion com cache em disco por hash de (modelo, system, prompt).
+
+    Retorna (texto, veio_do_cache). A gravação é atômica: uma execução
+    interrompida nunca deixa uma entrada truncada. Com `stream_to`, a resposta
+    é gerada em streaming direto nesse arquivo (ver _stream_completion)."""
+    import hashlib
+
+    key = hashlib.sha256("\0".join((model, system, prompt)).encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, key[:2], f"{key}.md")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        pass
+    else:
+        if stream_to:
+            shutil.copyfile(path, stream_to + ".partial")
+            os.replace(stream_to + ".partial", stream_to)
+        return text, True
+    if stream_to:
+        text = _stream_completion(client, model, system, prompt, stream_to, op_name)
+    else:
+        response = _api_call(
+            client.chat.completions.with_raw_response.create,
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt},
+            ],
+            op_name=op_name,
+        )
+        text = response.choices[0].message.content
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return text, False
+
+
+class IncompleteStreamError(RuntimeError):
+    """A resposta em streaming não terminou com finish_reason 'stop'."""
+
+
+def _stream_completion(client, model, system, prompt, path, op_name, max_attempts=3):
+    """Chat completion em streaming gravado incrementalmente em <path>.partial.
+
+    Os tokens vão para o .partial à medida que chegam; só quando a resposta
+    termina com finish_reason 'stop' o arquivo é renomeado atomicamente para
+    `path`. Se a conexão cair (ou a resposta parar por limite de tamanho), a
+    próxima tentativa, nesta ou numa nova execução, continua a partir do texto
+    já gerado em vez de recomeçar. Esgotadas as tentativas sem 'stop', o
+    .partial fica onde está e levanta IncompleteStreamError.
+    Um .partial de outro prompt (ver <path>.partial.key) é descartado."""
+    import hashlib
+
+    partial = path + ".partial"
+    key_path = partial + ".key"
+    key = hashlib.sha256("\0".join((model, system, prompt)).encode("utf-8")).hexdigest()
+    try:
+        with open(key_path, "r", encoding="utf-8") as f:
+            saved_key = f.read().strip()
+    except OSError:
+        saved_key = None
+    if saved_key != key:
+        if os.path.exists(partial):
+            os.remove(partial)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(key_path, "w", encoding="utf-8") as f:
+            f.write(key)
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with open(partial, "r", encoding="utf-8") as f:
+                done = f.read()
+        except OSError:
+            done = ""
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ]
+        if done:
+            print_info(f"Retomando {op_name} a partir de {len(done)} caractere(s) já gerados.")
+            messages += [
+                {"role": "assistant", "content": done},
+                {"role": "user", "content": "Continue exatamente de onde a resposta anterior parou, sem repetir nada do que já foi escrito."},
+            ]
+        finish_reason = None
+        try:
+            stream = _api_call(
+                client.chat.completions.with_raw_response.create,
+                model=model, messages=messages, stream=True, op_name=op_name,
+            )
+            with open(partial, "a", encoding="utf-8") as f:
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    if choice.delta and choice.delta.content:
+                        f.write(choice.delta.content)
+                        f.flush()
+                    finish_reason = choice.finish_reason or finish_reason
+        except Exception as e:
+            if attempt == max_attempts:
+                raise
+            print_to_console_and_log(
+                f"[AVISO] Streaming de {op_name} interrompido (tentativa {attempt}/{max_attempts}): {e}. "
+                f"O texto parcial foi mantido em {partial}.",
+                C_YELLOW,
+            )
+            continue
+        if finish_reason == "stop":
+            break
+        if finish_reason not in (None, "length"):
+            raise IncompleteStreamError(
+                f"{op_name} interrompido pela API (finish_reason={finish_reason}); texto parcial em {partial}"
+            )
+        if attempt < max_attempts:
+            if finish_reason == "length":
+                print_info(f"{op_name} atingiu o limite de saída; pedindo a continuação...")
+            else:
+                print_to_console_and_log(
+                    f"[AVISO] Streaming de {op_name} terminou sem finish_reason (tentativa {attempt}/{max_attempts}); "
+                    f"continuando a partir do texto parcial.",
+                    C_YELLOW,
+                )
+    else:
+        raise IncompleteStreamError(
+            f"{op_name} não concluiu em {max_attempts} tentativa(s) (finish_reason={finish_reason}); "
+            f"texto parcial mantido em {partial}"
+        )
+
+    os.replace(partial, path)
+    os.remove(key_path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def summarize_chapters(client, scan_dir, files, concurrency):
+    """MAP do e-book: resume cada capítulo em paralelo sob o limitador.
+
+    Os resumos ficam em <scan_dir>/.ebook-cache/map, então reexecutar o e-book
+    só paga pelos capítulos alterados (ou que falharam antes). Retorna
+    (resumos na ordem dos arquivos, arquivos que falharam)."""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    cache_dir = os.path.join(scan_dir, EBOOK_CACHE_DIRNAME, "map")
+    total = len(files)
+
+    def _summarize(i, fname):
+        with open(os.path.join(scan_dir, fname), 'r', encoding='utf-8') as f:
+            content = f.read()
+        # Só o conteúdo entra no prompt (a chave do cache): número e origem do
+        # capítulo vão no cabeçalho depois, então inserir ou remover um
+        # capítulo não invalida o cache dos seguintes.
+        map_prompt = (
+            "Você é um editor de e-books. Resuma o conteúdo abaixo em "
+            "Markdown estruturado: título sugerido, 2-3 parágrafos de "
+            "introdução do capítulo, bullets dos pontos-chave, exemplos "
+            "preservados, e principais conclusões. Mantenha termos técnicos "
+            "exatamente como estão.\n\n"
+            "---\n" + content
+        )
+        return _cached_completion(
+            client, cache_dir, _EBOOK_MAP_MODEL, _EBOOK_MAP_SYSTEM, map_prompt,
+            op_name=f"chat.completions (map cap {i})",
+        )
+
+    summaries = {}
+    failed = []
+    hits = 0
+    done = 0
+    print_info(f"[map] Resumindo {total} capítulo(s) ({min(concurrency, total)} em paralelo)...")
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, total))) as pool:
+        futures = {pool.submit(_summarize, i, fname): (i, fname) for i, fname in enumerate(files, start=1)}
+        for future in as_completed(futures):
+            i, fname = futures[future]
+            done += 1
+            try:
+                text, cached = future.result()
+            except Exception as e:
+                print_error(f"Falha ao resumir '{fname}': {e}")
+                failed.append(fname)
+                continue
+            hits += cached
+            summaries[i] = f"# CAPÍTULO {i}: {fname}\n\n{text}"
+            print_info(f"[map {done}/{total}] {fname}{' (cache)' if cached else ''}")
+    resolved = total - len(failed)
+    if resolved:
+        print_info(f"[map] {resolved}/{total} capítulo(s) prontos; cache: {hits}/{resolved} ({hits * 100 // resolved}%).")
+    failed.sort(key=files.index)
+    return [summaries[i] for i in sorted(summaries)], failed
+
+
+_EBOOK_REDUCE_MODEL = "gpt-4o"  # full model no reduce (qualidade)
+_EBOOK_REDUCE_SYSTEM = "Você é um editor e instrutor que transforma capítulos em um e-Book coerente, completo e bem estruturado."
+_EBOOK_MAX_LEVELS = 4
+_token_encodings = {}
+
+
+class EbookBudgetError(RuntimeError):
+    """O reduce do e-book não consegue caber no orçamento de tokens."""
+
+
+def _token_encoding(model):
+    """Encoding tiktoken do modelo (em cache); None sem tiktoken instalado."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    encoding = _token_encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        _token_encodings[model] = encoding
+    return encoding
+
+
+def count_tokens(text, model=_EBOOK_REDUCE_MODEL):
+    """Tokens de `text` pelo tokenizer do modelo (tiktoken, opcional).
+
+    Sem tiktoken instalado, estima ~4 caracteres por token."""
+    encoding = _token_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text, budget, model=_EBOOK_REDUCE_MODEL):
+    """Corta `text` em pedaços de até `budget` tokens, sem olhar a pontuação.
+
+    Com tiktoken, fatia a lista de tokens; sem ele, agrupa palavras pela
+    estimativa do count_tokens."""
+    encoding = _token_encoding(model)
+    if encoding is None:
+        return [" ".join(group) for group in group_by_token_budget(text.split(), budget)]
+    tokens = encoding.encode(text, disallowed_special=())
+    pieces = (encoding.decode(tokens[start:start + budget]).strip() for start in range(0, len(tokens), budget))
+    return [piece for piece in pieces if piece]
+
+
+def ebook_reduce_budget():
+    """Tokens máximos de entrada por chamada de reduce (VDL_EBOOK_REDUCE_TOKENS)."""
+    try:
+        return max(1000, int(os.getenv("VDL_EBOOK_REDUCE_TOKENS", "60000")))
+    except ValueError:
+        return 60000
+
+
+def group_by_token_budget(items, budget, overhead=0):
+    """Agrupa itens consecutivos sem passar de `budget` tokens por grupo.
+
+    Um item que sozinho excede o orçamento vira um grupo próprio."""
+    groups = []
+    current, used = [], overhead
+    for item in items:
+        tokens = count_tokens(item)
+        if current and used + tokens > budget:
+            groups.append(current)
+            current, used = [], overhead
+        current.append(item)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def reduce_chapters(client, scan_dir, summaries, mode="auto", concurrency=1, stream_to=None):
+    """REDUCE do e-book.
+
+    - single: todos os resumos num único prompt ebook_reduce.md (comportamento
+      original).
+    - tree: resumos agrupados por orçamento de tokens viram rascunhos de parte
+      (ebook_part_reduce.md), reduzidos de novo até caberem numa chamada final.
+    - auto: single quando cabe no orçamento, tree caso contrário.
+
+    Se nem a árvore consegue caber no orçamento (um resumo sozinho grande
+    demais, ou _EBOOK_MAX_LEVELS níveis sem caber), levanta EbookBudgetError
+    em vez de mandar um prompt que estouraria o contexto.
+
+    Cada nível tem cache próprio em <scan_dir>/.ebook-cache/reduce-N (hash do
+    prompt): reexecutar só refaz as partes cujos resumos mudaram e os níveis
+    acima delas. Com `stream_to`, o e-book final é escrito em streaming."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    final_template = _load_prompt_template("ebook_reduce.md")
+    budget = ebook_reduce_budget()
+    cache_root = os.path.join(scan_dir, EBOOK_CACHE_DIRNAME)
+    combined = "\n\n".join(summaries)
+    total_tokens = count_tokens(combined)
+    final_overhead = count_tokens(final_template)
+
+    if mode == "tree" or (mode == "auto" and total_tokens + final_overhead > budget):
+        part_template = _load_prompt_template("ebook_part_reduce.md")
+        part_overhead = count_tokens(part_template)
+        items = summaries
+        level = 1
+        # Reduz até o texto caber na chamada final (tree força ao menos um nível).
+        while total_tokens + final_overhead > budget or (mode == "tree" and level == 1):
+            if level > _EBOOK_MAX_LEVELS:
+                raise EbookBudgetError(
+                    f"os rascunhos ainda somam ~{total_tokens} tokens após {_EBOOK_MAX_LEVELS} nível(is) "
+                    f"de reduce (orçamento {budget}); aumente VDL_EBOOK_REDUCE_TOKENS"
+                )
+            groups = group_by_token_budget(items, budget, part_overhead)
+            oversized = max(sum(count_tokens(item) for item in group) for group in groups)
+            if oversized + part_overhead > budget:
+                raise EbookBudgetError(
+                    f"um bloco sozinho tem ~{oversized} tokens e não cabe numa chamada de reduce "
+                    f"(orçamento {budget}); aumente VDL_EBOOK_REDUCE_TOKENS"
+                )
+            print_info(
+                f"[reduce nível {level}] {sum(count_tokens(i) for i in items)} tokens em "
+                f"{len(items)} bloco(s) -> {len(groups)} parte(s) (orçamento {budget})."
+            )
+            cache_dir = os.path.join(cache_root, f"reduce-{level}")
+
+            def _reduce_part(index, group, level=level, total_parts=len(groups), cache_dir=cache_dir):
+                prompt = part_template.format(
+                    part=index + 1, total_parts=total_parts, combined="\n\n".join(group),
+                )
+                return _cached_completion(
+                    client, cache_dir, _EBOOK_REDUCE_MODEL, _EBOOK_REDUCE_SYSTEM, prompt,
+                    op_name=f"chat.completions (reduce nível {level} parte {index + 1}/{total_parts})",
+                )
+
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(groups)))) as pool:
+                results = list(pool.map(_reduce_part, range(len(groups)), groups))
+            hits = sum(cached for _text, cached in results)
+            print_info(f"[reduce nível {level}] {len(groups)} parte(s) prontas; cache: {hits}/{len(groups)}.")
+            items = [text for text, _cached in results]
+            combined = "\n\n".join(items)
+            total_tokens = count_tokens(combined)
+            level += 1
+
+    print_info(f"[reduce] Consolidando {len(summaries)} capítulo(s) em e-Book final (~{total_tokens} tokens)...")
+    text, cached = _cached_completion(
+        client, os.path.join(cache_root, "reduce"), _EBOOK_REDUCE_MODEL, _EBOOK_REDUCE_SYSTEM,
+        final_template.format(combined=combined),
+        op_name="chat.completions (reduce e-book)", stream_to=stream_to,
+    )
+    if cached:
+        print_info("[reduce] E-book final veio do cache (nenhum capítulo mudou).")
+    return text
+
+
+def transcribe_and_generate_context_via_api(audio_path, base_output_path, output_dir, concurrency=None, context_mode="auto", stream=False):
     print_info("Iniciando processo unificado com a API da OpenAI...")
     try:
         from openai import OpenAI
-        from pydub import AudioSegment
 
         client = OpenAI()
 
-        API_LIMIT_BYTES = 24 * 1024 * 1024
         audio_size = os.path.getsize(audio_path)
         full_transcription = ""
 
         if audio_size > API_LIMIT_BYTES:
             print_to_console_and_log(f"[AVISO] O arquivo de áudio ({audio_size / (1024*1024):.2f} MB) excede o limite de 24 MB da API. O áudio será segmentado.", C_YELLOW)
 
-            sound = AudioSegment.from_mp3(audio_path)
-            chunk_length_ms = 10 * 60 * 1000
-            chunks = [sound[i:i + chunk_length_ms] for i in range(0, len(sound), chunk_length_ms)]
-
             with tempfile.TemporaryDirectory(prefix="vdl_chunks_") as chunk_dir:
                 print_info(f"Diretório temporário para chunks: {chunk_dir}")
-                for i, chunk in enumerate(chunks):
-                    chunk_path = os.path.join(chunk_dir, f"chunk_{i}.mp3")
-                    chunk.export(chunk_path, format="mp3")
-
-                    print_info(f"Enviando pedaço {i+1}/{len(chunks)} para a API de transcrição...")
-                    with open(chunk_path, "rb") as audio_file:
-                        transcription_response = _retry_with_backoff(
-                            client.audio.transcriptions.create,
-                            model="whisper-1", file=audio_file,
-                            op_name=f"transcriptions chunk {i+1}/{len(chunks)}",
-                        )
-                    full_transcription += transcription_response.text + " "
+                chunks = split_audio_for_api(audio_path, chunk_dir)
+                full_transcription = _transcribe_chunks_via_api(
+                    client, chunks, resolve_api_concurrency(concurrency),
+                )
 
         else:
             print_info(f"Enviando áudio '{audio_path}' para a API de transcrição...")
             with open(audio_path, "rb") as audio_file:
-                transcription_response = _retry_with_backoff(
-                    client.audio.transcriptions.create,
+                transcription_response = _api_call(
+                    client.audio.transcriptions.with_raw_response.create,
                     model="whisper-1", file=audio_file,
                     op_name="transcriptions",
                 )
@@ -639,11 +1358,84 @@ def transcribe_and_generate_context_via_api(audio_path, base_output_path, output
         with open(transcription_path, 'w', encoding='utf-8') as f: f.write(full_transcription)
         print_info(f"Transcrição da API salva em: {transcription_path}")
 
-        generate_context_from_text(full_transcription, base_output_path, output_dir)
+        generate_context_from_text(full_transcription, base_output_path, output_dir, context_mode, concurrency, stream)
 
     except Exception as e:
         print_error(f"Ocorreu um erro no processo unificado da API: {e}")
 
+# --- Pipeline por estágios (modo local em diretório) ---
+# Itens prontos esperando o próximo estágio: limita áudios extraídos/
+# transcrições acumulados quando um estágio é mais lento que o anterior.
+_PIPELINE_QUEUE_SIZE = 2
+# Estágios que só esperam a API (transcrição -u, contexto): o limitador de
+# taxa da OpenAI continua valendo entre eles.
+_PIPELINE_API_WORKERS = 2
+
+
+def run_pipeline(items, stages, queue_size=_PIPELINE_QUEUE_SIZE):
+    """Passa os itens por estágios encadeados por filas limitadas.
+
+    stages: lista de (nome, função, workers). Cada estágio roda nos próprios
+    threads: enquanto o Whisper transcreve o vídeo N, o ffmpeg já extrai o
+    N+1 e a API gera o contexto do N-1, e o lote leva perto do tempo do
+    estágio mais lento em vez da soma. A função recebe o item do estágio
+    anterior e devolve o do próximo; None descarta o item (falha já
+    reportada). Retorna os itens que passaram por todos os estágios.
+
+    Usado no -l <diretório>. O modo download recebe uma única URL por
+    execução, então não há o que sobrepor dentro do processo: a sobreposição
+    download -> processamento de um lote fica no scheduler do Studio, que
+    roda o --only-download de um job enquanto o --local do anterior transcreve."""
+    import queue
+    import threading
+
+    done = object()
+    inboxes = [queue.Queue(maxsize=queue_size) for _ in stages]
+    finished = []
+
+    def feed():
+        for item in items:
+            inboxes[0].put(item)
+        for _ in range(stages[0][2]):
+            inboxes[0].put(done)
+
+    def work(index):
+        name, fn, _ = stages[index]
+        while True:
+            item = inboxes[index].get()
+            if item is done:
+                return
+            try:
+                result = fn(item)
+            except Exception as e:
+                print_error(f"Falha no estágio '{name}': {e}")
+                result = None
+            if result is None:
+                continue
+            if index + 1 < len(stages):
+                inboxes[index + 1].put(result)
+            else:
+                finished.append(result)
+
+    feeder = threading.Thread(target=feed, daemon=True, name="vdl-pipeline-feed")
+    feeder.start()
+    workers = [
+        [threading.Thread(target=work, args=(index,), daemon=True, name=f"vdl-pipeline-{name}") for _ in range(count)]
+        for index, (name, _fn, count) in enumerate(stages)
+    ]
+    for group in workers:
+        for thread in group:
+            thread.start()
+    for index, group in enumerate(workers):
+        for thread in group:
+            thread.join()
+        # Estágio esgotado: libera os workers do próximo.
+        if index + 1 < len(stages):
+            for _ in range(stages[index + 1][2]):
+                inboxes[index + 1].put(done)
+    return finished
+
+
 def main():
     """Função principal do script."""
     if len(sys.argv) == 1 or (len(sys.argv) == 2 and sys.argv[1] in {"studio", "--studio"}):
@@ -723,7 +1515,16 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
     parser.add_argument("-u", "--unified-mode", action="store_true", help="MODO UNIFICADO: Usa a API da OpenAI para transcrever e gerar contexto.")
     parser.add_argument("--gpu", action="store_true", help="Tenta usar a GPU para a transcrição LOCAL.")
     parser.add_argument("--whisper-model", default="base", choices=['tiny', 'base', 'small', 'medium', 'large'], help="Modelo do Whisper para transcrição LOCAL.")
+    parser.add_argument("--whisper-workers", type=int, default=None, help="Processos paralelos da transcrição LOCAL em CPU: o áudio é dividido nos silêncios e os pedaços são transcritos em paralelo (padrão: VDL_WHISPER_WORKERS ou 1).")
+    parser.add_argument("--keep-audio", action="store_true", help="Arquiva o áudio extraído em <dir>/mp3 também na transcrição LOCAL (por padrão o Whisper lê o vídeo direto, sem mp3 intermediário).")
+    parser.add_argument("--api-concurrency", type=int, default=None, help="Chamadas simultâneas à API (pedaços de áudio no -u, trechos de contexto no -c/-u, capítulos no --all-contexts), sob um limitador de taxa que segue os cabeçalhos da OpenAI (padrão: VDL_API_CONCURRENCY ou 4).")
     parser.add_argument("--all-contexts", action="store_true", help="Lê todos os .md em 'context' e gera um e-Book único em Markdown.")
+    parser.add_argument("--context-mode", default="auto", choices=["auto", "single", "chunked"], help="Geração de contexto (-c/-u): 'single' (uma chamada), 'chunked' (trechos por orçamento de tokens em paralelo + consolidação) ou 'auto' (chunked só quando a transcrição não cabe na janela do modelo). Tamanho dos trechos: VDL_CONTEXT_CHUNK_TOKENS (padrão 12000).")
+    parser.add_argument("--stream", action="store_true", help="Recebe a resposta da OpenAI em streaming (-c, -u, --all-contexts): o Markdown vai sendo gravado em <arquivo>.partial e é renomeado ao concluir; uma nova tentativa continua do texto parcial.")
+    parser.add_argument("--ebook-reduce", default="auto", choices=["auto", "single", "tree"], help="Reduce do --all-contexts: 'single' (uma chamada), 'tree' (agrupa resumos por orçamento de tokens em partes e consolida em níveis) ou 'auto' (árvore só quando não cabe numa chamada). Orçamento: VDL_EBOOK_REDUCE_TOKENS (padrão 60000).")
+    parser.add_argument("--audio-only", action="store_true", help="Baixa só o áudio (.m4a, mesmo nome do vídeo) em vez do vídeo: a rendição de áudio do HLS/DASH quando existe, senão o áudio separado durante o download. Para lotes que só precisam da transcrição/contexto.")
+    parser.add_argument("--concurrent-fragments", default=None, metavar="N|auto", help="Fragmentos HLS/DASH baixados em paralelo pelo yt-dlp. 'auto' ajusta o N pela vazão medida em cada host e recua em 429/403 (padrão: VDL_CONCURRENT_FRAGMENTS ou 1).")
+    parser.add_argument("--hls-engine", default=None, choices=["yt-dlp", "native"], help="Downloader de HLS: 'yt-dlp' (subprocesso) ou 'native' (em processo, pool HTTP/2 e AES-128; volta ao yt-dlp se a fonte não for suportada). Padrão: VDL_HLS_ENGINE ou yt-dlp.")
     parser.add_argument("--referer", default=None, help="Referer HTTP para o download (necessário para CDNs com hot-link, ex.: BunnyCDN). Por padrão é inferido do domínio dos cookies.")
 
     args = parser.parse_args()
@@ -757,6 +1558,31 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
         parser.error("Os argumentos --gpu e --whisper-model usam o whisper local e não podem ser combinados com -u (que envia o áudio para a API).")
     if not args.transcribe and (args.gpu or args.whisper_model != 'base'):
         parser.error("Os argumentos --gpu e --whisper-model só podem ser usados com -t ou -c.")
+    if args.keep_audio and not (args.transcribe or args.unified_mode):
+        parser.error("A flag --keep-audio só se aplica com -t, -c ou -u.")
+    if args.whisper_workers is not None and (not args.transcribe or args.whisper_workers < 1):
+        parser.error("O argumento --whisper-workers exige -t ou -c e um valor >= 1.")
+    if args.api_concurrency is not None and (not (args.context or args.unified_mode or args.all_contexts) or args.api_concurrency < 1):
+        parser.error("O argumento --api-concurrency exige -c, -u ou --all-contexts e um valor >= 1.")
+    if args.concurrent_fragments is not None and (args.local or args.all_contexts):
+        parser.error("O argumento --concurrent-fragments só se aplica ao modo download.")
+    try:
+        args.concurrent_fragments = _fragment_tuning.parse_setting(args.concurrent_fragments or os.getenv("VDL_CONCURRENT_FRAGMENTS") or 1)
+    except ValueError:
+        parser.error("O argumento --concurrent-fragments aceita 'auto' ou um inteiro >= 1.")
+    if args.audio_only and (args.local or args.all_contexts):
+        parser.error("A flag --audio-only só se aplica ao modo download.")
+    if args.hls_engine is not None and (args.local or args.all_contexts):
+        parser.error("O argumento --hls-engine só se aplica ao modo download.")
+    args.hls_engine = args.hls_engine or os.getenv("VDL_HLS_ENGINE") or "yt-dlp"
+    if args.hls_engine not in ("yt-dlp", "native"):
+        parser.error("VDL_HLS_ENGINE aceita 'yt-dlp' ou 'native'.")
+    if args.context_mode != "auto" and not (args.context or args.unified_mode):
+        parser.error("O argumento --context-mode só se aplica com -c ou -u.")
+    if args.stream and not (args.context or args.unified_mode or args.all_contexts):
+        parser.error("A flag --stream só se aplica com -c, -u ou --all-contexts.")
+    if args.ebook_reduce != "auto" and not args.all_contexts:
+        parser.error("O argumento --ebook-reduce só se aplica com --all-contexts.")
     if args.all_contexts and any([args.local, args.transcribe, args.context, args.unified_mode, args.only_download]):
         parser.error("A flag --all-contexts não pode ser usada em conjunto com -l, -t, -c, -u ou --only-download.")
 
@@ -786,7 +1612,7 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
             input_path = args.input if args.input is not None else "."
             if os.path.isdir(input_path):
                 from pathlib import Path
-                exts = {".mp4", ".mkv", ".mov", ".webm", ".m4v"}
+                exts = {".mp4", ".mkv", ".mov", ".webm", ".m4v", AUDIO_ONLY_EXTENSION}
                 try:
                     videos = [str(p) for p in Path(input_path).rglob("*") if p.is_file() and p.suffix.lower() in exts]
                 except OSError as e:
@@ -801,26 +1627,56 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
                 # Pré-carrega o modelo Whisper UMA VEZ se for transcrição local
                 shared_model, shared_device = (None, None)
                 if args.transcribe and not args.unified_mode:
-                    shared_model, shared_device = load_whisper_model(args.whisper_model, args.gpu)
+                    shared_model, shared_device = load_whisper_model(args.whisper_model, args.gpu, workers=args.whisper_workers)
                     if shared_model is None:
                         sys.exit(1)
 
-                for idx, vp in enumerate(videos, start=1):
-                    print_info(f"[{idx}/{len(videos)}] Processando: {vp}")
-                    base_output_path = os.path.join(args.directory, os.path.basename(vp))
-                    audio_path = extract_audio(vp, args.directory)
-                    if not audio_path:
-                        print_error(f"Pulado por falha na extração de áudio: {vp}")
-                        continue
-                    if args.unified_mode:
-                        transcribe_and_generate_context_via_api(audio_path, base_output_path, args.directory)
-                    elif args.transcribe:
-                        transcription_text = transcribe_audio_local(
-                            audio_path, args.whisper_model, args.gpu, args.directory,
-                            model=shared_model, device=shared_device,
-                        )
-                        if transcription_text and args.context:
-                            generate_context_from_text(transcription_text, base_output_path, args.directory)
+                # Estágios: extração (ffmpeg) -> transcrição (Whisper local, um
+                # worker com o modelo compartilhado, ou API no -u) -> contexto (API).
+                def _extract_stage(item):
+                    item["audio"] = extract_audio(item["video"], args.directory)
+                    if not item["audio"]:
+                        print_error(f"Pulado por falha na extração de áudio: {item['video']}")
+                        return None
+                    return item
+
+                def _unified_stage(item):
+                    transcribe_and_generate_context_via_api(item["audio"], item["base"], args.directory, args.api_concurrency, args.context_mode, args.stream)
+                    return item
+
+                def _transcribe_stage(item):
+                    # Whisper local lê o vídeo direto (PCM via pipe do ffmpeg).
+                    item["text"] = transcribe_audio_local(
+                        item["video"], args.whisper_model, args.gpu, args.directory,
+                        model=shared_model, device=shared_device, source_path=item["video"],
+                    )
+                    return item if item["text"] and args.context else None
+
+                def _context_stage(item):
+                    generate_context_from_text(item["text"], item["base"], args.directory, args.context_mode, args.api_concurrency, args.stream)
+                    return item
+
+                stages = []
+                if needs_mp3(args):
+                    stages.append(("áudio", _extract_stage, 1))
+                if args.unified_mode:
+                    stages.append(("api", _unified_stage, _PIPELINE_API_WORKERS))
+                elif args.transcribe:
+                    stages.append(("transcrição", _transcribe_stage, 1))
+                    if args.context:
+                        stages.append(("contexto", _context_stage, _PIPELINE_API_WORKERS))
+                items = [
+                    {"video": vp, "base": os.path.join(args.directory, os.path.basename(vp))}
+                    for vp in videos
+                ]
+                for idx, item in enumerate(items, start=1):
+                    print_info(f"[{idx}/{len(videos)}] Na fila: {item['video']}")
+                if stages:
+                    try:
+                        run_pipeline(items, stages)
+                    finally:
+                        if shared_model is not None:
+                            shared_model.close()
                 video_to_process = None
                 base_output_path = None
             elif os.path.isfile(input_path):
@@ -830,6 +1686,8 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
                 print_error(f"Arquivo ou diretório local não encontrado: {input_path}")
                 sys.exit(1)
         else: # Modo Download
+            # Uma URL por execução: os estágios seguem em sequência aqui (o
+            # pipeline de lotes download/processamento é o do Studio).
             print_info("Executando em MODO DOWNLOAD.")
             user_agent, cookie, referer, cookies_list = get_auth_details()
             if not all([user_agent, cookie]):
@@ -839,7 +1697,9 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
             effective_referer = args.referer or referer
 
             video_output_path = os.path.join(args.directory, args.output_filename)
-            if download_video(args.input, video_output_path, user_agent, cookie, effective_referer, cookies_list):
+            if args.audio_only:
+                video_output_path = audio_only_path(video_output_path)
+            if download_video(args.input, video_output_path, user_agent, cookie, effective_referer, cookies_list, args.concurrent_fragments, args.hls_engine, args.audio_only):
                 # --- INÍCIO DA ALTERAÇÃO ---
                 # Se for apenas download, encerra o script aqui com sucesso.
                 if args.only_download:
@@ -853,13 +1713,17 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
 
         # --- Fluxo de Processamento Pós-Download/Local ---
         if video_to_process:
-            audio_path = extract_audio(video_to_process, args.directory)
-            if not audio_path: sys.exit(1)
+            if needs_mp3(args):
+                audio_path = extract_audio(video_to_process, args.directory)
+                if not audio_path: sys.exit(1)
 
             if args.unified_mode:
-                transcribe_and_generate_context_via_api(audio_path, base_output_path, args.directory)
+                transcribe_and_generate_context_via_api(audio_path, base_output_path, args.directory, args.api_concurrency, args.context_mode, args.stream)
             elif args.transcribe:
-                transcription_text = transcribe_audio_local(audio_path, args.whisper_model, args.gpu, args.directory)
+                transcription_text = transcribe_audio_local(
+                    video_to_process, args.whisper_model, args.gpu, args.directory,
+                    workers=args.whisper_workers, source_path=video_to_process,
+                )
                 # Falha real (modelo não carregou, erro na transcrição) retorna None:
                 # propaga exit code != 0 para o Studio NÃO marcar o job como "Concluído"
                 # sem ter gerado .txt. Texto vazio ("") é áudio sem fala, não é falha.
@@ -867,7 +1731,7 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
                     print_error("Transcrição local falhou: nenhum texto gerado.")
                     sys.exit(1)
                 if args.context:
-                    generate_context_from_text(transcription_text, base_output_path, args.directory)
+                    generate_context_from_text(transcription_text, base_output_path, args.directory, args.context_mode, args.api_concurrency, args.stream)
 
     # Consolidação opcional de todos os contextos gerados em um e-Book único
     if args.all_contexts:
@@ -896,80 +1760,52 @@ PRÉ-REQUISITOS DE AUTENTICAÇÃO:
         def _natural_key(s):
             import re
             return [int(t) if t.isdigit() else t.lower() for t in re.split(r'(\d+)', s)]
-        files = sorted([f for f in os.listdir(scan_dir) if f.lower().endswith(".md")], key=_natural_key)
+        # ebook.md é a saída de uma execução anterior, não um capítulo.
+        files = sorted(
+            [f for f in os.listdir(scan_dir) if f.lower().endswith(".md") and f.lower() != "ebook.md"],
+            key=_natural_key,
+        )
         print_info(f"Processando {len(files)} arquivo(s) de contexto em: {scan_dir}")
         try:
             from openai import OpenAI
             client = OpenAI()
 
-            # MAP: lê e resume cada capítulo individualmente. Isso evita estouro
-            # de context window quando há muitos arquivos .md (ou capítulos longos).
-            chapter_summaries = []
-            failed_files = []
-            for i, fname in enumerate(files, start=1):
-                path = os.path.join(scan_dir, fname)
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                except Exception as e:
-                    print_error(f"Falha ao ler '{fname}': {e}")
-                    failed_files.append(fname)
-                    continue
-
-                print_info(f"[map {i}/{len(files)}] Resumindo capítulo: {fname}")
-                map_prompt = (
-                    "Você é um editor de e-books. Resuma o conteúdo abaixo em "
-                    "Markdown estruturado: título sugerido, 2-3 parágrafos de "
-                    "introdução do capítulo, bullets dos pontos-chave, exemplos "
-                    "preservados, e principais conclusões. Mantenha termos técnicos "
-                    "exatamente como estão. Capítulo " + str(i) + f" (origem: {fname}).\n\n"
-                    "---\n" + content
-                )
-                try:
-                    map_resp = _retry_with_backoff(
-                        client.chat.completions.create,
-                        model="gpt-4o-mini",  # mini para o map (mais barato)
-                        messages=[
-                            {"role": "system", "content": "Editor que produz resumos estruturados de capítulos."},
-                            {"role": "user", "content": map_prompt},
-                        ],
-                        op_name=f"chat.completions (map cap {i})",
-                    )
-                    chapter_summaries.append(
-                        f"# CAPÍTULO {i}: {fname}\n\n{map_resp.choices[0].message.content}"
-                    )
-                except Exception as e:
-                    print_error(f"Falha ao resumir '{fname}': {e}")
-                    failed_files.append(fname)
+            # MAP: lê e resume cada capítulo individualmente (em paralelo, com
+            # cache em disco). Isso evita estouro de context window quando há
+            # muitos arquivos .md (ou capítulos longos).
+            chapter_summaries, failed_files = summarize_chapters(
+                client, scan_dir, files, resolve_api_concurrency(args.api_concurrency),
+            )
 
             if not chapter_summaries:
                 print_error("Nenhum capítulo pôde ser resumido. Abortando geração do e-Book.")
                 if LOG_FILE: LOG_FILE.close()
                 sys.exit(1)
 
-            combined = "\n\n".join(chapter_summaries)
-
-            # REDUCE: consolida os resumos em um e-Book único.
+            # REDUCE: consolida os resumos em um e-Book único (direto ou em
+            # árvore, conforme o orçamento de tokens).
             try:
-                reduce_prompt = _load_prompt_template("ebook_reduce.md").format(combined=combined)
+                ebook_path = os.path.join(scan_dir, "ebook.md")
+                ebook_md = reduce_chapters(
+                    client, scan_dir, chapter_summaries, args.ebook_reduce,
+                    resolve_api_concurrency(args.api_concurrency),
+                    stream_to=ebook_path if args.stream else None,
+                )
             except (FileNotFoundError, KeyError) as e:
-                print_error(f"Falha ao carregar prompt 'ebook_reduce.md': {e}")
+                print_error(f"Falha ao carregar prompt de reduce do e-Book: {e}")
                 if LOG_FILE: LOG_FILE.close()
                 sys.exit(1)
-            print_info(f"[reduce] Consolidando {len(chapter_summaries)} capítulo(s) em e-Book final...")
-            response = _retry_with_backoff(
-                client.chat.completions.create,
-                model="gpt-4o",  # full model no reduce (qualidade)
-                messages=[
-                    {"role": "system", "content": "Você é um editor e instrutor que transforma capítulos em um e-Book coerente, completo e bem estruturado."},
-                    {"role": "user", "content": reduce_prompt},
-                ],
-                op_name="chat.completions (reduce e-book)",
-            )
-            ebook_md = response.choices[0].message.content
-            ebook_path = os.path.join(scan_dir, "ebook.md")
-            with open(ebook_path, 'w', encoding='utf-8') as f:
-                f.write(ebook_md)
+            except EbookBudgetError as e:
+                print_error(f"Reduce do e-Book não coube no orçamento de tokens: {e}")
+                if LOG_FILE: LOG_FILE.close()
+                sys.exit(1)
+            except IncompleteStreamError as e:
+                print_error(f"E-book final incompleto: {e}")
+                if LOG_FILE: LOG_FILE.close()
+                sys.exit(1)
+            if not args.stream:
+                with open(ebook_path, 'w', encoding='utf-8') as f:
+                    f.write(ebook_md)
             print_success(f"E-book consolidado salvo em: {ebook_path}")
 
             # Warning final visível se houve capítulos falhos